@@ -0,0 +1,70 @@
+""" Compara la construcción de Codelist.codes con el bucle anterior (comprobación de subcadenas y
+try/except por cada columna) y con :func:`mdmpyclient.utils.columns.item_columns`.
+
+Uso, desde la raíz del repositorio para que se importe mdmpyclient:
+
+    python -m benchmarks.codelist_columns_benchmark [número de códigos]
+
+o bien PYTHONPATH=. python benchmarks/codelist_columns_benchmark.py [número de códigos]
+"""
+import sys
+import timeit
+
+import pandas
+
+from mdmpyclient.utils.columns import item_columns
+
+LANGUAGES = ['en', 'es']
+
+
+def fake_codes(n_codes):
+    codes = []
+    for i in range(n_codes):
+        code = {'id': f'{i:05d}', 'names': {'es': f'Municipio {i}'}}
+        if i % 10:
+            code['parent'] = f'{i // 10:05d}'
+        if i % 3 == 0:
+            code['names']['en'] = f'Municipality {i}'
+            code['descriptions'] = {'es': f'Descripción {i}'}
+        codes.append(code)
+    return codes
+
+
+def legacy_columns(response_data, languages):
+    codes = {'id': [], 'parent': []}
+    for language in languages:
+        codes[f'name_{language}'] = []
+        codes[f'des_{language}'] = []
+    for code in response_data:
+        for key, column in codes.items():
+            try:
+                if 'id' in key or 'parent' in key:
+                    column.append(code[key])
+                else:
+                    language = key[-2:]
+                    if 'name' in key:
+                        column.append(code['names'][language])
+                    if 'des' in key:
+                        column.append(code['descriptions'][language])
+            except Exception:
+                column.append(None)
+    return codes
+
+
+def main():
+    n_codes = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    codes = fake_codes(n_codes)
+    legacy = pandas.DataFrame(data=legacy_columns(codes, LANGUAGES), dtype='string')
+    columnar = pandas.DataFrame(data=item_columns(codes, LANGUAGES), dtype='string')
+    pandas.testing.assert_frame_equal(legacy, columnar)
+
+    legacy_time = min(timeit.repeat(lambda: legacy_columns(codes, LANGUAGES), number=1, repeat=5))
+    columnar_time = min(timeit.repeat(lambda: item_columns(codes, LANGUAGES), number=1, repeat=5))
+    print(f'{n_codes} códigos')
+    print(f'Bucle anterior: {legacy_time * 1000:.1f} ms')
+    print(f'item_columns:   {columnar_time * 1000:.1f} ms')
+    print(f'Mejora:         x{legacy_time / columnar_time:.1f}')
+
+
+if __name__ == '__main__':
+    main()
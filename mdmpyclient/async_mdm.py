@@ -0,0 +1,138 @@
+import asyncio
+import functools
+import logging
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from mdmpyclient.mdm import MDM
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+# Métodos que modifican los datos de la colección o del artefacto en el que se llaman
+MUTATING_METHODS = ('put', 'delete', 'add_', 'create', 'init_', 'translate_all')
+
+
+class OwnerLocks:
+    """ Un lock por cada objeto del cliente síncrono en el que se llama a algún método de MUTATING_METHODS,
+    para que las llamadas que modifican una misma colección no se ejecuten a la vez. """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.locks = {}
+
+    def serialized(self, owner, name):
+        """
+
+        Returns: (:class:`Callable`) Método name de owner, que se ejecuta con el lock de owner
+
+        """
+        method = getattr(owner, name)
+        with self.lock:
+            # Se guarda también el objeto para que su id no se reutilice mientras exista el lock
+            _, lock = self.locks.setdefault(id(owner), (owner, threading.Lock()))
+
+        @functools.wraps(method)
+        def call(*args, **kwargs):
+            with lock:
+                return method(*args, **kwargs)
+        return call
+
+
+class AsyncProxy:
+    """ Vista asíncrona de un objeto del cliente síncrono. Cada atributo, elemento o llamada devuelve otra
+    vista, que se resuelve en el executor al esperarla con await, de forma que ni las peticiones a la API
+    ni la carga perezosa de las colecciones bloquean el bucle de eventos:
+
+        dsd = await amdm.dsds.data['ESC01']['DSD_TEST']['1.0']
+        await amdm.dataflows.put(...)
+
+    Las llamadas a los métodos que modifican un objeto (put, delete_all...) se ejecutan de una en una en
+    cada objeto, y las de objetos distintos a la vez.
+
+    Args:
+        resolve (:class:`Callable`): Función sin argumentos que devuelve el objeto síncrono.
+        executor (:class:`concurrent.futures.Executor`): Executor en el que se resuelve el objeto.
+        locks (:class:`OwnerLocks`): Locks de los objetos, compartidos por todas las vistas de un cliente.
+
+    """
+
+    def __init__(self, resolve, executor, locks=None):
+        self._resolve = resolve
+        self._executor = executor
+        self._locks = locks if locks is not None else OwnerLocks()
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        resolve, locks = self._resolve, self._locks
+        if name.startswith(MUTATING_METHODS):
+            return AsyncProxy(lambda: locks.serialized(resolve(), name), self._executor, locks)
+        return AsyncProxy(lambda: getattr(resolve(), name), self._executor, locks)
+
+    def __getitem__(self, key):
+        resolve = self._resolve
+        return AsyncProxy(lambda: resolve()[key], self._executor, self._locks)
+
+    def __call__(self, *args, **kwargs):
+        resolve = self._resolve
+        return AsyncProxy(lambda: resolve()(*args, **kwargs), self._executor, self._locks)
+
+    def __await__(self):
+        return asyncio.get_running_loop().run_in_executor(self._executor, self._resolve).__await__()
+
+
+class AsyncMDM(AsyncProxy):
+    """ Fachada asíncrona de :class:`MDM` para encadenar publicaciones independientes en un mismo bucle de
+    eventos. Da acceso a las mismas colecciones (codelists, dsds, cubes, mappings, dataflows,
+    metadatasets...) a través de :class:`AsyncProxy`, ejecutando las llamadas del cliente síncrono en un
+    ThreadPoolExecutor propio. Todas comparten la sesión de MDM y por tanto su pool de conexiones, así que
+    el número de hilos por defecto es el tamaño de ese pool (clave 'transport' de la configuración). Las
+    colecciones se crean una sola vez aunque varias llamadas accedan a ellas a la vez (ver :class:`MDM`).
+
+    Usar preferentemente con async with, que cierra la sesión y el executor al terminar:
+
+        async with await AsyncMDM.connect(configuracion, translator) as amdm:
+            await asyncio.gather(amdm.cubes.put(...), amdm.dsds.put(...))
+
+    Args:
+        mdm (:obj:`MDM`): Cliente síncrono ya autenticado.
+        max_workers (:class:`Integer`): Número máximo de llamadas simultáneas.
+
+    """
+
+    def __init__(self, mdm, max_workers=None):
+        self.logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.mdm = mdm
+        if max_workers is None:
+            configuracion = mdm.configuracion
+            max_workers = configuracion.get('transport', {}).get('pool_size', max(configuracion.get('max_workers', 1),
+                                                                                  10))
+        super().__init__(lambda: mdm, ThreadPoolExecutor(max_workers=max_workers))
+
+    @classmethod
+    async def connect(cls, configuracion, translator, init_data=False, max_workers=None):
+        """ Crea y autentica el cliente síncrono sin bloquear el bucle de eventos.
+
+        Returns: (:obj:`AsyncMDM`) Fachada asíncrona del cliente
+
+        """
+        mdm = await asyncio.get_running_loop().run_in_executor(None, functools.partial(MDM, configuracion,
+                                                                                       translator, init_data))
+        return cls(mdm, max_workers)
+
+    async def close(self):
+        """ Cierra la sesión en la API y espera a que terminen las llamadas en curso.
+
+        Returns: None
+
+        """
+        await self.logout()
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
@@ -0,0 +1,119 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+
+def artefact_urn(artefact_class, agency, artefact_id, version):
+    """
+
+    Returns: (:class:`String`) URN sdmx del artefacto, por ejemplo
+     urn:sdmx:org.sdmx.infomodel.codelist.Codelist=ESC01:CL_SEXO(1.0)
+
+    """
+    return f'urn:sdmx:org.sdmx.infomodel.{artefact_class}={agency}:{artefact_id}({version})'
+
+
+def content_hash(content):
+    """
+
+    Args:
+        content: (:class:`String`) Contenido, como bytes o cadena de caracteres.
+
+    Returns: (:class:`String`) Hash SHA-256 del contenido
+
+    """
+    return hashlib.sha256(content.encode('utf-8') if isinstance(content, str) else content).hexdigest()
+
+
+class JobJournal:
+    """ Registro persistente de los pasos completados de los trabajos largos (importación de ficheros sdmx,
+    subida de códigos, carga de cubos...). Cada paso se identifica por el trabajo, la URN del artefacto y
+    el hash de su contenido, de forma que al repetir un trabajo que se interrumpió se omiten los pasos que
+    ya se completaron con el mismo contenido y los que han cambiado se vuelven a hacer.
+
+    Se guarda en una base de datos SQLite que se abre la primera vez que se usa. Los pasos de cada nodo del
+    M&D Manager se guardan por separado. Si se borran datos en la API hay que borrar también sus pasos con
+    :meth:`clear`, como hacen MDM.ddb_reset, MDM.delete_all y Codelist.delete.
+
+    Args:
+        path (:class:`String`): Fichero de la base de datos. Con None no se registra ningún paso.
+        node (:class:`String`): Nodo al que pertenecen los pasos. Ver :func:`mdmpyclient.cache.node.node_key`.
+
+    """
+
+    def __init__(self, path, node=''):
+        self.logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.path = path
+        self.node = node
+        self.lock = threading.Lock()
+        self._connection = None
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._connection.execute('CREATE TABLE IF NOT EXISTS completed_steps (node TEXT NOT NULL, '
+                                     'job TEXT NOT NULL, urn TEXT NOT NULL, content_hash TEXT NOT NULL, '
+                                     'completed_at TEXT NOT NULL, PRIMARY KEY (node, job, urn, content_hash)) '
+                                     'WITHOUT ROWID')
+            self._connection.commit()
+        return self._connection
+
+    def done(self, job, urn, content_hash):
+        """
+
+        Returns: (:class:`Boolean`) True si el paso ya se completó con el mismo contenido
+
+        """
+        if not self.path:
+            return False
+        with self.lock:
+            row = self.connection.execute('SELECT 1 FROM completed_steps WHERE node = ? AND job = ? AND urn = ? '
+                                          'AND content_hash = ?', (self.node, job, urn, content_hash)).fetchone()
+        return row is not None
+
+    def record(self, job, urn, content_hash):
+        """ Registra un paso completado.
+
+        Returns: None
+
+        """
+        if not self.path:
+            return
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO completed_steps VALUES (?, ?, ?, ?, ?)',
+                                    (self.node, job, urn, content_hash, datetime.now().isoformat()))
+            self.connection.commit()
+
+    def clear(self, job=None, urn=None):
+        """ Borra los pasos registrados del nodo: todos, los de un trabajo o solo los de un artefacto si se
+        indica además su URN.
+
+        Returns: None
+
+        """
+        if not self.path:
+            return
+        query, parameters = 'DELETE FROM completed_steps WHERE node = ?', [self.node]
+        if job is not None:
+            query, parameters = query + ' AND job = ?', parameters + [job]
+        if urn is not None:
+            query, parameters = query + ' AND urn = ?', parameters + [urn]
+        with self.lock:
+            self.connection.execute(query, parameters)
+            self.connection.commit()
+        self.logger.info('Borrados los pasos registrados de %s', job or 'todos los trabajos')
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
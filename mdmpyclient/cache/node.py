@@ -0,0 +1,30 @@
+import os
+import re
+
+
+def node_key(configuracion):
+    """
+
+    Args:
+        configuracion: (:class:`Diccionario`) Configuración con la url de la API y el nodo.
+
+    Returns: (:class:`String`) Identificador del nodo del M&D Manager al que se conecta el cliente, para
+     distinguir los datos guardados en local de cada nodo
+
+    """
+    return f'{configuracion["url_base"]}#{configuracion.get("nodeId", "")}'
+
+
+def node_directory(directory, node):
+    """
+
+    Args:
+        directory: (:class:`String`) Directorio de los datos guardados en local, o None si están desactivados.
+        node: (:class:`String`) Identificador del nodo. Ver :func:`node_key`.
+
+    Returns: (:class:`String`) Subdirectorio de directory con los datos del nodo, o None si directory es None
+
+    """
+    if not directory:
+        return None
+    return os.path.join(directory, re.sub(r'[^\w.-]+', '_', node).strip('_'))
@@ -0,0 +1,116 @@
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+
+import pandas
+
+from mdmpyclient.cache.node import node_directory
+
+try:
+    import pyarrow
+except ImportError:  # pyarrow es opcional, sin él las copias se guardan en pickle
+    pyarrow = None
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+FORMAT = 'parquet' if pyarrow else 'pickle'
+
+
+class SnapshotStore:
+    """ Copias locales de los datos que contiene cada cubo, en directory/<nodo>/<id del cubo>/<fecha>.
+    Se guardan en Parquet si está instalado pyarrow (pip install MDMPyClient[snapshot]) y si no en pickle,
+    en ambos casos con los tipos de las columnas. De cada cubo se conservan las keep copias más recientes.
+
+    Las copias solo reflejan los cambios que hace este cliente, así que hay que borrarlas con :meth:`delete`
+    cuando se vacían los cubos, como hace MDM.ddb_reset.
+
+    Args:
+        directory (:class:`String`): Directorio de las copias. Con None no se guarda ninguna copia.
+        keep (:class:`Integer`): Número de copias que se conservan de cada cubo.
+        node (:class:`String`): Nodo al que pertenecen los cubos. Ver :func:`mdmpyclient.cache.node.node_key`.
+
+    """
+
+    def __init__(self, directory, keep=3, node=''):
+        self.logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.directory = node_directory(directory, node)
+        self.keep = keep
+
+    def paths(self, cube_id):
+        """
+
+        Args:
+            cube_id: (:class:`Integer`) Identificador del cubo.
+
+        Returns: (:class:`List`) Copias del cubo, de la más antigua a la más reciente
+
+        """
+        if not self.directory:
+            return []
+        directory = os.path.join(self.directory, str(cube_id))
+        if not os.path.isdir(directory):
+            return []
+        return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                      if name.endswith(('.parquet', '.pickle')))
+
+    def save(self, cube_id, data):
+        """ Guarda una copia de los datos del cubo con la fecha actual y borra las copias más antiguas.
+
+        Returns: (:class:`String`) Fichero de la copia, o None si las copias están desactivadas
+
+        """
+        if not self.directory:
+            return None
+        directory = os.path.join(self.directory, str(cube_id))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{datetime.now():%Y%m%dT%H%M%S%f}.{FORMAT}')
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            if FORMAT == 'parquet':
+                data.to_parquet(tmp_path, index=False)
+            else:
+                data.reset_index(drop=True).to_pickle(tmp_path, compression='gzip')
+            os.replace(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        for old in self.paths(cube_id)[:-self.keep]:
+            os.remove(old)
+        self.logger.info('Guardada copia de %s filas del cubo con id %s en %s', len(data), cube_id, path)
+        return path
+
+    def load(self, cube_id):
+        """
+
+        Args:
+            cube_id: (:class:`Integer`) Identificador del cubo.
+
+        Returns: (:class:`pandas.DataFrame`) La copia más reciente de los datos del cubo, o None si no hay
+
+        """
+        paths = self.paths(cube_id)
+        if not paths:
+            return None
+        path = paths[-1]
+        if path.endswith('.parquet'):
+            return pandas.read_parquet(path)
+        return pandas.read_pickle(path, compression='gzip')
+
+    def delete(self, cube_id=None):
+        """ Borra las copias de un cubo, o las de todos los cubos del nodo si no se indica ninguno.
+
+        Returns: None
+
+        """
+        if not self.directory:
+            return
+        directory = self.directory if cube_id is None else os.path.join(self.directory, str(cube_id))
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+            self.logger.info('Borradas las copias locales %s', f'del cubo con id {cube_id}' if cube_id is not None
+                             else 'de todos los cubos')
@@ -0,0 +1,152 @@
+import gzip
+import json
+import logging
+import os
+import sys
+import tempfile
+
+from mdmpyclient.cache.node import node_directory
+from mdmpyclient.utils.json_stream import iter_json_items
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+
+class StructureCache:
+    """ Caché en disco de las respuestas de estructura de la NODE_API. Cada respuesta se guarda tal cual
+    llega, comprimida, en directory/nodo/tipo/agencia/id/version.json.gz y su ETag en un fichero .etag al
+    lado.
+
+    Los artefactos finales se sirven directamente de la caché. El resto se revalidan con una
+    petición condicional (If-None-Match) y solo se descargan de nuevo si han cambiado.
+
+    Args:
+        directory (:class:`String`): Directorio donde se guarda la caché. Con None la caché está
+         desactivada y todas las peticiones se hacen a la API.
+        node (:class:`String`): Nodo al que pertenecen los artefactos. Ver :func:`mdmpyclient.cache.node.node_key`.
+
+    """
+
+    def __init__(self, directory, node=''):
+        self.logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.directory = node_directory(directory, node)
+
+    def path(self, key):
+        """
+
+        Args:
+            key: (:class:`Tuple`) Clave del artefacto, por ejemplo ('codelist', agencia, id, versión)
+
+        Returns: (:class:`String`) Ruta del fichero de la caché
+
+        """
+        return os.path.join(self.directory, *key) + '.json.gz'
+
+    def load(self, key):
+        if not self.directory:
+            return None
+        try:
+            with gzip.open(self.path(key), 'rb') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, key, data, etag=None):
+        if not self.directory:
+            return
+        self.__store(key, [json.dumps(data).encode('utf-8')], etag)
+
+    def delete(self, key):
+        if not self.directory:
+            return
+        for path in (self.path(key), self.path(key) + '.etag'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def get_json(self, session, url, key, is_final=False):
+        """ Obtiene la respuesta JSON de una url consultando antes la caché.
+
+        Args:
+            session: (:class:`requests.session.Session`) Sesión autenticada en la API.
+            url: (:class:`String`) Url de la petición.
+            key: (:class:`Tuple`) Clave del artefacto en la caché.
+            is_final: (:class:`Boolean`) True si el artefacto es final y no necesita revalidarse.
+
+        Returns: Respuesta de la API ya decodificada
+
+        """
+        if not self.directory:
+            return session.get(url, headers={}).json()
+        with self.open(session, url, key, is_final) as file:
+            data = json.load(file)
+        if isinstance(data, dict) and 'errorCode' in data:
+            self.delete(key)
+        return data
+
+    def iter_items(self, session, url, key, prefix, is_final=False):
+        """ Igual que get_json, pero recorre los elementos bajo un prefijo sin decodificar la respuesta
+        completa. Ver :func:`mdmpyclient.utils.json_stream.iter_json_items`.
+
+        Returns: (:class:`Generator`) Elementos encontrados bajo el prefijo
+
+        """
+        found = False
+        with self.open(session, url, key, is_final) as file:
+            for item in iter_json_items(file, prefix):
+                found = True
+                yield item
+        # Una respuesta de error no tiene elementos bajo el prefijo; no debe quedarse en la caché
+        if not found and self.directory:
+            data = self.load(key)
+            if isinstance(data, dict) and 'errorCode' in data:
+                self.delete(key)
+
+    def open(self, session, url, key, is_final=False):
+        """
+
+        Returns: (:class:`io.BufferedIOBase`) Fichero binario con el cuerpo JSON de la respuesta,
+         leído de la caché o directamente de la conexión con la API
+
+        """
+        path = self.path(key) if self.directory else None
+        cached = path is not None and os.path.exists(path)
+        if cached and is_final:
+            self.logger.info('Artefacto %s obtenido de la caché', '/'.join(key))
+            return gzip.open(path, 'rb')
+        etag = self.__load_etag(key) if cached else None
+        response = session.get(url, headers={'If-None-Match': etag} if etag else {}, stream=True)
+        if cached and response.status_code == 304:
+            response.close()
+            self.logger.info('Artefacto %s sin cambios, obtenido de la caché', '/'.join(key))
+            return gzip.open(path, 'rb')
+        if not path or not response.ok:
+            response.raw.decode_content = True
+            return response.raw
+        self.__store(key, response.iter_content(chunk_size=65536), response.headers.get('ETag'))
+        return gzip.open(path, 'rb')
+
+    def __load_etag(self, key):
+        try:
+            with open(self.path(key) + '.etag', 'r', encoding='utf-8') as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def __store(self, key, chunks, etag):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tmp_file, gzip.open(tmp_file, 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
+        os.replace(tmp_path, path)
+        if etag:
+            with open(path + '.etag', 'w', encoding='utf-8') as file:
+                file.write(etag)
+        else:
+            try:
+                os.remove(path + '.etag')
+            except FileNotFoundError:
+                pass
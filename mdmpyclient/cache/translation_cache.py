@@ -0,0 +1,141 @@
+import logging
+import sys
+import threading
+import time
+
+from mdmpyclient.cache.translation_store import SqliteTranslationStore, YamlTranslationStore
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+
+class TranslationCache:
+    """ Caché de traducciones con escritura diferida. Las traducciones nuevas se guardan en memoria y
+    solo se escriben en el almacén cuando hay cambios pendientes y han pasado flush_interval segundos,
+    se acumulan flush_size traducciones nuevas o se llama a flush, por ejemplo desde MDM.logout.
+
+    El almacén se elige con backend: 'yaml' guarda la caché en un fichero YAML que se carga entero al
+    arrancar y se reescribe a un temporal que después se renombra, de forma que nunca queda a medias;
+    'sqlite' la guarda en una base de datos con una fila por (texto original, idioma), que no hay que
+    cargar al arrancar. La primera vez que se usa 'sqlite' se importa el fichero YAML de la caché.
+
+    Las traducciones se identifican por (texto original, idioma), con el idioma en minúsculas y sin
+    variante ('EN-GB' y 'en' son la misma clave), de forma que cada idioma de un texto se guarda sin
+    afectar a los demás. La caché cuenta los aciertos, los fallos y las peticiones a deepl realizadas.
+
+    Args:
+        path (:class:`String`): Fichero YAML de la caché. Con None la caché solo existe en memoria.
+        flush_interval (:class:`Integer`): Segundos como máximo que una traducción nueva
+         puede esperar en memoria antes de escribirse en el almacén.
+        flush_size (:class:`Integer`): Número de traducciones nuevas a partir del cual se escriben
+         en el almacén sin esperar.
+        backend (:class:`String`): 'yaml' o 'sqlite'. Por defecto 'yaml'.
+        database (:class:`String`): Fichero de la base de datos si backend es 'sqlite'.
+
+    """
+
+    def __init__(self, path, flush_interval=60, flush_size=500, backend='yaml', database=None):
+        self.logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.lock = threading.RLock()
+        self.timer = None
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.requests = 0
+        if backend == 'sqlite':
+            self.store = SqliteTranslationStore(database, path)
+        elif backend == 'yaml':
+            self.store = YamlTranslationStore(path)
+        else:
+            raise ValueError(f'Almacén de traducciones desconocido: {backend}')
+
+    @property
+    def dirty(self):
+        return bool(self.pending)
+
+    @staticmethod
+    def key(text, language):
+        """
+
+        Args:
+            text: (:class:`String`) Texto original.
+            language: (:class:`String`) Idioma de la traducción, por ejemplo 'en' o 'EN-GB'.
+
+        Returns: (:class:`Tuple`) Clave de la traducción en la caché
+
+        """
+        return text, language.split('-')[0].lower()
+
+    def get(self, text, language):
+        """ Busca una traducción sin modificar los contadores.
+
+        Returns: (:class:`String`) La traducción, o None si no está en la caché
+
+        """
+        key = self.key(text, language)
+        translation = self.pending.get(key)
+        return translation if translation is not None else self.store.get(*key)
+
+    def lookup(self, text, language):
+        """ Igual que get, pero cuenta la búsqueda como un acierto o un fallo de la caché.
+
+        Returns: (:class:`String`) La traducción, o None si no está en la caché
+
+        """
+        translation = self.get(text, language)
+        with self.lock:
+            if translation is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return translation
+
+    def count_request(self):
+        with self.lock:
+            self.requests += 1
+
+    def stats(self):
+        """
+
+        Returns: (:class:`Diccionario`) Aciertos, fallos y peticiones a deepl realizadas. saved_requests son
+         las peticiones que se habrían hecho traduciendo cada búsqueda por separado y sin caché.
+
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'requests': self.requests,
+                    'hit_ratio': self.hits / lookups if lookups else 0.0,
+                    'saved_requests': lookups - self.requests}
+
+    def set(self, text, language, translation):
+        with self.lock:
+            self.pending[self.key(text, language)] = translation
+            if len(self.pending) >= self.flush_size:
+                self.flush()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.flush_interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        """ Escribe en el almacén las traducciones nuevas pendientes de guardar, si las hay.
+
+        Returns: None
+
+        """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if not self.dirty:
+                return
+            start = time.time()
+            self.store.write(self.pending)
+            self.logger.info('Guardadas %s traducciones nuevas en %.2f s', len(self.pending), time.time() - start)
+            self.pending = {}
+
+    def close(self):
+        self.flush()
+        self.store.close()
@@ -0,0 +1,135 @@
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import yaml
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+
+class YamlTranslationStore:
+    """ Almacén de traducciones en un fichero YAML con los textos originales como claves y diccionarios
+    de idioma a traducción como valores. El fichero se carga entero en memoria al crear el objeto y se
+    reescribe entero en cada escritura.
+
+    Args:
+        path (:class:`String`): Fichero YAML. Con None las traducciones solo se guardan en memoria.
+
+    """
+
+    def __init__(self, path):
+        self.logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.path = path
+        self.data = self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        start = time.time()
+        with open(self.path, 'r', encoding='utf-8') as file:
+            data = yaml.safe_load(file) or {}
+        self.logger.info('Cargados %s textos de %s en %.2f s', len(data), self.path, time.time() - start)
+        return data
+
+    def get(self, text, language):
+        return self.data.get(text, {}).get(language)
+
+    def write(self, translations):
+        """
+
+        Args:
+            translations: (:class:`Diccionario`) Traducciones con claves (texto original, idioma).
+
+        Returns: None
+
+        """
+        for (text, language), translation in translations.items():
+            self.data.setdefault(text, {})[language] = translation
+        if not self.path:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                yaml.dump(self.data, file)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    def __len__(self):
+        return len(self.data)
+
+    def close(self):
+        pass
+
+
+class SqliteTranslationStore:
+    """ Almacén de traducciones en una base de datos SQLite con una fila por (texto original, idioma).
+    No hace falta cargar nada al crear el objeto y cada consulta usa la clave primaria de la tabla.
+
+    Args:
+        path (:class:`String`): Fichero de la base de datos. Se crea si no existe.
+        yaml_path (:class:`String`): Fichero YAML de la caché anterior. Si la base de datos se acaba de
+         crear y el fichero existe, sus traducciones se importan una única vez.
+
+    """
+
+    def __init__(self, path, yaml_path=None):
+        self.logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.path = path
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            created = not self.connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'translations'").fetchone()
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS translations (source_text TEXT NOT NULL, target_lang TEXT NOT NULL, '
+                'translation TEXT NOT NULL, PRIMARY KEY (source_text, target_lang)) WITHOUT ROWID')
+        if created and yaml_path and os.path.exists(yaml_path):
+            self.import_yaml(yaml_path)
+
+    def import_yaml(self, yaml_path):
+        """ Importa las traducciones de una caché en formato YAML. Las que ya existan se sobrescriben.
+
+        Args:
+            yaml_path: (:class:`String`) Fichero YAML de la caché.
+
+        Returns: (:class:`Integer`) Número de traducciones importadas
+
+        """
+        start = time.time()
+        data = YamlTranslationStore(yaml_path).data
+        translations = {(str(text), language): str(translation) for text, languages in data.items()
+                        for language, translation in (languages or {}).items()}
+        self.write(translations)
+        self.logger.info('Importadas %s traducciones de %s en %.2f s', len(translations), yaml_path,
+                         time.time() - start)
+        return len(translations)
+
+    def get(self, text, language):
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT translation FROM translations WHERE source_text = ? AND target_lang = ?',
+                (text, language)).fetchone()
+        return row[0] if row else None
+
+    def write(self, translations):
+        with self.lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO translations (source_text, target_lang, translation) VALUES (?, ?, ?)',
+                [(text, language, translation) for (text, language), translation in translations.items()])
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(DISTINCT source_text) FROM translations').fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
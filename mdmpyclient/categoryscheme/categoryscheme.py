@@ -3,8 +3,12 @@ import logging
 import sys
 import os
 import pandas
-import requests
-import yaml
+
+from mdmpyclient.session.multipart import MultipartEncoder
+from mdmpyclient.translation.translation_service import TranslationService
+from mdmpyclient.utils.json_stream import iter_json_items
+from mdmpyclient.utils.sdmx_export import download_to_file
+from mdmpyclient.utils.upload_buffer import UploadBuffer
 
 fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
 logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
@@ -26,7 +30,9 @@ class CategoryScheme:
         des (class: `String`): Diccionario con las descripciones del esquema de categorías
          en varios idiomas.
         init_data (class: `Boolean`): True para traer todos los datos del esquema de
-         categorías, False para traer solo id, agencia y versión. Por defecto toma el valor False.
+         categorías, False para traerlos la primera vez
+         que se acceda a ellos. Por defecto toma el valor False.
+        is_final (:class:`Boolean`): True si el esquema de categorías es final en la API.
 
     Attributes:
         categories (:obj:`DataFrame`): DataFrame con todas las categorías del esquema
@@ -34,20 +40,48 @@ class CategoryScheme:
     """
 
     def __init__(self, session, configuracion, translator, translator_cache, category_scheme_id, agency_id, version,
-                 names, des, init_data=False):
+                 names, des, init_data=False, is_final=False):
         self.logger = logging.getLogger(f'{self.__class__.__name__}')
 
         self.session = session
         self.configuracion = configuracion
         self.translator = translator
         self.translator_cache = translator_cache
+        self.translation_service = TranslationService(configuracion, translator, translator_cache)
         self.id = category_scheme_id
         self.agency_id = agency_id
         self.version = version
         self.names = names
         self.des = des
-        self.categories = self.get(init_data)
-        self.categories_to_upload = pandas.DataFrame(columns=['Id', 'ParentCode', 'Name', 'Description'])
+        self.is_final = is_final
+        self._categories = self.get(init_data) if init_data else None
+        self._category_ids = None
+        self.upload_buffer = UploadBuffer(['Id', 'ParentCode', 'Name', 'Description'])
+
+    @property
+    def categories(self):
+        if self._categories is None:
+            self._categories = self.get(True)
+        return self._categories
+
+    @categories.setter
+    def categories(self, categories):
+        self._categories = categories
+        self._category_ids = None
+
+    @property
+    def category_ids(self):
+        if self._category_ids is None:
+            self._category_ids = set(self.categories.id.dropna())
+        return self._category_ids
+
+    @property
+    def categories_to_upload(self):
+        return self.upload_buffer.to_frame()
+
+    @categories_to_upload.setter
+    def categories_to_upload(self, categories_to_upload):
+        self.upload_buffer.set_frame(categories_to_upload)
 
     def get(self, init_data):
         categories = {'id': [], 'parent': [], 'id_cube_cat': []}
@@ -57,18 +91,17 @@ class CategoryScheme:
         if init_data:
             self.logger.info('Solicitando información del esquema de categorías con id: %s', self.id)
             try:
-                response = self.session.get(
-                    f'{self.configuracion["url_base"]}categoryScheme/{self.id}/{self.agency_id}/{self.version}')
-                response_data = response.json()['data']['categorySchemes'][0]['categories']
                 response_dcs = self.session.get(f'{self.configuracion["url_base"]}dcs').json()
-                response.raise_for_status()
-            except KeyError:
+                response = self.session.get(
+                    f'{self.configuracion["url_base"]}categoryScheme/{self.id}/{self.agency_id}/{self.version}',
+                    stream=True)
+            except Exception as e:
+                raise e
+            if not response.ok:
                 self.logger.error(
                     'Ha ocurrido un error mientras se cargaban los datos del esquema de categorías con id: %s', self.id)
                 self.logger.error(response.text)
                 return pandas.DataFrame(data=categories, dtype='string')
-            except Exception as e:
-                raise e
             if 'errorCode' not in response_dcs:
                 self.logger.info('Esquema de categorías extraído correctamente')
             else:
@@ -76,7 +109,11 @@ class CategoryScheme:
                     'Ha ocurrido un error en la extracción del sistema de categorías, pruebe a establecer un sistema de'
                     ' categorías para los cubos')
             dcs = self.__dcs_to_dict(response_dcs)
-            categories = self.__merge_categories(response_data, None, dcs, categories)
+            response.raw.decode_content = True
+            # Las categorías de primer nivel se decodifican de una en una según llegan
+            with response:
+                response_data = iter_json_items(response.raw, 'data.categorySchemes.item.categories.item')
+                categories = self.__merge_categories(response_data, None, dcs, categories)
         return pandas.DataFrame(data=categories, dtype='string')
 
     def get_sdmx(self, directory):
@@ -85,22 +122,16 @@ class CategoryScheme:
         Args:
             directory: Obtiene el esquema de categorías en formato sdmx.
 
-        Returns: None
+        Returns: (:class:`Integer`) Bytes escritos
 
         """
         self.logger.info('Obteniendo esquema de categoría con id %s en formato sdmx', self.id)
-        try:
-
-            response = self.session.get(
-                f'{self.configuracion["url_base"]}downloadMetadati/categoryScheme/{self.id}/{self.agency_id}/'
-                f'{self.version}/structure/true/false/es')
-            response.raise_for_status()
-        except Exception as e:
-            raise e
         path = os.path.join(directory, self.id + '.xml')
-        with open(path, 'w', encoding='utf-8') as file:
-            file.write(response.text)
-            file.close()
+        return download_to_file(
+            self.session,
+            f'{self.configuracion["url_base"]}downloadMetadati/categoryScheme/{self.id}/{self.agency_id}/'
+            f'{self.version}/structure/true/false/es',
+            path)
 
     def add_category(self, category_id, parent, name, des):
         """
@@ -114,8 +145,9 @@ class CategoryScheme:
         Returns: None
 
         """
-        if category_id.upper() not in self.categories_to_upload.Id.values:
-            self.categories_to_upload.loc[len(self.categories_to_upload)] = [category_id.upper(), parent, name, des]
+        category_id = category_id.upper()
+        if category_id not in self.category_ids and category_id not in self.upload_buffer:
+            self.upload_buffer.append([category_id, parent, name, des])
 
     def put(self, lang='es'):
         to_upload = len(self.categories_to_upload)
@@ -147,7 +179,7 @@ class CategoryScheme:
         Returns: None
 
         """
-        if cube_id not in self.categories.id.values:
+        if cube_id not in self.category_ids:
             json = {"catCode": cube_id, "parCode": parent, "ord": None, "labels": names}
             try:
                 response = self.session.post(f'{self.configuracion["url_base"]}InsertDCS', json=json)
@@ -259,9 +291,8 @@ class CategoryScheme:
         files = {'file': (
             'potato.csv', csv, 'application/vnd.ms-excel', {}),
             'CustomData': (None, custom_data)}
-        body, content_type = requests.models.RequestEncodingMixin._encode_files(files, {})
-        body = body.decode('utf-8')
-        upload_headers['Content-Type'] = content_type
+        body = MultipartEncoder(files)
+        upload_headers['Content-Type'] = body.content_type
         upload_headers['language'] = lang
         try:
             self.logger.info('Subiendo categorías a la API')
@@ -345,51 +376,9 @@ class CategoryScheme:
                 self.__export_csv(response)
 
     def __translate(self, data):
-        columns = data.columns[3:]
-        categories = data.copy()
-        codes_translated = pandas.DataFrame(columns=categories.columns)
-        for column in columns:
-            target_language = column[-2:]
-            source_languages = self.configuracion['languages'].copy()
-            source_languages.remove(target_language)
-            if target_language == 'en':
-                target_language = 'EN-GB'
-            source_language = source_languages[-1]
-            source_column = column[:-2] + source_language
-            to_be_translated_indexes = categories[categories[column].isnull()][column].index
-            fake_indexes = categories[categories[source_column].isnull()][source_column].index
-            to_be_translated_indexes = to_be_translated_indexes.difference(fake_indexes, sort=False)
-            indexes_size = len(to_be_translated_indexes)
-            if not indexes_size:
-                continue
-            categories[column][to_be_translated_indexes] = categories[source_column][to_be_translated_indexes].map(
-                lambda value, tl=target_language: self.__get_translate(value, tl))
-
-            with open(f'{self.configuracion["cache"]}', 'w', encoding='utf=8') as file:
-                yaml.dump(self.translator_cache, file)
-            codes_translated = pandas.concat(
-                [codes_translated, categories.iloc[to_be_translated_indexes]])  # Se guardan los codigos traducidos
+        categories_translated = self.translation_service.translate_columns(data, data.columns[3:])
         self.logger.info('Proceso de traducción finalizado')
-        return codes_translated
-
-    def __get_translate(self, value, target_language):
-        self.logger.info('Traduciendo el término %s al %s', value, target_language)
-        if 'EN-GB' in target_language:
-            target_language = 'en'
-        if value in self.translator_cache and target_language in self.translator_cache[value]:
-            self.logger.info('Valor encontrado en la caché de traducciones')
-            translation = self.translator_cache[value][target_language]
-        else:
-            if 'en' in target_language:
-                target_language = 'EN-GB'
-            self.logger.info('Realizando petición a deepl para traducir el valor %s al %s', value, target_language)
-            translation = str(self.translator.translate_text(value, target_lang=target_language))
-            if 'EN-GB' in target_language:
-                target_language = 'en'
-            self.translator_cache[value] = {}
-            self.translator_cache[value][target_language] = translation
-        self.logger.info('Traducido el término %s como %s', value, translation)
-        return translation
+        return categories_translated
 
     def init_categories(self):
         self.categories = self.get(True)
@@ -6,6 +6,7 @@ import copy
 import requests
 
 from mdmpyclient.categoryscheme.categoryscheme import CategoryScheme
+from mdmpyclient.utils.sdmx_export import export_all
 
 fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
 logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
@@ -65,23 +66,26 @@ class CategorySchemes:
                 category_schemes[agency][category_scheme_id] = {}
             cs = CategoryScheme(self.session, self.configuracion, self.translator,
                                 self.translator_cache, category_scheme_id, agency,
-                                version, names, des, init_data=init_data)
+                                version, names, des, init_data=init_data,
+                                is_final=str(category_scheme.get('isFinal')).lower() == 'true')
             category_schemes[agency][category_scheme_id][version] = cs
             self.categoryscheme_list.append(cs)
         return category_schemes
 
-    def get_all_sdmx(self, directory):
+    def get_all_sdmx(self, directory, incremental=False):
         """
 
               Args:
                   directory: (:class:`String`) Directorio donde se van a guardar todas los esquemas de categoría en formato sdmx
+                  incremental: (:class:`Boolean`) True para descargar solo los esquemas nuevos o no finales,
+                   según el manifiesto del directorio
 
-              Returns: None
+              Returns: (:class:`Integer`) Bytes escritos
 
               """
         self.logger.info('Obteniendo todos los esquemas de categoría en formato sdmx')
-        for cs in self.categoryscheme_list:
-            cs.get_sdmx(directory)
+        return export_all(self.categoryscheme_list, directory, 'esquemas de categorías',
+                          self.configuracion.get('max_workers', 1), incremental)
 
     def put(self, agencia, cat_id, version, descripciones, nombres):
         json = {'data': {'categorySchemes': [
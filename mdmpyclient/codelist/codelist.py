@@ -3,11 +3,18 @@ import logging
 import sys
 import os
 import pandas
-import requests.models
-import yaml
 
 from ftfy import fix_encoding
 
+from mdmpyclient.cache.job_journal import JobJournal, artefact_urn, content_hash
+from mdmpyclient.cache.node import node_key
+from mdmpyclient.cache.structure_cache import StructureCache
+from mdmpyclient.session.multipart import MultipartEncoder
+from mdmpyclient.translation.translation_service import TranslationService
+from mdmpyclient.utils.columns import item_columns
+from mdmpyclient.utils.sdmx_export import download_to_file
+from mdmpyclient.utils.upload_buffer import UploadBuffer
+
 fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
 logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
 
@@ -26,7 +33,13 @@ class Codelist:
         names (class: `Diccionario`): Diccionario con los nombres de la codelist en varios idiomas.
         des (class: `String`): Diccionario con las descripciones de la codelist en varios idiomas.
         init_data (:class:`Boolean`): True para traer todos los datos de la codelist,
-         False para no traerlos. Por defecto toma el valor False.
+         False para traerlos la primera vez que
+         se acceda a ellos. Por defecto toma el valor False.
+        structure_cache (:class:`StructureCache`): Caché de estructuras en disco. Por defecto se
+         usa la indicada en la clave 'structure_cache' de la configuración, si existe.
+        is_final (:class:`Boolean`): True si la codelist es final en la API.
+        job_journal (:class:`JobJournal`): Registro de trabajos del cliente, normalmente el de
+         :class:`MDM`. Por defecto no se registra ningún paso.
 
     Attributes:
 
@@ -35,60 +48,74 @@ class Codelist:
     """
 
     def __init__(self, session, configuracion, translator, translator_cache, codelist_id, agency_id, version, names,
-                 des, init_data=False):
+                 des, init_data=False, structure_cache=None, is_final=False, job_journal=None):
         self.logger = logging.getLogger(f'{self.__class__.__name__}')
 
         self.session = session
         self.configuracion = configuracion
         self.translator = translator
         self.translator_cache = translator_cache
+        self.translation_service = TranslationService(configuracion, translator, translator_cache)
         self.id = codelist_id
         self.version = version
         self.agency_id = agency_id
         self.names = names
         self.des = des
-        self.codes = self.get(init_data)
-        self.codes_to_upload = pandas.DataFrame(columns=['Id', 'ParentCode', 'Name', 'Description'], dtype='string')
+        self.structure_cache = structure_cache if structure_cache else StructureCache(
+            configuracion.get('structure_cache'), node_key(configuracion))
+        self.is_final = is_final
+        self._codes = self.get(init_data) if init_data else None
+        self._code_ids = None
+        self.job_journal = job_journal if job_journal else JobJournal(None)
+        self.upload_buffer = UploadBuffer(['Id', 'ParentCode', 'Name', 'Description'], 'string')
+
+    @property
+    def codes(self):
+        if self._codes is None:
+            self._codes = self.get(True)
+        return self._codes
+
+    @codes.setter
+    def codes(self, codes):
+        self._codes = codes
+        self._code_ids = None
+
+    @property
+    def code_ids(self):
+        if self._code_ids is None:
+            self._code_ids = set(self.codes.id.dropna())
+        return self._code_ids
+
+    @property
+    def codes_to_upload(self):
+        return self.upload_buffer.to_frame()
+
+    @codes_to_upload.setter
+    def codes_to_upload(self, codes_to_upload):
+        self.upload_buffer.set_frame(codes_to_upload)
+
+    @property
+    def cache_key(self):
+        return 'codelist', self.agency_id, self.id, self.version
 
     def get(self, init_data):
-        codes = {'id': [], 'parent': []}
-        for language in self.configuracion['languages']:
-            codes[f'name_{language}'] = []
-            codes[f'des_{language}'] = []
+        codes = item_columns([], self.configuracion['languages'])
         if init_data:
-            try:
-                response = self.session.get(
-                    f'{self.configuracion["url_base"]}codelist/{self.id}/{self.agency_id}/{self.version}/1/2147483647')
-                response_data = response.json()['data']['codelists'][0]['codes']
-
-            except KeyError:
-                if 'data' in response.json().keys():
-                    self.logger.warning('La codelist con id: %s está vacía', self.id)
-                else:
-                    self.logger.error(
-                        'Ha ocurrido un error mientras se cargaban los datos de la codelist con id: %s', self.id)
-                    self.logger.error(response.text)
-                return pandas.DataFrame(data=codes, dtype='string')
-
-            except Exception as e:
-                raise e
-
-            for code in response_data:
-                for key, column in codes.items():
-                    try:
-                        if 'id' in key or 'parent' in key:
-                            column.append(code[key])
-                        else:
-                            language = key[-2:]
-                            if 'name' in key:
-                                column.append(code['names'][language])
-                            if 'des' in key:
-                                column.append(code['descriptions'][language])
-
-                    except Exception:
-                        column.append(None)
+            # Los códigos se decodifican de uno en uno según llegan, sin cargar la respuesta completa
+            response_data = self.structure_cache.iter_items(
+                self.session,
+                f'{self.configuracion["url_base"]}codelist/{self.id}/{self.agency_id}/{self.version}/1/2147483647',
+                self.cache_key, 'data.codelists.item.codes.item', self.is_final)
+
+            codes = item_columns(response_data, self.configuracion['languages'])
+            if not codes['id']:
+                self.logger.warning('La codelist con id: %s está vacía o no se ha podido cargar', self.id)
         return pandas.DataFrame(data=codes, dtype='string')
 
+    @property
+    def urn(self):
+        return artefact_urn('codelist.Codelist', self.agency_id, self.id, self.version)
+
     def delete(self):
         self.logger.info('Eliminando la codelist con id %s', self.id)
         try:
@@ -97,6 +124,8 @@ class Codelist:
             response.raise_for_status()
         except Exception as e:
             raise e
+        self.structure_cache.delete(self.cache_key)
+        self.job_journal.clear('codelist_codes', self.urn)
         if response.text.lower() == 'true':
             self.logger.info('Codelist eliminada correctamente')
         else:
@@ -108,21 +137,16 @@ class Codelist:
         Args:
             directory: (:class:`String`) Directorio en el que se escribira el fichero con la codelist en formato sdmx
 
-        Returns: None
+        Returns: (:class:`Integer`) Bytes escritos
 
         """
         self.logger.info('Obteniendo codelist con id %s en formato sdmx', self.id)
-        try:
-            response = self.session.get(
-                f'{self.configuracion["url_base"]}downloadMetadati/codelist/{self.id}/{self.agency_id}/'
-                f'{self.version}/structure/true/false/es')
-            response.raise_for_status()
-        except Exception as e:
-            raise e
         path = os.path.join(directory, self.id + '.xml')
-        with open(path, 'w', encoding='utf-8') as file:
-            file.write(response.text)
-            file.close()
+        return download_to_file(
+            self.session,
+            f'{self.configuracion["url_base"]}downloadMetadati/codelist/{self.id}/{self.agency_id}/'
+            f'{self.version}/structure/true/false/es',
+            path)
 
     def add_code(self, code_id, parent, name, des):
         """
@@ -136,12 +160,13 @@ class Codelist:
         Returns: None
 
         """
-        if code_id.upper() not in self.codes.id.values:
+        code_id = code_id.upper()
+        if code_id not in self.code_ids and code_id not in self.upload_buffer:
             if name:
                 name = fix_encoding(name)
             if des:
                 des = fix_encoding(des)
-            self.codes_to_upload.loc[len(self.codes_to_upload)] = [code_id.upper(), parent, name, des]
+            self.upload_buffer.append([code_id, parent, name, des])
 
     def add_codes(self, codes):
         """
@@ -163,19 +188,33 @@ class Codelist:
     def put(self, lang='es'):
         to_upload = len(self.codes_to_upload)
         if to_upload:
-            csv = self.codes_to_upload.drop_duplicates(subset='Id')
-            to_upload = len(csv)
+            codes = self.codes_to_upload.drop_duplicates(subset='Id')
+            to_upload = len(codes)
             self.logger.info('Se han detectado %s códigos para subir a la codelist con id %s', to_upload, self.id)
-            csv = csv.to_csv(sep=';', index=False, encoding='utf_8')
-            columns = {"id": 0, "name": 2, "description": 3, "parent": 1, "order": -1, "fullName": -1,
-                       "isDefault": -1}
-            response = self.__upload_csv(csv, columns, lang=lang)
-            self.__import_csv(response)
-            # self.init_codes()
+            csv = codes.to_csv(sep=';', index=False, encoding='utf_8')
+            csv_hash = content_hash(f'{lang}\n{csv}')
+            if self.job_journal.done('codelist_codes', self.urn, csv_hash):
+                self.logger.info('Los códigos de la codelist con id %s ya se subieron en una ejecución anterior',
+                                 self.id)
+            else:
+                columns = {"id": 0, "name": 2, "description": 3, "parent": 1, "order": -1, "fullName": -1,
+                           "isDefault": -1}
+                response = self.__upload_csv(csv, columns, lang=lang)
+                self.__import_csv(response)
+                self.job_journal.record('codelist_codes', self.urn, csv_hash)
+            self.__merge_uploaded_codes(codes, lang)
             self.codes_to_upload = self.codes_to_upload[0:0]
         else:
             self.logger.info('La codelist con id %s está actualizada', self.id)
 
+    def __merge_uploaded_codes(self, uploaded, lang):
+        if self._codes is None:
+            return  # Se traerán de la API, ya con los subidos, la primera vez que se acceda a ellos
+        codes = pandas.DataFrame(
+            {'id': uploaded['Id'], 'parent': uploaded['ParentCode'], f'name_{lang}': uploaded['Name'],
+             f'des_{lang}': uploaded['Description']}).reindex(columns=self._codes.columns).astype('string')
+        self.codes = pandas.concat([self._codes[~self._codes.id.isin(codes.id)], codes], ignore_index=True)
+
     def __upload_csv(self, csv, columns, lang='es'):
         upload_headers = self.session.headers.copy()
         custom_data = str(
@@ -188,9 +227,9 @@ class Codelist:
         files = {'file': (
             'hehe.csv', csv, 'application/vnd.ms-excel', {}),
             'CustomData': (None, custom_data)}
-        body, content_type = requests.models.RequestEncodingMixin._encode_files(files, {})
+        body = MultipartEncoder(files)
 
-        upload_headers['Content-Type'] = content_type
+        upload_headers['Content-Type'] = body.content_type
         upload_headers['language'] = lang
         try:
             self.logger.info('Subiendo códigos a la API')
@@ -217,6 +256,7 @@ class Codelist:
             response.raise_for_status()
         except Exception as e:
             raise e
+        self.structure_cache.delete(self.cache_key)
         self.logger.info('Códigos importados correctamente')
         ## Utilizar decoradores correctamente para los getters y setters sería clave.
         # la sintaxis tb se puede mejorar seguro.
@@ -251,53 +291,15 @@ class Codelist:
                 self.__import_csv(response)
         self.codes = codes
 
+    def pending_translations(self):
+        """
+
+        Returns: (:class:`Diccionario`) Nombres y descripciones sin traducir por idioma de destino
+
+        """
+        return self.translation_service.pending_values(self.codes, self.codes.columns[2:])
+
     def __translate(self, data):
         self.logger.info('Iniciando proceso de traducción para la codelist con id %s', self.id)
-        columns = data.columns[2:]
-        codes = data.copy()
-        codes_translated = pandas.DataFrame(columns=codes.columns)
-        for column in columns:
-            target_language = column[-2:]
-            source_languages = self.configuracion['languages'].copy()
-            source_languages.remove(target_language)
-            if target_language == 'en':
-                target_language = 'EN-GB'
-            source_language = source_languages[-1]
-            source_column = column[:-2] + source_language
-            to_be_translated_indexes = codes[codes[column].isnull()][column].index
-            fake_indexes = codes[codes[source_column].isnull()][source_column].index
-            to_be_translated_indexes = to_be_translated_indexes.difference(fake_indexes, sort=False)
-            indexes_size = len(to_be_translated_indexes)
-            if not indexes_size:
-                continue
-            codes[column][to_be_translated_indexes] = codes[source_column][to_be_translated_indexes].map(
-                lambda value, tl=target_language: self.__get_translate(value, tl))
-
-            with open(f'{self.configuracion["cache"]}', 'w', encoding='utf=8') as file:
-                yaml.dump(self.translator_cache, file)
-            codes_translated = pandas.concat(
-                [codes_translated, codes.iloc[to_be_translated_indexes]])  # Se guardan los codigos traducidos
+        codes_translated = self.translation_service.translate_columns(data, data.columns[2:])
         return codes_translated
-
-    def __get_translate(self, value, target_language):
-        self.logger.info('Traduciendo el término %s al %s', value, target_language)
-        if 'EN-GB' in target_language:
-            target_language = 'en'
-        try:
-            if value in self.translator_cache and target_language in self.translator_cache[value]:
-                self.logger.info('Valor encontrado en la caché de traducciones')
-                translation = self.translator_cache[value][target_language]
-            else:
-                if 'en' in target_language:
-                    target_language = 'EN-GB'
-                self.logger.info('Realizando petición a deepl para traducir el valor %s al %s', value, target_language)
-                translation = str(self.translator.translate_text(value, target_lang=target_language))
-                if 'EN-GB' in target_language:
-                    target_language = 'en'
-                self.translator_cache[value] = {}
-                self.translator_cache[value][target_language] = translation
-            self.logger.info('Traducido el término %s como %s', value, translation)
-        except TypeError:
-            if value == 'España':
-                translation = 'Spain'
-        return translation.replace("\n", ' ')
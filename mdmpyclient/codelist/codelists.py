@@ -1,11 +1,14 @@
-import copy
 import logging
 import sys
 # import os
-import yaml
 from ftfy import fix_encoding
 
+from mdmpyclient.cache.node import node_key
+from mdmpyclient.cache.structure_cache import StructureCache
 from mdmpyclient.codelist.codelist import Codelist
+from mdmpyclient.translation.translation_service import TranslationService
+from mdmpyclient.utils.concurrency import map_concurrently
+from mdmpyclient.utils.sdmx_export import export_all
 
 fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
 logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
@@ -21,18 +24,27 @@ class Codelists:
          fichero de configuración configuracion/configuracion.yaml.
         init_data (:class:`Boolean`): True para traer todos los códigos de las listas,
          False para no traerlos. Por defecto toma el valor False.
+        structure_cache (:class:`StructureCache`): Caché de estructuras en disco. Por defecto se
+         usa la indicada en la clave 'structure_cache' de la configuración, si existe.
+        job_journal (:class:`JobJournal`): Registro de trabajos que se pasa a cada codelist, normalmente el de
+         :class:`MDM`. Por defecto no se registra ningún paso.
 
     Attributes:
         data (:obj:`Diccionario`): Diccionario con todas las codelists
 
     """
 
-    def __init__(self, session, configuracion, translator, translator_cache, init_data=False):
+    def __init__(self, session, configuracion, translator, translator_cache, init_data=False, structure_cache=None,
+                 job_journal=None):
         self.logger = logging.getLogger(f'{self.__class__.__name__}')
         self.session = session
         self.configuracion = configuracion
         self.translator = translator
         self.translator_cache = translator_cache
+        self.translation_service = TranslationService(configuracion, translator, translator_cache)
+        self.job_journal = job_journal
+        self.structure_cache = structure_cache if structure_cache else StructureCache(
+            configuracion.get('structure_cache'), node_key(configuracion))
 
         self.data = self.get(init_data)
         self.data_to_upload = {}
@@ -42,7 +54,8 @@ class Codelists:
         self.logger.info('Solicitando información de las codelists')
 
         try:
-            response = self.session.get(f'{self.configuracion["url_base"]}codelist').json()['data']['codelists']
+            response = self.structure_cache.get_json(self.session, f'{self.configuracion["url_base"]}codelist',
+                                                     ('codelist',))['data']['codelists']
         except KeyError:
             self.logger.error(
                 'No se han extraído las codelist debido a un error de conexión con el servidor')
@@ -64,23 +77,30 @@ class Codelists:
 
             cl = Codelist(self.session, self.configuracion, self.translator,
                           self.translator_cache, codelist_id, agency,
-                          version, names, des, init_data=init_data)
+                          version, names, des, init_data=False, structure_cache=self.structure_cache,
+                          is_final=str(codelist.get('isFinal')).lower() == 'true', job_journal=self.job_journal)
             codelists[agency][codelist_id][version] = cl
             self.codelist_list.append(cl)
+        if init_data:
+            self.logger.info('Solicitando los códigos de %s codelists', len(self.codelist_list))
+            map_concurrently(lambda cl: cl.init_codes(), self.codelist_list,
+                             self.configuracion.get('max_workers', 1))
         return codelists
 
-    def get_all_sdmx(self, directory):
+    def get_all_sdmx(self, directory, incremental=False):
         """
 
         Args:
             directory: (:class:`String`) Directorio donde se van a guardar todas las codelist en formato sdmx
+            incremental: (:class:`Boolean`) True para descargar solo las codelist nuevas o no finales,
+             según el manifiesto del directorio
 
-        Returns: None
+        Returns: (:class:`Integer`) Bytes escritos
 
         """
-        self.logger.info('Obteniendo todos los dataflows en formato sdmx')
-        for cl in self.codelist_list:
-            cl.get_sdmx(directory)
+        self.logger.info('Obteniendo todas las codelist en formato sdmx')
+        return export_all(self.codelist_list, directory, 'codelists', self.configuracion.get('max_workers', 1),
+                          incremental)
 
     def create(self, agencia, codelist_id, version, nombres, descripciones):
         json = {'data': {'codelists': [
@@ -143,44 +163,7 @@ class Codelists:
         Returns:
 
         """
-        result = copy.deepcopy(data)
-        languages = copy.deepcopy(self.configuracion['languages'])
-        to_translate_langs = list(set(languages) - set(result.keys()))
-        value = list(result.values())[0]
-        for target_lang in to_translate_langs:
-            if 'en' in target_lang:
-                target_lang = 'EN-GB'
-            translate = self.__get_translate(value, target_lang)
-            if 'EN-GB' in target_lang:
-                target_lang = 'en'
-            result[target_lang] = translate
-        with open(f'{self.configuracion["cache"]}', 'w', encoding='utf=8') as file:
-            yaml.dump(self.translator_cache, file)
-        return result
-
-    def __get_translate(self, value, target_language):
-        self.logger.info('Traduciendo el término %s al %s', value, target_language)
-        if 'EN-GB' in target_language:
-            target_language = 'en'
-
-        try:
-            if value in self.translator_cache and target_language in self.translator_cache[value]:
-                self.logger.info('Valor encontrado en la caché de traducciones')
-                translation = self.translator_cache[value][target_language]
-            else:
-                if 'en' in target_language:
-                    target_language = 'EN-GB'
-                self.logger.info('Realizando petición a deepl para traducir el valor %s al %s', value, target_language)
-                translation = str(self.translator.translate_text(value, target_lang=target_language))
-                if 'EN-GB' in target_language:
-                    target_language = 'en'
-                self.translator_cache[value] = {}
-                self.translator_cache[value][target_language] = translation
-            self.logger.info('Traducido el término %s como %s', value, translation)
-        except:
-            translation = 'Error de traducción automática. Póngase en contacto con el administrador.'
-
-        return translation
+        return self.translation_service.translate(data)
 
     def delete_all(self, agency):
         try:  # Miramos que no este vacio self.data
@@ -197,11 +180,11 @@ class Codelists:
 
     def put_all_data(self):
         self.logger.info('Realizando un put de todos los códigos de todas las codelist')
-        for agency in self.data.values():
-            for codelist in agency.values():
-                for version in codelist.values():
-                    version.put()
-        self.init_codelists(True)
+        codelists = [version for agency in self.data.values() for codelist in agency.values()
+                     for version in codelist.values() if len(version.upload_buffer)]
+        self.logger.info('Se van a subir códigos a %s codelists', len(codelists))
+        # Cada codelist incorpora a sus códigos los que ha subido, no es necesario volver a traerlas
+        map_concurrently(lambda codelist: codelist.put(), codelists, self.configuracion.get('max_workers', 1))
 
     def init_codelist(self, init_data):
         self.data = self.get(init_data)
@@ -218,7 +201,9 @@ class Codelists:
                 if cl_id not in self.data_to_upload[agency]:
                     self.data_to_upload[agency][cl_id] = {}
                 codelist = Codelist(self.session, self.configuracion, self.translator, self.translator_cache, cl_id,
-                                    agency, version, names, des, init_data=False)
+                                    agency, version, names, des, init_data=False,
+                                    structure_cache=self.structure_cache, job_journal=self.job_journal)
+                codelist.codes = codelist.get(False)  # Aún no existe en la API, no hay códigos que solicitar
                 self.data_to_upload[agency][cl_id][version] = codelist
         return codelist
 
@@ -234,9 +219,17 @@ class Codelists:
 
     def translate_all_codelists(self):
         self.logger.info('Iniciado proceso de traducción de todas las codelist')
-        for agency in self.data.values():
-            for codelist in agency.values():
-                for version in codelist.values():
-                    if version.id == 'CL_ESTRATO_ASALARIADOS':
-                        continue
-                    version.translate()
+        codelists = [version for agency in self.data.values() for codelist in agency.values()
+                     for version in codelist.values() if version.id != 'CL_ESTRATO_ASALARIADOS']
+        # Se traducen de una vez los términos pendientes de todas las codelists, sin repetidos, y después
+        # cada codelist sube sus traducciones desde la caché
+        pending = {}
+        for codelist in codelists:
+            for language, values in codelist.pending_translations().items():
+                pending.setdefault(language, []).extend(values)
+        stats = self.translation_service.prefetch(pending)
+        for codelist in codelists:
+            codelist.translate()
+        self.logger.info('Traducción de las codelist finalizada. Se han ahorrado %s de %s peticiones a deepl',
+                         stats['saved_requests'], stats['saved_requests'] + stats['requests'])
+        return stats
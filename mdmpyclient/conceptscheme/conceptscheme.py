@@ -3,10 +3,16 @@ import logging
 import sys
 import os
 import pandas
-import requests
-import yaml
 from ftfy import fix_encoding
 
+from mdmpyclient.cache.node import node_key
+from mdmpyclient.cache.structure_cache import StructureCache
+from mdmpyclient.session.multipart import MultipartEncoder
+from mdmpyclient.translation.translation_service import TranslationService
+from mdmpyclient.utils.columns import item_columns
+from mdmpyclient.utils.sdmx_export import download_to_file
+from mdmpyclient.utils.upload_buffer import UploadBuffer
+
 fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
 logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
 
@@ -27,7 +33,11 @@ class ConceptScheme:
         des (class: `String`): Diccionario con las descripciones del esquema de conceptos
          en varios idiomas.
         init_data (class: `Boolean`): True para traer todos los datos del esquema de
-         conceptos, False para traer solo id, agencia y versión. Por defecto toma el valor False.
+         conceptos, False para traerlos la primera vez
+         que se acceda a ellos. Por defecto toma el valor False.
+        structure_cache (:class:`StructureCache`): Caché de estructuras en disco. Por defecto se
+         usa la indicada en la clave 'structure_cache' de la configuración, si existe.
+        is_final (:class:`Boolean`): True si el esquema de conceptos es final en la API.
 
     Attributes:
 
@@ -37,84 +47,100 @@ class ConceptScheme:
     """
 
     def __init__(self, session, configuracion, translator, translator_cache, cs_id, agency_id, version, names, des,
-                 init_data=False):
+                 init_data=False, structure_cache=None, is_final=False):
         self.logger = logging.getLogger(f'{self.__class__.__name__}')
 
         self.session = session
         self.configuracion = configuracion
         self.translator = translator
         self.translator_cache = translator_cache
+        self.translation_service = TranslationService(configuracion, translator, translator_cache)
         self.id = cs_id
         self.agency_id = agency_id
         self.version = version
         self.names = names
         self.des = des
-        self.concepts = self.get(init_data)
-        self.concepts_to_upload = pandas.DataFrame(columns=['Id', 'ParentCode', 'Name', 'Description'], dtype='string')
+        self.structure_cache = structure_cache if structure_cache else StructureCache(
+            configuracion.get('structure_cache'), node_key(configuracion))
+        self.is_final = is_final
+        self._concepts = self.get(init_data) if init_data else None
+        self._concept_ids = None
+        self.upload_buffer = UploadBuffer(['Id', 'ParentCode', 'Name', 'Description'], 'string')
+
+    @property
+    def concepts(self):
+        if self._concepts is None:
+            self._concepts = self.get(True)
+        return self._concepts
+
+    @concepts.setter
+    def concepts(self, concepts):
+        self._concepts = concepts
+        self._concept_ids = None
+
+    @property
+    def concept_ids(self):
+        if self._concept_ids is None:
+            self._concept_ids = set(self.concepts.id.dropna())
+        return self._concept_ids
+
+    @property
+    def concepts_to_upload(self):
+        return self.upload_buffer.to_frame()
+
+    @concepts_to_upload.setter
+    def concepts_to_upload(self, concepts_to_upload):
+        self.upload_buffer.set_frame(concepts_to_upload)
+
+    @property
+    def cache_key(self):
+        return 'conceptScheme', self.agency_id, self.id, self.version
 
     def get(self, init_data):
-        concepts = {'id': [], 'parent': []}
-        for language in self.configuracion['languages']:
-            concepts[f'name_{language}'] = []
-            concepts[f'des_{language}'] = []
+        concepts = item_columns([], self.configuracion['languages'])
         if init_data:
             try:
-                response = self.session.get(
-                    f'{self.configuracion["url_base"]}conceptScheme/{self.id}/{self.agency_id}/{self.version}')
-                response_data = response.json()['data']['conceptSchemes'][0]['concepts']
+                response = self.structure_cache.get_json(
+                    self.session,
+                    f'{self.configuracion["url_base"]}conceptScheme/{self.id}/{self.agency_id}/{self.version}',
+                    self.cache_key, self.is_final)
+                response_data = response['data']['conceptSchemes'][0]['concepts']
             except KeyError:
-                if 'data' in response.json().keys():
+                if 'data' in response.keys():
                     self.logger.warning('El esquema de conceptos con id: %s está vacío', self.id)
                 else:
                     self.logger.error(
                         'Ha ocurrido un error mientras se cargaban los datos de la codelist con id: %s', self.id)
-                    self.logger.error(response.text)
+                    self.logger.error(response)
                 return pandas.DataFrame(data=concepts, dtype='string')
             except Exception as e:
                 raise e
 
-            for concept in response_data:
-                for key, column in concepts.items():
-                    try:
-                        if 'id' in key or 'parent' in key:
-                            column.append(concept[key])
-                        else:
-                            language = key[-2:]
-                            if 'name' in key:
-                                column.append(concept['names'][language])
-                            if 'des' in key:
-                                column.append(concept['descriptions'][language])
-
-                    except Exception:
-                        column.append(None)
+            concepts = item_columns(response_data, self.configuracion['languages'])
         return pandas.DataFrame(data=concepts, dtype='string')
 
     def get_sdmx(self, directory):
         self.logger.info('Obteniendo esquema conceptual con id %s en formato sdmx', self.id)
-        try:
-            response = self.session.get(
-                f'{self.configuracion["url_base"]}downloadMetadati/conceptScheme/{self.id}/{self.agency_id}/'
-                f'{self.version}/structure/true/false/es')
-            response.raise_for_status()
-        except Exception as e:
-            raise e
         path = os.path.join(directory, self.id + '.xml')
-        with open(path, 'w', encoding='utf-8') as file:
-            file.write(response.text)
-            file.close()
+        return download_to_file(
+            self.session,
+            f'{self.configuracion["url_base"]}downloadMetadati/conceptScheme/{self.id}/{self.agency_id}/'
+            f'{self.version}/structure/true/false/es',
+            path)
 
     def add_concept(self, concept_id, parent, names, des):
-        if concept_id.upper() not in self.concepts.id.values:
+        concept_id = concept_id.upper()
+        if concept_id not in self.concept_ids and concept_id not in self.upload_buffer:
             if names:
                 names = fix_encoding(names)
             if des:
                 des = fix_encoding(des)
-            self.concepts_to_upload.loc[len(self.concepts_to_upload)] = [concept_id.upper(), parent, names, des]
+            self.upload_buffer.append([concept_id, parent, names, des])
 
     def add_concepts(self, concepts):
         concepts.apply(
-            lambda conceptos: self.add_code(conceptos['ID'], conceptos['PARENTCODE'], conceptos['NAME'],
-                                            conceptos['DESCRIPTION']), axis=1)
+            lambda conceptos: self.add_concept(conceptos['ID'], conceptos['PARENTCODE'], conceptos['NAME'],
+                                               conceptos['DESCRIPTION']), axis=1)
 
     def put(self, lang='es'):
         to_upload = len(self.concepts_to_upload)
@@ -144,9 +170,9 @@ class ConceptScheme:
         files = {'file': (
             'hehe.csv', csv, 'application/vnd.ms-excel', {}),
             'CustomData': (None, custom_data)}
-        body, content_type = requests.models.RequestEncodingMixin._encode_files(files, {})
+        body = MultipartEncoder(files)
 
-        upload_headers['Content-Type'] = content_type
+        upload_headers['Content-Type'] = body.content_type
         upload_headers['language'] = lang
         try:
             self.logger.info('Subiendo conceptos a la API')
@@ -172,6 +198,7 @@ class ConceptScheme:
             response.raise_for_status()
         except Exception as e:
             raise e
+        self.structure_cache.delete(self.cache_key)
         self.logger.info('Conceptos importados correctamente')
 
     def delete(self):
@@ -182,6 +209,7 @@ class ConceptScheme:
             response.raise_for_status()
         except Exception as e:
             raise e
+        self.structure_cache.delete(self.cache_key)
         if response.text.lower() == 'true':
             self.logger.info('Esquema de conceptos eliminado correctamente')
         else:
@@ -204,55 +232,20 @@ class ConceptScheme:
                 self.__import_csv(response)
         self.concepts = concepts
 
+    def pending_translations(self):
+        """
+
+        Returns: (:class:`Diccionario`) Nombres y descripciones sin traducir por idioma de destino
+
+        """
+        return self.translation_service.pending_values(self.concepts, self.concepts.columns[2:])
+
     def __translate(self, data):
         self.logger.info('Iniciando proceso de traducción del esquema de conceptos con id %s', self.id)
-        columns = data.columns[2:]
-        concepts = data.copy()
-        concepts_translated = pandas.DataFrame(columns=concepts.columns)
-        for column in columns:
-            target_language = column[-2:]
-            source_languages = self.configuracion['languages'].copy()
-            source_languages.remove(target_language)
-            if target_language == 'en':
-                target_language = 'EN-GB'
-            source_language = source_languages[-1]
-            source_column = column[:-2] + source_language
-            to_be_translated_indexes = concepts[concepts[column].isnull()][column].index
-            fake_indexes = concepts[concepts[source_column].isnull()][source_column].index
-            to_be_translated_indexes = to_be_translated_indexes.difference(fake_indexes, sort=False)
-            indexes_size = len(to_be_translated_indexes)
-            if not indexes_size:
-                continue
-            concepts[column][to_be_translated_indexes] = concepts[source_column][to_be_translated_indexes].map(
-                lambda value, tl=target_language: self.__get_translate(value, tl))
-            with open(f'{self.configuracion["cache"]}', 'w', encoding='utf=8') as file:
-                yaml.dump(self.translator_cache, file)
-            concepts_translated = pandas.concat(
-                [concepts_translated, concepts.iloc[to_be_translated_indexes]])  # Se guardan los conceptos traducidos
+        concepts_translated = self.translation_service.translate_columns(data, data.columns[2:])
         self.logger.info('Proceso de traducción finalizado')
         return concepts_translated
 
-    def __get_translate(self, value, target_language):
-        self.logger.info('Traduciendo el término %s al %s', value, target_language)
-        self.logger.info('Traduciendo el término %s al %s', value, target_language)
-
-        if 'EN-GB' in target_language:
-            target_language = 'en'
-        if value in self.translator_cache and target_language in self.translator_cache[value]:
-            self.logger.info('Valor encontrado en la caché de traducciones')
-            translation = self.translator_cache[value][target_language]
-        else:
-            if 'en' in target_language:
-                target_language = 'EN-GB'
-            self.logger.info('Realizando petición a deepl para traducir el valor %s al %s', value, target_language)
-            translation = str(self.translator.translate_text(value, target_lang=target_language))
-            if 'EN-GB' in target_language:
-                target_language = 'en'
-            self.translator_cache[value] = {}
-            self.translator_cache[value][target_language] = translation
-        self.logger.info('Traducido el término %s como %s', value, translation)
-        return translation.replace('\n', ' ')
-
     def init_concepts(self):
         self.concepts = self.get(True)
 
@@ -1,10 +1,13 @@
-import copy
 import logging
 import sys
 #import os
-import yaml
 
+from mdmpyclient.cache.node import node_key
+from mdmpyclient.cache.structure_cache import StructureCache
 from mdmpyclient.conceptscheme.conceptscheme import ConceptScheme
+from mdmpyclient.translation.translation_service import TranslationService
+from mdmpyclient.utils.concurrency import map_concurrently
+from mdmpyclient.utils.sdmx_export import export_all
 
 fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
 logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
@@ -20,18 +23,23 @@ class ConceptSchemes:
           fichero de configuración configuracion/configuracion.yaml.
          init_data (:class:`Boolean`): True para traer todos los conceptos de los esquemas,
           False para no traerlos. Por defecto toma el valor False.
+         structure_cache (:class:`StructureCache`): Caché de estructuras en disco. Por defecto se
+          usa la indicada en la clave 'structure_cache' de la configuración, si existe.
 
      Attributes:
          data (:obj:`Diccionario`): Diccionario con todos los esquemas de conceptos
      """
 
-    def __init__(self, session, configuracion, translator, translator_cache, init_data=False):
+    def __init__(self, session, configuracion, translator, translator_cache, init_data=False, structure_cache=None):
         self.logger = logging.getLogger(f'{self.__class__.__name__}')
 
         self.session = session
         self.configuracion = configuracion
         self.translator = translator
         self.translator_cache = translator_cache
+        self.translation_service = TranslationService(configuracion, translator, translator_cache)
+        self.structure_cache = structure_cache if structure_cache else StructureCache(
+            configuracion.get('structure_cache'), node_key(configuracion))
 
         self.data = self.get(init_data)
         self.data_to_upload = {}
@@ -41,12 +49,13 @@ class ConceptSchemes:
         self.logger.info('Solicitando información de los esquemas de concepto')
 
         try:
-            response = self.session.get(f'{self.configuracion["url_base"]}conceptScheme')
-            response_data = response.json()['data']['conceptSchemes']
+            response = self.structure_cache.get_json(self.session, f'{self.configuracion["url_base"]}conceptScheme',
+                                                     ('conceptScheme',))
+            response_data = response['data']['conceptSchemes']
         except KeyError:
             self.logger.error(
                 'No se han extraído los esquemas de concepto debido a un error de conexión con el servidor: %s',
-                response.text)
+                response)
             return concept_schemes
         except Exception as e:
             raise e
@@ -65,17 +74,23 @@ class ConceptSchemes:
                 concept_schemes[agency][cs_id] = {}
             concept_sch = ConceptScheme(self.session, self.configuracion, self.translator,
                                                                     self.translator_cache, cs_id, agency,
-                                                                    version, names, des, init_data=init_data)
+                                                                    version, names, des, init_data=False,
+                                                                    structure_cache=self.structure_cache,
+                                                                    is_final=str(cs.get('isFinal')).lower() == 'true')
             concept_schemes[agency][cs_id][version] = concept_sch
             self.conceptscheme_list.append(concept_sch)
+        if init_data:
+            self.logger.info('Solicitando los conceptos de %s esquemas', len(self.conceptscheme_list))
+            map_concurrently(lambda cs: cs.init_concepts(), self.conceptscheme_list,
+                             self.configuracion.get('max_workers', 1))
         return concept_schemes
 
 
 
-    def get_all_sdmx(self, directory):
+    def get_all_sdmx(self, directory, incremental=False):
         self.logger.info('Obteniendo todos los esquemas conceptuales en formato sdmx')
-        for cs in self.conceptscheme_list:
-            cs.get_sdmx(directory)
+        return export_all(self.conceptscheme_list, directory, 'esquemas conceptuales',
+                          self.configuracion.get('max_workers', 1), incremental)
 
     def put(self, concept_scheme):
         self.logger.info('Obteniendo esquema de conceptos con id: %s', concept_scheme.id)
@@ -112,39 +127,7 @@ class ConceptSchemes:
         self.data[concept_scheme.agency_id][concept_scheme.id][concept_scheme.version] = concept_scheme
 
     def translate(self, data):
-        result = copy.deepcopy(data)
-        languages = copy.deepcopy(self.configuracion['languages'])
-        to_translate_langs = list(set(languages) - set(result.keys()))
-        value = list(result.values())[0]
-        for target_lang in to_translate_langs:
-            if 'en' in target_lang:
-                target_lang = 'EN-GB'
-            translate = self.__get_translate(value, target_lang)
-            if 'EN-GB' in target_lang:
-                target_lang = 'en'
-            result[target_lang] = translate
-        with open(f'{self.configuracion["cache"]}', 'w', encoding='utf=8') as file:
-            yaml.dump(self.translator_cache, file)
-        return result
-
-    def __get_translate(self, value, target_language):
-        self.logger.info('Traduciendo el término %s al %s', value, target_language)
-        if 'EN-GB' in target_language:
-            target_language = 'en'
-        if value in self.translator_cache and target_language in self.translator_cache[value]:
-            self.logger.info('Valor encontrado en la caché de traducciones')
-            translation = self.translator_cache[value][target_language]
-        else:
-            if 'en' in target_language:
-                target_language = 'EN-GB'
-            self.logger.info('Realizando petición a deepl para traducir el valor %s al %s', value, target_language)
-            translation = str(self.translator.translate_text(value, target_lang=target_language))
-            if 'EN-GB' in target_language:
-                target_language = 'en'
-            self.translator_cache[value] = {}
-            self.translator_cache[value][target_language] = translation
-        self.logger.info('Traducido el término %s como %s', value, translation)
-        return translation
+        return self.translation_service.translate(data)
 
     def delete_all(self, agency):
         try:  # Miramos que no este vacio self.data
@@ -179,7 +162,9 @@ class ConceptSchemes:
                 if cs_id not in self.data_to_upload[agency]:
                     self.data_to_upload[agency][cs_id] = {}
                 concept_scheme = ConceptScheme(self.session, self.configuracion, self.translator, self.translator_cache,
-                                               cs_id, agency, version, names, des, init_data=False)
+                                               cs_id, agency, version, names, des, init_data=False,
+                                               structure_cache=self.structure_cache)
+                concept_scheme.concepts = concept_scheme.get(False)  # Aún no existe en la API
                 self.data_to_upload[agency][cs_id][version] = concept_scheme
         return concept_scheme
 
@@ -195,7 +180,12 @@ class ConceptSchemes:
 
     def translate_all_concept_schemes(self):
         self.logger.info('Traduciendo todos los esquemas de concepto')
-        for agency in self.data.values():  # El nombre de la variable representa la clave que manejamos en el
-            for scheme in agency.values():  # diccionario.
-                for version in scheme.values():
-                    version.translate()
+        concept_schemes = [version for agency in self.data.values() for scheme in agency.values()
+                           for version in scheme.values()]
+        pending = {}
+        for concept_scheme in concept_schemes:
+            for language, values in concept_scheme.pending_translations().items():
+                pending.setdefault(language, []).extend(values)
+        self.translation_service.prefetch(pending)
+        for concept_scheme in concept_schemes:
+            concept_scheme.translate()
@@ -21,7 +21,8 @@ class Cube:
                 como 'dcs'.
                names (class: `Diccionario`): Diccionario con los nombres del cubo en varios idiomas.
                init_data (class: `Boolean`): True para traer todos los datos del cubo,
-                False para traer solo id, agencia y versión. Por defecto toma el valor False.
+                False para traerlos la primera vez
+                que se acceda a ellos. Por defecto toma el valor False.
 
 
 
@@ -38,7 +39,17 @@ class Cube:
         self.cat_id = cat_id
         self.dsd_code = dsd_code
         self.names = names
-        self.components = self.get() if init_data else None
+        self._components = self.get() if init_data else None
+
+    @property
+    def components(self):
+        if self._components is None:
+            self._components = self.get()
+        return self._components
+
+    @components.setter
+    def components(self, components):
+        self._components = components
 
     def get(self):
         components = {'Measures': [], 'Attributes': [], 'Dimensions': []}
@@ -108,6 +108,8 @@ class Cubes:
         except Exception as e:
             print(response.text)
             raise e
-        cube_id = int(response.text)
+        cube_code, cube_id = cube_id, int(response.text)
         self.logger.info('Cubo creado correctamente con id %s', cube_id)
+        self.data[cube_code] = Cube(self.session, self.configuracion, cube_id, cube_code, json['IDCat'],
+                                    json['DSDCode'], json['labels'])
         return cube_id
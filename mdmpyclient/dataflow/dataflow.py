@@ -3,10 +3,19 @@ import os
 import sys
 
 import pandas
+import requests
+
+from mdmpyclient.cache.node import node_key
+from mdmpyclient.cache.snapshot_store import SnapshotStore
+from mdmpyclient.utils.json_stream import HeadRecorder, iter_json_items
+from mdmpyclient.utils.sdmx_export import download_to_file
 
 fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
 logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
 
+# Columnas de los dataflows que no son dimensiones (ver Mappings.put)
+NON_DIMENSION_COLUMNS = ('OBS_VALUE', 'OBS_STATUS')
+
 
 class Dataflow:
     """ Clase que representa un dataflow del M&D Manager.
@@ -25,7 +34,10 @@ class Dataflow:
                name (:class:`Diccionario`): Nombres del dataflow.
                des (class: `Diccionario`): Descripciones del dataflow.
                init_data (:class:`Boolean`): True para traer todos los datos del dataflow,
-                False para no traerlos. Por defecto toma el valor False.
+                False para traerlos la primera vez que
+                se acceda a ellos. Por defecto toma el valor False. Con la clave 'dataflow_from_snapshot'
+                de la configuración a True los datos de los dataflows sin filtros se leen de la copia
+                local del cubo, si existe y tiene todas las columnas del dataflow.
 
            Attributes:
                data (:obj:`List`): Lista con todos los datos del dataflow.
@@ -44,7 +56,19 @@ class Dataflow:
         self.cube_id = cube_id
         self.names = names
         self.des = des
-        self.data = self.get() if init_data else None
+        self.snapshot_store = SnapshotStore(configuracion.get('snapshot_store'), configuracion.get('snapshot_keep', 3),
+                                            node_key(configuracion))
+        self._data = self.get() if init_data else None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self.get()
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
 
     def get_sdmx_struval(self, directory):
         self.logger.info('Obteniendo dataflow con id %s en formato sdmx', self.code)
@@ -63,61 +87,122 @@ class Dataflow:
 
     def get_sdmx(self, directory):
         self.logger.info('Obteniendo flujo de datos con id %s en formato sdmx', self.code)
-        try:
-
-            response = self.session.get(
-                f'{self.configuracion["url_base"]}downloadMetadati/dataflow/{self.code}/{self.agency_id}/'
-                f'{self.version}/structure/true/false/es')
-            response.raise_for_status()
-        except Exception as e:
-            raise e
         path = os.path.join(directory, self.code + '.xml')
-        with open(path, 'w', encoding='utf-8') as file:
-            file.write(response.text)
-            file.close()
+        return download_to_file(
+            self.session,
+            f'{self.configuracion["url_base"]}downloadMetadati/dataflow/{self.code}/{self.agency_id}/'
+            f'{self.version}/structure/true/false/es',
+            path)
 
     def get(self):
+        structure = self.__get_structure()
+        if structure is None:
+            return pandas.DataFrame(data={})
+        columns = structure['DataflowColumns']
+
+        # La copia contiene todo el cubo, así que solo coincide con los dataflows que no lo filtran
+        if self.configuracion.get('dataflow_from_snapshot', False) and self.__is_unfiltered(structure):
+            snapshot = self.snapshot_store.load(self.cube_id)
+            if snapshot is not None and all(column in snapshot.columns for column in columns):
+                self.logger.info('Datos del dataflow con id %s obtenidos de la copia local del cubo', self.code)
+                return snapshot[columns]
+
+        self.logger.info('Solicitando datos del dataflow con id %s', self.code)
+        # Se descarga por páginas para tener en memoria, además del resultado, solo las observaciones de una
+        chunks = list(self.__iter_pages(columns, self.configuracion.get('dataflow_page_size', 50000)))
+        data = pandas.concat(chunks, ignore_index=True) if chunks else pandas.DataFrame(columns=columns,
+                                                                                        dtype='string')
+        self.logger.info('Datos extraídos correctamente')
+        return data
+
+    def iter_data(self, page_size=None):
+        """ Descarga los datos del dataflow página a página para no tenerlos todos en memoria.
+
+        Args:
+            page_size: (:class:`Integer`) Número de observaciones por página. Por defecto se usa
+             la clave 'dataflow_page_size' de la configuración.
+
+        Returns: (:class:`Generator`) DataFrames con las observaciones de cada página
+
+        """
+        page_size = page_size if page_size else self.configuracion.get('dataflow_page_size', 50000)
+        structure = self.__get_structure()
+        if structure is None:
+            return
+        yield from self.__iter_pages(structure['DataflowColumns'], page_size)
+
+    def __iter_pages(self, columns, page_size):
+        num_page = 1
+        while True:
+            self.logger.info('Solicitando la página %s de los datos del dataflow con id %s', num_page, self.code)
+            chunk = self.__get_page(columns, num_page, page_size)
+            if len(chunk):
+                yield chunk
+            if len(chunk) < page_size:
+                break
+            num_page += 1
+
+    def download_csv(self, path, page_size=None):
+        """
+
+        Args:
+            path: (:class:`String`) Fichero CSV en el que se escriben los datos del dataflow
+            page_size: (:class:`Integer`) Número de observaciones por página
+
+        Returns: (:class:`Integer`) Número de observaciones escritas
+
+        """
+        n_rows = 0
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            for chunk in self.iter_data(page_size):
+                chunk.to_csv(file, sep=';', index=False, header=not n_rows)
+                n_rows += len(chunk)
+        self.logger.info('Se han escrito %s observaciones del dataflow con id %s en %s', n_rows, self.code, path)
+        return n_rows
+
+    def __get_structure(self):
         self.logger.info('Solicitando estructura del dataflow con id %s', self.code)
 
         try:  # Dos trys para tener mas separados los errores
             response = self.session.get(f'{self.configuracion["url_base"]}ddbDataflow/{self.id}')
-            response_data = response.json()['DataflowColumns']
+            response_data = response.json()
+            _ = response_data['DataflowColumns']
         except KeyError:
             self.logger.error('Ha habido un error solicitando estructura del dataflow con id %s', self.code)
-            return pandas.DataFrame(data={})
+            return None
         except Exception as e:
             raise e
         self.logger.info('Estructura extraída correctamente')
+        return response_data
 
-        columns = response_data
-        json = {"Filter": {"FiltersGroupAnd": {}, "FiltersGroupOr": {}},
-                "SqlData": {"SelCols": columns, "SortCols": None, "SortByDesc": False, "NumPage": 1,
-                            "PageSize": 2147483647}, "iDDataflow": self.id, "iDCube": self.cube_id}
+    @staticmethod
+    def __is_unfiltered(structure):
+        filters = structure.get('filter')
+        return isinstance(filters, dict) and not any(filters.get(group) for group in ('FiltersGroupAnd',
+                                                                                     'FiltersGroupOr'))
 
-        self.logger.info('Solicitando datos del dataflow con id %s', self.code)
+    def __get_page(self, columns, num_page, page_size):
+        # Las páginas se ordenan por las dimensiones para que cada observación esté en una sola página
+        sort_columns = [column for column in columns if column not in NON_DIMENSION_COLUMNS]
+        json = {"Filter": {"FiltersGroupAnd": {}, "FiltersGroupOr": {}},
+                "SqlData": {"SelCols": columns, "SortCols": sort_columns, "SortByDesc": False, "NumPage": num_page,
+                            "PageSize": page_size}, "iDDataflow": self.id, "iDCube": self.cube_id}
         try:
-            response = self.session.post(f'{self.configuracion["url_base"]}getDDBDataflowPreview/true', json=json)
-            response_data = response.json()
+            response = self.session.post(f'{self.configuracion["url_base"]}getDDBDataflowPreview/true', json=json,
+                                         stream=True)
+            # Las observaciones se decodifican de una en una según llegan, sin cargar la respuesta completa
+            with response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                body = HeadRecorder(response.raw)
+                data = list(iter_json_items(body, 'Data.item'))
         except Exception as e:
             raise e
-        self.logger.info('Datos extraídos correctamente')
-
-        columns = response_data['Columns']
-        data = {}
-        for column in columns:
-            data[column] = []
-
-        for info in response_data['Data']:
-            for key, item in info.items():
-                data[key].append(item)
-
-        # Esta forma es mucho mas lenta
-        # data = pandas.DataFrame(columns=columns)
-        # for info in response_data['Data']:
-        #     aux = pandas.DataFrame(info, columns=columns, index=[0])
-        #     data = pandas.concat([data, aux])
-        # return data
-        return pandas.DataFrame(data=data, dtype='string')
+        # Un error no tiene observaciones y se tomaría por la última página, dejando los datos incompletos
+        if not data and body.error():
+            raise requests.exceptions.HTTPError(f'Error en la página {num_page} del dataflow con id {self.code}: '
+                                                f'{body.error()}', response=response)
+        return pandas.DataFrame.from_records(data, columns=columns).astype('string')
 
     def init_data(self):
         self.data = self.get()
@@ -1,9 +1,11 @@
 import logging
 import sys
-import copy
-import yaml
 
+from mdmpyclient.cache.node import node_key
+from mdmpyclient.cache.structure_cache import StructureCache
 from mdmpyclient.dataflow.dataflow import Dataflow
+from mdmpyclient.translation.translation_service import TranslationService
+from mdmpyclient.utils.sdmx_export import export_all
 
 fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
 logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
@@ -19,33 +21,38 @@ class Dataflows:
                     fichero de configuración configuracion/configuracion.yaml.
                    init_data (:class:`Boolean`): True para traer todos los datos dataflows, False para no
                     traerlos. Por defecto toma el valor False.
+                   structure_cache (:class:`StructureCache`): Caché de estructuras en disco. Por defecto se
+                    usa la indicada en la clave 'structure_cache' de la configuración, si existe.
 
                Attributes:
                    data (:obj:`Diccionario`): Diccionario con todos los dataflows
 
                """
 
-    def __init__(self, session, configuracion, translator, translator_cache, init_data=False):
+    def __init__(self, session, configuracion, translator, translator_cache, init_data=False, structure_cache=None):
         self.logger = logging.getLogger(f'{self.__class__.__name__}')
 
         self.session = session
         self.configuracion = configuracion
         self.translator = translator
         self.translator_cache = translator_cache
+        self.translation_service = TranslationService(configuracion, translator, translator_cache)
+        self.structure_cache = structure_cache if structure_cache else StructureCache(
+            configuracion.get('structure_cache'), node_key(configuracion))
         self.data = self.get(init_data)
 
-    def get_all_sdmx(self, directory):
+    def get_all_sdmx(self, directory, incremental=False):
         self.logger.info('Obteniendo todos los dataflows en formato sdmx')
-        for df in self.dataflow_list:
-            df.get_sdmx(directory)
+        return export_all(self.dataflow_list, directory, 'dataflows', self.configuracion.get('max_workers', 1),
+                          incremental)
 
     def get(self, init_data=True):
         data = {}
         self.logger.info('Solicitando información de los dataflows')
 
         try:
-            response = self.session.get(f'{self.configuracion["url_base"]}ddbDataflow')
-            response_data = response.json()
+            response_data = self.structure_cache.get_json(self.session, f'{self.configuracion["url_base"]}ddbDataflow',
+                                                          ('ddbDataflow',))
         except Exception as e:
             raise e
         self.logger.info('Dataflows extraídos correctamente')
@@ -140,36 +147,4 @@ class Dataflows:
         return dataflow_id
 
     def translate(self, data):
-        result = copy.deepcopy(data)
-        languages = copy.deepcopy(self.configuracion['languages'])
-        to_translate_langs = list(set(languages) - set(result.keys()))
-        value = list(result.values())[0]
-        for target_lang in to_translate_langs:
-            if 'en' in target_lang:
-                target_lang = 'EN-GB'
-            translate = self.__get_translate(value, target_lang)
-            if 'EN-GB' in target_lang:
-                target_lang = 'en'
-            result[target_lang] = translate
-        with open(f'{self.configuracion["cache"]}', 'w', encoding='utf=8') as file:
-            yaml.dump(self.translator_cache, file)
-        return result
-
-    def __get_translate(self, value, target_language):
-        self.logger.info('Traduciendo el término %s al %s', value, target_language)
-        if 'EN-GB' in target_language:
-            target_language = 'en'
-        if value in self.translator_cache and target_language in self.translator_cache[value]:
-            self.logger.info('Valor encontrado en la caché de traducciones')
-            translation = self.translator_cache[value][target_language]
-        else:
-            if 'en' in target_language:
-                target_language = 'EN-GB'
-            self.logger.info('Realizando petición a deepl para traducir el valor %s al %s', value, target_language)
-            translation = str(self.translator.translate_text(value, target_lang=target_language))
-            if 'EN-GB' in target_language:
-                target_language = 'en'
-            self.translator_cache[value] = {}
-            self.translator_cache[value][target_language] = translation
-        self.logger.info('Traducido el término %s como %s', value, translation)
-        return translation
+        return self.translation_service.translate(data)
@@ -2,6 +2,10 @@ import logging
 import os
 import sys
 
+from mdmpyclient.cache.node import node_key
+from mdmpyclient.cache.structure_cache import StructureCache
+from mdmpyclient.utils.sdmx_export import download_to_file
+
 fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
 logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
 
@@ -20,13 +24,18 @@ class DSD:
             names (class: `Diccionario`): Diccionario con los nombres del DSD en varios idiomas.
             des (class: `String`): Diccionario con las descripciones del DSD en varios idiomas.
             init_data (class: `Boolean`): True para traer todos los datos del DSD,
-             False para traer solo id, agencia y versión. Por defecto toma el valor False.
+             False para traerlos la primera vez
+             que se acceda a ellos. Por defecto toma el valor False.
+            structure_cache (:class:`StructureCache`): Caché de estructuras en disco. Por defecto se
+             usa la indicada en la clave 'structure_cache' de la configuración, si existe.
+            is_final (:class:`Boolean`): True si el DSD es final en la API.
 
         Attributes:
             data (:obj:`DataFrame`): DataFrame con todos los datos del DSD
         """
 
-    def __init__(self, session, configuracion, dsd_id, agency_id, version, names, des, init_data=False):
+    def __init__(self, session, configuracion, dsd_id, agency_id, version, names, des, init_data=False,
+                 structure_cache=None, is_final=False):
         self.logger = logging.getLogger(f'{self.__class__.__name__}')
 
         self.session = session
@@ -36,37 +45,49 @@ class DSD:
         self.version = version
         self.names = names
         self.des = des
+        self.structure_cache = structure_cache if structure_cache else StructureCache(
+            configuracion.get('structure_cache'), node_key(configuracion))
+        self.is_final = is_final
+
+        self._data = self.get() if init_data else None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self.get()
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
 
-        self.data = self.get() if init_data else None
+    @property
+    def cache_key(self):
+        return 'dsd', self.agency_id, self.id, self.version
 
     def get_sdmx(self, directory):
         self.logger.info('Obteniendo DSD con id %s en formato sdmx', self.id)
-        try:
-            response = self.session.get(
-                f'{self.configuracion["url_base"]}downloadMetadati/dsd/{self.id}/{self.agency_id}/'
-                f'{self.version}/structure/true/false/es')
-            response.raise_for_status()
-        except Exception as e:
-            raise e
         path = os.path.join(directory, self.id + '.xml')
-        with open(path, 'w', encoding='utf-8') as file:
-            file.write(response.text)
-            file.close()
+        return download_to_file(
+            self.session,
+            f'{self.configuracion["url_base"]}downloadMetadati/dsd/{self.id}/{self.agency_id}/'
+            f'{self.version}/structure/true/false/es',
+            path)
 
     def get(self):
         data = {}
 
         self.logger.error('Solicitando información del DSD con id %s', self.id)
         try:
-            response = \
-                self.session.get(
-                    f'{self.configuracion["url_base"]}dsd/{self.id}/{self.agency_id}/{self.version}')
-            response_data = response.json()['data'][
+            response = self.structure_cache.get_json(
+                self.session, f'{self.configuracion["url_base"]}dsd/{self.id}/{self.agency_id}/{self.version}',
+                self.cache_key, self.is_final)
+            response_data = response['data'][
                 'dataStructures'][0]['dataStructureComponents']
         except KeyError:
             self.logger.error('Ha ocurrido un error mientras se cargaban los datos del DSD con id: %s',
                               self.id)
-            self.logger.error(response.text)
+            self.logger.error(response)
             return data
         except Exception as e:
             raise e
@@ -85,6 +106,7 @@ class DSD:
             response.raise_for_status()
         except Exception as e:
             raise e
+        self.structure_cache.delete(self.cache_key)
         if response.text.lower() == 'true':
             self.logger.info('DSD eliminado correctamente')
         else:
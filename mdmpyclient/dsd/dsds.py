@@ -1,10 +1,14 @@
 import logging
 import sys
 import os
-import requests
 import copy
 
+from mdmpyclient.cache.node import node_key
+from mdmpyclient.cache.structure_cache import StructureCache
 from mdmpyclient.dsd.dsd import DSD
+from mdmpyclient.session.multipart import MultipartEncoder
+from mdmpyclient.utils.concurrency import map_concurrently
+from mdmpyclient.utils.sdmx_export import MANIFEST, export_all
 
 fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
 logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
@@ -20,35 +24,39 @@ class DSDs:
               fichero de configuración configuracion/configuracion.yaml.
              init_data (:class:`Boolean`): True para traer todos los DSDs, False para no traerlos.
               Por defecto toma el valor False.
+             structure_cache (:class:`StructureCache`): Caché de estructuras en disco. Por defecto se
+              usa la indicada en la clave 'structure_cache' de la configuración, si existe.
 
          Attributes:
              data (:obj:`Diccionario`): Diccionario con todos los DSDs
          """
 
-    def __init__(self, session, configuracion, init_data=False):
+    def __init__(self, session, configuracion, init_data=False, structure_cache=None):
         self.logger = logging.getLogger(f'{self.__class__.__name__}')
 
         self.session = session
         self.configuracion = configuracion
+        self.structure_cache = structure_cache if structure_cache else StructureCache(
+            configuracion.get('structure_cache'), node_key(configuracion))
 
         self.data = self.get(init_data)
 
-    def get_all_sdmx(self, directory):
+    def get_all_sdmx(self, directory, incremental=False):
         self.logger.info('Obteniendo fichero en formato sdmx de todos los DSDs')
-        for agency in self.data.values():
-            for dsd_id in agency.values():
-                for version in dsd_id.values():
-                    version.get_sdmx(directory)
+        dsds = [version for agency in self.data.values() for dsd_id in agency.values() for version in dsd_id.values()]
+        return export_all(dsds, directory, 'DSDs', self.configuracion.get('max_workers', 1), incremental)
 
     def put_all_sdmx(self, directory, m_session):
 
         for filename in os.scandir(directory):
+            if filename.name == MANIFEST:
+                continue
             path = os.path.join(directory, filename.name)
             with open(path, 'rb') as file:
                 body = {'file': ('test.xml', file, 'application/xml', {})}
-                data, content_type = requests.models.RequestEncodingMixin._encode_files(body, {})
+                data = MultipartEncoder(body)
                 upload_headers = copy.deepcopy(self.session.headers)
-                upload_headers['Content-Type'] = content_type
+                upload_headers['Content-Type'] = data.content_type
                 try:
                     response = self.session.post(
                         f'{self.configuracion["url_base"]}checkImportedFileXmlSdmxObjects', data=data,
@@ -70,8 +78,8 @@ class DSDs:
         dsd = {}
         self.logger.info('Solicitando información de los DSDs')
         try:
-            response = self.session.get(f'{self.configuracion["url_base"]}dsd')
-            response_data = response.json()['data']['dataStructures']
+            response = self.structure_cache.get_json(self.session, f'{self.configuracion["url_base"]}dsd', ('dsd',))
+            response_data = response['data']['dataStructures']
         except KeyError:
             self.logger.warning('No se han encontrado DSDs en la API')
             return dsd
@@ -91,7 +99,13 @@ class DSDs:
             if dsd_id not in dsd[agency]:
                 dsd[agency][dsd_id] = {}
             dsd[agency][dsd_id][version] = DSD(self.session, self.configuracion, dsd_id, agency, version, names, des,
-                                               init_data)
+                                               False, self.structure_cache,
+                                               str(data_structure.get('isFinal')).lower() == 'true')
+        if init_data:
+            dsd_list = [version for agency in dsd.values() for dsd_id in agency.values() for version in dsd_id.values()]
+            self.logger.info('Solicitando los datos de %s DSDs', len(dsd_list))
+            map_concurrently(lambda data_structure: data_structure.init_data(), dsd_list,
+                             self.configuracion.get('max_workers', 1))
         return dsd
 
     def put(self, agency, dsd_id, version, names, des, dimensions,validFrom,validTo):
@@ -107,7 +121,7 @@ class DSDs:
             if dsd_id not in self.data[agency]:
                 self.data[agency][dsd_id] = {}
             self.data[agency][dsd_id][version] = DSD(self.session, self.configuracion, dsd_id, agency, version, names,
-                                                     des, False)
+                                                     des, False, self.structure_cache, True)
             dsd = self.data[agency][dsd_id][version]
         return dsd
 
@@ -40,12 +40,11 @@ if __name__ == '__main__':
         if delete_data:
             controller.delete_all('ESC01', 'IECA_CAT_EN_ES', '1.0')
         if download_data:
-            for dsd in controller.dsds.data:
-                controller.dsds.get_all_sdmx("mdm_data/dsds/")
-            controller.dataflows.get_all_sdmx("mdm_data/dataflows/")
-            controller.codelists.get_all_sdmx("mdm_data/codelists/")
-            controller.concept_schemes.get_all_sdmx("mdm_data/conceptschemes/")
-            controller.category_schemes.get_all_sdmx("mdm_data/categoryschemes/")
+            controller.dsds.get_all_sdmx("mdm_data/dsds/", incremental=True)
+            controller.dataflows.get_all_sdmx("mdm_data/dataflows/", incremental=True)
+            controller.codelists.get_all_sdmx("mdm_data/codelists/", incremental=True)
+            controller.concept_schemes.get_all_sdmx("mdm_data/conceptschemes/", incremental=True)
+            controller.category_schemes.get_all_sdmx("mdm_data/categoryschemes/", incremental=True)
 
 
         if upload_data:
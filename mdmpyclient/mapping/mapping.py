@@ -1,6 +1,15 @@
 import logging
 import sys
-import requests
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas
+
+from mdmpyclient.cache.job_journal import JobJournal, content_hash
+from mdmpyclient.cache.node import node_key
+from mdmpyclient.cache.snapshot_store import SnapshotStore
+from mdmpyclient.session.multipart import MultipartEncoder
 
 fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
 logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
@@ -19,13 +28,16 @@ class Mapping:
            name (:class:`String`): Nombre del mapping.
            des (class: `String`): Descripción del mapping.
            init_data (:class:`Boolean`): True para traer todos los datos del mapping,
-            False para no traerlos. Por defecto toma el valor False.
+            False para traerlos la primera vez que
+            se acceda a ellos. Por defecto toma el valor False.
+           job_journal (:class:`JobJournal`): Registro de trabajos del cliente, normalmente el de
+            :class:`MDM`. Por defecto no se registra ningún paso.
 
        Attributes:
            components (:obj:`List`): Lista con todos los componentes del mapping.
        """
 
-    def __init__(self, session, configuracion, mapping_id, cube_id, name, des, init_data=False):
+    def __init__(self, session, configuracion, mapping_id, cube_id, name, des, init_data=False, job_journal=None):
         self.logger = logging.getLogger(f'{self.__class__.__name__}')
 
         self.session = session
@@ -34,7 +46,20 @@ class Mapping:
         self.cube_id = cube_id
         self.code = name
         self.des = des
-        self.components = self.get if init_data else None
+        self.snapshot_store = SnapshotStore(configuracion.get('snapshot_store'), configuracion.get('snapshot_keep', 3),
+                                            node_key(configuracion))
+        self.job_journal = job_journal if job_journal else JobJournal(None)
+        self._components = self.get() if init_data else None
+
+    @property
+    def components(self):
+        if self._components is None:
+            self._components = self.get()
+        return self._components
+
+    @components.setter
+    def components(self, components):
+        self._components = components
 
     def get(self):
         components = []
@@ -54,33 +79,144 @@ class Mapping:
             comp_id = component['IDComp']
             column = component['ColumnName']
             column_mapped = component['CubeComponentCode']
-            comp_type = ['CubeComponentType']
+            comp_type = component['CubeComponentType']
 
             components.append({'id_comp': comp_id, 'column': column, 'column_mapped': column_mapped, 'type': comp_type})
         return components
 
-    def load_cube(self, data):
-        # if self.cube_is_loaded():
-        self.logger.info('Cargando datos en el cubo con id %s', self.cube_id)
-        csv = data.to_csv(sep=';', index=False).encode(encoding='utf-8')
-        files = {'file': (
-            'hehe.csv', csv, 'application/vnd.ms-excel', {})}
-        upload_headers = self.session.headers.copy()
-        body, content_type = requests.models.RequestEncodingMixin._encode_files(files, {})
-        upload_headers['Content-Type'] = content_type
-        upload_headers['language'] = 'es'
-        # print(f'{self.configuracion["url_base"]}uploadFileOnServer/{self.cube_id}')
-        try:
-            response = self.session.post(f'{self.configuracion["url_base"]}uploadFileOnServer/{self.cube_id}',
-                                         data=body, headers=upload_headers)
-            response.raise_for_status()
-        except Exception as e:
-            raise e
+    def load_cube(self, data, batch_size=None, delta=False, current=None):
+        """ Carga los datos en el cubo por lotes de filas. Los lotes se suben a la vez, con como mucho
+        max_workers hilos, y se vuelcan en el cubo uno detrás de otro según van llegando al servidor.
+
+        Args:
+            data: (:class:`pandas.DataFrame`) Datos a cargar, con las columnas del mapping.
+            batch_size: (:class:`Integer`) Filas por lote. Por defecto se usa la clave
+             'cube_load_batch_size' de la configuración, 100000 si no existe.
+            delta: (:class:`Boolean`) True para cargar solo las observaciones nuevas o modificadas
+             respecto al contenido actual del cubo. Ver :meth:`delta_rows`.
+            current: (:class:`pandas.DataFrame`) Contenido actual del cubo. Si no se indica y delta es True se
+             solicita a la API con :meth:`current_data`.
+
+        Los lotes que se cargan sin avisos quedan en el registro de trabajos (clave 'job_journal' de la
+        configuración), y si se repite la carga tras una interrupción no se vuelven a cargar.
+        Si todos los lotes se cargan sin avisos se actualiza la copia local del cubo en el almacén de copias
+        (clave 'snapshot_store' de la configuración): las filas de data sustituyen a las que tienen las mismas
+        dimensiones en el contenido actual o, si no se conoce, en la copia anterior. Si algún lote tiene avisos
+        se desconoce lo que contiene el cubo y se borra su copia.
+
+        Returns: (:class:`List`) Respuesta de importCSVData de cada lote
+
+        """
+        full_data = data
+        if delta or current is not None:
+            current = self.current_data() if current is None else current
+            data = self.delta_rows(data, current)
+            if data.empty:
+                self.logger.info('El cubo con id %s ya contiene todas las observaciones', self.cube_id)
+                self.__save_snapshot(full_data, current)
+                return []
+        batch_size = batch_size or self.configuracion.get('cube_load_batch_size', 100000)
+        batches = [data.iloc[start:start + batch_size] for start in range(0, len(data), batch_size)] or [data]
+        hashes = [self.__hash_batch(batch) if self.job_journal.path else None for batch in batches]
+        pending = [number for number, batch_hash in enumerate(hashes)
+                   if not self.job_journal.done('load_cube', self.urn, batch_hash)]
+        if len(pending) < len(batches):
+            self.logger.info('%s de %s lotes ya se cargaron en el cubo con id %s en una ejecución anterior',
+                             len(batches) - len(pending), len(batches), self.cube_id)
+            batches = [batches[number] for number in pending]
+            hashes = [hashes[number] for number in pending]
+            if not batches:
+                return []
+        self.logger.info('Cargando %s filas en el cubo con id %s en %s lotes', len(data), self.cube_id, len(batches))
+        start = time.perf_counter()
+        results = []
+        with ThreadPoolExecutor(max_workers=self.configuracion.get('max_workers', 1)) as executor:
+            uploads = [executor.submit(self.__upload_csv, batch) for batch in batches]
+            for number, upload in enumerate(uploads, 1):
+                results.append(self.__import_csv(upload.result(), number, len(batches), len(batches[number - 1])))
+                if not results[-1]['WarnDictionary']:
+                    self.job_journal.record('load_cube', self.urn, hashes[number - 1])
+        elapsed = time.perf_counter() - start
+        self.logger.info('Cargadas %s filas en el cubo con id %s en %.2f segundos (%.0f filas/s)', len(data),
+                         self.cube_id, elapsed, len(data) / elapsed if elapsed else 0)
+        if any(result['WarnDictionary'] for result in results):
+            self.snapshot_store.delete(self.cube_id)
+        else:
+            self.__save_snapshot(full_data, current)
+        return results
+
+    @property
+    def urn(self):
+        return f'cube:{self.cube_id}'
 
-        path = response.text.replace('\\\\','%5C').replace('"','')
+    @staticmethod
+    def __hash_batch(batch):
+        return content_hash(pandas.util.hash_pandas_object(batch, index=False).values.tobytes() +
+                            ';'.join(map(str, batch.columns)).encode('utf-8'))
 
-        self.logger.info('Archivo con datos subido a la API. Volcando los datos en el cubo')
+    def __save_snapshot(self, data, current):
+        columns = {component['column']: component['column_mapped'] for component in self.components}
+        if current is None:
+            current = self.snapshot_store.load(self.cube_id)
+            if current is not None:
+                current = current.rename(columns={value: key for key, value in columns.items()})
+        if current is not None and len(current):
+            data = self.merge_rows(current, data)
+            if data is None:
+                self.snapshot_store.delete(self.cube_id)
+                return
+        self.snapshot_store.save(self.cube_id, data.rename(columns=columns))
 
+    def merge_rows(self, current, data):
+        """ Sustituye en current las observaciones que tienen las mismas dimensiones que alguna de data y añade
+        el resto.
+
+        Args:
+            current: (:class:`pandas.DataFrame`) Contenido del cubo, con las columnas del mapping.
+            data: (:class:`pandas.DataFrame`) Datos cargados, con las mismas columnas.
+
+        Returns: (:class:`pandas.DataFrame`) Contenido del cubo tras cargar data, con los tipos de data, o None si
+         no se pueden comparar las dimensiones
+
+        """
+        keys = [component['column'] for component in self.components
+                if component['type'] in ('Dimension', 'TimeDimension') and component['column'] in data.columns]
+        if not keys or any(key not in current.columns for key in keys):
+            self.logger.warning('No se pueden comparar las dimensiones del cubo con id %s', self.cube_id)
+            return None
+        merged = pandas.concat([current[[column for column in data.columns if column in current.columns]], data],
+                               ignore_index=True)
+        merged = merged[~pandas.Series(self.__hash_rows(merged, keys)).duplicated(keep='last').values]
+        for column, dtype in data.dtypes.items():
+            try:
+                merged[column] = merged[column].astype(dtype)
+            except (TypeError, ValueError):
+                pass
+        return merged.reset_index(drop=True)
+
+    def __upload_csv(self, data):
+        # El csv se escribe en un fichero temporal y se envía desde él por bloques, sin copiarlo en memoria
+        with tempfile.TemporaryFile() as csv:
+            data.to_csv(csv, sep=';', index=False, encoding='utf-8')
+            csv.seek(0)
+            files = {'file': (
+                'hehe.csv', csv, 'application/vnd.ms-excel', {})}
+            upload_headers = self.session.headers.copy()
+            body = MultipartEncoder(files)
+            upload_headers['Content-Type'] = body.content_type
+            upload_headers['language'] = 'es'
+            # print(f'{self.configuracion["url_base"]}uploadFileOnServer/{self.cube_id}')
+            try:
+                response = self.session.post(f'{self.configuracion["url_base"]}uploadFileOnServer/{self.cube_id}',
+                                             data=body, headers=upload_headers)
+                response.raise_for_status()
+            except Exception as e:
+                raise e
+        return response.text.replace('\\\\', '%5C').replace('"', '')
+
+    def __import_csv(self, path, number, total, rows):
+        self.logger.info('Lote %s de %s subido a la API. Volcando %s filas en el cubo', number, total, rows)
+        start = time.perf_counter()
         try:
             # print( f'{self.configuracion["url_base"]}importCSVData/%3B/true/SeriesAndData/{self.cube_id}" + \
             # f"/{self.id}?filePath='+path+'&checkFiltAttributes=true')
@@ -93,12 +229,84 @@ class Mapping:
             print(response.text)
             raise e
         if response_info['WarnDictionary']:
-            self.logger.error('Error al cargar los datos en el cubo con id %s', self.cube_id)
-            self.logger.error('%s', response_info)
+            self.logger.error('Error al cargar el lote %s de %s en el cubo con id %s', number, total, self.cube_id)
+            self.logger.error('%s', response_info['WarnDictionary'])
         else:
-            self.logger.info('Datos volcados con exito')
-        # else:
-        #     self.logger.info('El cubo con id %s ya se encontraba cargado', self.cube_id)
+            self.logger.info('Lote %s de %s volcado con exito en %.2f segundos', number, total,
+                             time.perf_counter() - start)
+        return response_info
+
+    def current_data(self, page_size=None):
+        """ Solicita por páginas las observaciones que contiene el cubo.
+
+        Args:
+            page_size: (:class:`Integer`) Filas por página. Por defecto se usa la clave
+             'dataflow_page_size' de la configuración, 50000 si no existe.
+
+        Returns: (:class:`pandas.DataFrame`) Observaciones del cubo, con las columnas renombradas a las del mapping
+
+        """
+        page_size = page_size or self.configuracion.get('dataflow_page_size', 50000)
+        self.logger.info('Solicitando las observaciones actuales del cubo con id %s', self.cube_id)
+        rows = []
+        page = 1
+        while True:
+            json = {"PageNum": page, "PageSize": page_size, "FilterTable": [], "SortCols": None, "SortByDesc": None}
+            try:
+                response = self.session.get(
+                    f'{self.configuracion["url_base"]}Dataset_{self.cube_id}_ViewCurrentData', json=json)
+                response.raise_for_status()
+                data = response.json()['data'] or []
+            except Exception as e:
+                raise e
+            rows += data
+            if len(data) < page_size:
+                break
+            page += 1
+        columns = {component['column_mapped']: component['column'] for component in self.components}
+        return pandas.DataFrame.from_records(rows).rename(columns=columns)
+
+    def delta_rows(self, data, current):
+        """ Filtra las observaciones que no están en el cubo o han cambiado. Cada fila se identifica por el
+        hash de sus dimensiones y se compara por el hash de todas las columnas que tienen ambos DataFrames. Las
+        dimensiones y atributos se comparan como texto y las medidas por su valor numérico.
+
+        Args:
+            data: (:class:`pandas.DataFrame`) Datos a cargar, con las columnas del mapping.
+            current: (:class:`pandas.DataFrame`) Contenido actual del cubo, con las mismas columnas.
+
+        Returns: (:class:`pandas.DataFrame`) Filas de data que hay que cargar
+
+        """
+        keys = [component['column'] for component in self.components
+                if component['type'] in ('Dimension', 'TimeDimension') and component['column'] in data.columns]
+        if not keys or any(key not in current.columns for key in keys):
+            self.logger.warning('No se pueden comparar las dimensiones del cubo con id %s, se cargarán todos los '
+                                'datos', self.cube_id)
+            return data
+        columns = [column for column in data.columns if column in current.columns]
+        measures = [component['column'] for component in self.components if component['type'] == 'Measure']
+        loaded = set(zip(self.__hash_rows(current, keys), self.__hash_rows(current, columns, measures)))
+        changed = [pair not in loaded
+                   for pair in zip(self.__hash_rows(data, keys), self.__hash_rows(data, columns, measures))]
+        delta = data[changed]
+        self.logger.info('%s de %s filas son nuevas o han cambiado respecto al cubo con id %s', len(delta), len(data),
+                         self.cube_id)
+        return delta
+
+    @staticmethod
+    def __hash_rows(data, columns, measures=()):
+        # Las medidas numéricas se comparan por su valor, de forma que 1, 1.0 y '1' son iguales. El resto de
+        # columnas son códigos y se comparan tal cual, de forma que '01' y '1' son distintos
+        normalized = {}
+        for column in columns:
+            values = data[column]
+            if column in measures:
+                numbers = pandas.to_numeric(values, errors='coerce')
+                if numbers.notna().sum() == values.notna().sum():
+                    values = numbers.astype('Float64')
+            normalized[column] = values.astype('string')
+        return pandas.util.hash_pandas_object(pandas.DataFrame(normalized), index=False).values
 
     def cube_is_loaded(self):
         json = {"PageNum": 1, "PageSize": 1, "FilterTable": [], "SortCols": None, "SortByDesc": None}
@@ -17,17 +17,19 @@ class Mappings:
                 fichero de configuración configuracion/configuracion.yaml.
                init_data (:class:`Boolean`): True para traer todos los datos de los mappings,
                 False para no traerlos. Por defecto toma el valor False.
+               job_journal (:class:`JobJournal`): Registro de trabajos que se pasa a cada mapping.
 
            Attributes:
                data (:obj:`Dicconario`): Diccionario con todos los mappings
 
            """
 
-    def __init__(self, session, configuracion, init_data=False):
+    def __init__(self, session, configuracion, init_data=False, job_journal=None):
         self.logger = logging.getLogger(f'{self.__class__.__name__}')
 
         self.session = session
         self.configuracion = configuracion
+        self.job_journal = job_journal
         self.data = self.get(init_data)
 
     def get(self, init_data=True):
@@ -47,7 +49,7 @@ class Mappings:
             name = mapping['Name']
             des = mapping['Description'] if 'Description' in mapping else None
             data[cube_id] = Mapping(self.session, self.configuracion, mapping_id, cube_id, name, des,
-                                    init_data=init_data)
+                                    init_data=init_data, job_journal=self.job_journal)
         return data
 
     def put(self, columns, cube_id, name):
@@ -82,6 +84,7 @@ class Mappings:
         mapping_id = int(response.text)
         self.logger.info('Mapping creado correctamente con id %s', mapping_id)
 
-        self.data[cube_id] = Mapping(self.session, self.configuracion, mapping_id, cube_id, name, name, False)
+        self.data[cube_id] = Mapping(self.session, self.configuracion, mapping_id, cube_id, name, name, False,
+                                     self.job_journal)
 
         return mapping_id
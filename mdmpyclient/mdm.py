@@ -2,9 +2,14 @@ import logging
 import sys
 import os
 import copy
+import threading
 import requests
-import yaml
 
+from mdmpyclient.cache.job_journal import JobJournal
+from mdmpyclient.cache.node import node_key
+from mdmpyclient.cache.snapshot_store import SnapshotStore
+from mdmpyclient.cache.structure_cache import StructureCache
+from mdmpyclient.cache.translation_cache import TranslationCache
 from mdmpyclient.categoryscheme.categoryschemes import CategorySchemes
 from mdmpyclient.codelist.codelists import Codelists
 from mdmpyclient.conceptscheme.conceptschemes import ConceptSchemes
@@ -15,6 +20,13 @@ from mdmpyclient.mapping.mappings import Mappings
 from mdmpyclient.metadataflow.metadataflows import Metadataflows
 from mdmpyclient.metadataset.metadatasets import Metadatasets
 from mdmpyclient.msd.msds import MSDs
+from mdmpyclient.session.instrumentation import RequestMetrics
+from mdmpyclient.session.multipart import MultipartEncoder
+from mdmpyclient.session.reauthentication import ReauthenticationHook
+from mdmpyclient.session.transport import TransportAdapter
+from mdmpyclient.utils.concurrency import map_concurrently
+from mdmpyclient.utils.sdmx_export import MANIFEST, file_hash
+from mdmpyclient.utils.sdmx_import import import_levels
 
 fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
 logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
@@ -49,40 +61,119 @@ class MDM:
          y encargado de gestionarlos.
         metadatasets (:obj:`Metadatasets`): Objeto que contiene todos los metatatasets de la API
          y encargado de gestionarlos.
+
+    Las colecciones no se solicitan a la API al crear el objeto, sino la primera vez que se accede
+    a cada una de ellas. Con init_data a False los datos de cada artefacto (códigos, conceptos,
+    datos de un dataflow...) también se solicitan la primera vez que se accede a ellos.
     """
 
     def __init__(self, configuracion, translator, init_data=False):
         self.logger = logging.getLogger(f'{self.__class__.__name__}')
         self.configuracion = configuracion
         self.translator = translator
-        with open(self.configuracion['cache'], 'r', encoding='utf-8') as cache_file:
-            self.translator_cache = yaml.safe_load(cache_file)
+        translation_cache = self.configuracion.get('translation_cache', {})
+        self.translator_cache = TranslationCache(self.configuracion['cache'],
+                                                 translation_cache.get('flush_interval', 60),
+                                                 translation_cache.get('flush_size', 500),
+                                                 translation_cache.get('backend', 'yaml'),
+                                                 translation_cache.get('database', 'cache/traducciones.sqlite'))
+        self.structure_cache = StructureCache(self.configuracion.get('structure_cache'), node_key(self.configuracion))
+        self.job_journal = JobJournal(self.configuracion.get('job_journal'), node_key(self.configuracion))
+        self.snapshot_store = SnapshotStore(self.configuracion.get('snapshot_store'),
+                                            self.configuracion.get('snapshot_keep', 3), node_key(self.configuracion))
+        self.metrics = RequestMetrics(self.configuracion['url_base'])
+        # Las colecciones se crean una sola vez aunque se acceda a ellas desde varios hilos a la vez
+        self.lock = threading.RLock()
 
         self.login()
         self.initialize(init_data)
 
     def initialize(self, init_data):
-        self.codelists = Codelists(self.session, self.configuracion, self.translator, self.translator_cache, init_data)
-
-        self.concept_schemes = ConceptSchemes(self.session, self.configuracion, self.translator, self.translator_cache,
-                                              init_data)
-
-        self.category_schemes = CategorySchemes(self.session, self.configuracion, self.translator,
-                                                self.translator_cache)
-
-        self.dsds = DSDs(self.session, self.configuracion)
-
-        self.cubes = Cubes(self.session, self.configuracion)
-
-        self.mappings = Mappings(self.session, self.configuracion)
-
-        self.dataflows = Dataflows(self.session, self.configuracion, self.translator, self.translator_cache, init_data)
-
-        self.msds = MSDs(self.session, self.configuracion)
-
-        self.metadataflows = Metadataflows(self.session, self.configuracion)
-
-        self.metadatasets = Metadatasets(self.session, self.configuracion, init_data)
+        self.init_data = init_data
+        self._codelists = None
+        self._concept_schemes = None
+        self._category_schemes = None
+        self._dsds = None
+        self._cubes = None
+        self._mappings = None
+        self._dataflows = None
+        self._msds = None
+        self._metadataflows = None
+        self._metadatasets = None
+
+    @property
+    def codelists(self):
+        with self.lock:
+            if self._codelists is None:
+                self._codelists = Codelists(self.session, self.configuracion, self.translator, self.translator_cache,
+                                            self.init_data, self.structure_cache, self.job_journal)
+        return self._codelists
+
+    @property
+    def concept_schemes(self):
+        with self.lock:
+            if self._concept_schemes is None:
+                self._concept_schemes = ConceptSchemes(self.session, self.configuracion, self.translator,
+                                                       self.translator_cache, self.init_data, self.structure_cache)
+        return self._concept_schemes
+
+    @property
+    def category_schemes(self):
+        with self.lock:
+            if self._category_schemes is None:
+                self._category_schemes = CategorySchemes(self.session, self.configuracion, self.translator,
+                                                         self.translator_cache, self.init_data)
+        return self._category_schemes
+
+    @property
+    def dsds(self):
+        with self.lock:
+            if self._dsds is None:
+                self._dsds = DSDs(self.session, self.configuracion, structure_cache=self.structure_cache)
+        return self._dsds
+
+    @property
+    def cubes(self):
+        with self.lock:
+            if self._cubes is None:
+                self._cubes = Cubes(self.session, self.configuracion)
+        return self._cubes
+
+    @property
+    def mappings(self):
+        with self.lock:
+            if self._mappings is None:
+                self._mappings = Mappings(self.session, self.configuracion, job_journal=self.job_journal)
+        return self._mappings
+
+    @property
+    def dataflows(self):
+        with self.lock:
+            if self._dataflows is None:
+                self._dataflows = Dataflows(self.session, self.configuracion, self.translator, self.translator_cache,
+                                            self.init_data, self.structure_cache)
+        return self._dataflows
+
+    @property
+    def msds(self):
+        with self.lock:
+            if self._msds is None:
+                self._msds = MSDs(self.session, self.configuracion)
+        return self._msds
+
+    @property
+    def metadataflows(self):
+        with self.lock:
+            if self._metadataflows is None:
+                self._metadataflows = Metadataflows(self.session, self.configuracion)
+        return self._metadataflows
+
+    @property
+    def metadatasets(self):
+        with self.lock:
+            if self._metadatasets is None:
+                self._metadatasets = Metadatasets(self.session, self.configuracion, self.init_data)
+        return self._metadatasets
 
     def login(self):
         self.session = self.authenticate()
@@ -91,14 +182,16 @@ class MDM:
         headers = {'nodeId': self.configuracion['nodeId'], 'language': self.configuracion['languages'][0],
                    'Content-Type': 'application/json;charset=utf-8'}
         session = requests.session()
+        adapter = TransportAdapter(self.configuracion)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.hooks['response'].append(self.metrics)
 
         session.headers = headers
         self.logger.info('Solicitando acceso a la NODE_API.')
 
         try:
-            response = session.post(f'{self.configuracion["url_base"]}api/Security/Authenticate/',
-                                    json={'username': 'admin'})
-            session.headers['Authorization'] = f'bearer {response.json()["token"]}'
+            session.headers['Authorization'] = f'bearer {self.request_token(session)}'
         except KeyError:
             self.logger.error('El usuario o la contraseña no existe')
             sys.exit(1)
@@ -112,11 +205,30 @@ class MDM:
             self.logger.info('Acceso completado con éxito')
         else:
             self.logger.warning('Acceso denegado')
+        # Ante un 401 se renueva el token y se repite la petición. Va antes que las métricas, que así miden
+        # la respuesta de la petición repetida
+        session.hooks['response'].insert(0, ReauthenticationHook(session, lambda: self.request_token(session)))
         return session
 
+    def request_token(self, session):
+        """
+
+        Args:
+            session: (:class:`requests.session.Session`) Sesión con la que se hace la petición.
+
+        Returns: (:class:`String`) Token de acceso nuevo de la NODE_API
+
+        """
+        response = session.post(f'{self.configuracion["url_base"]}api/Security/Authenticate/',
+                                json={'username': 'admin'})
+        return response.json()["token"]
+
     def logout(self):
         self.logger.info('Finalizando conexión con la API')
+        self.translator_cache.flush()
         self.session.post(f'{self.configuracion["url_base"]}api/Security/Logout')
+        metrics = self.configuracion.get('metrics', {})
+        self.metrics.export(metrics.get('json'), metrics.get('prometheus'))
 
     def ddb_reset(self):
         self.logger.info('Se va a reinicar la DDB')
@@ -125,6 +237,9 @@ class MDM:
             response.raise_for_status()
         except Exception as e:
             raise e
+        # Los cubos se han vaciado y sus ids pueden reutilizarse
+        self.job_journal.clear('load_cube')
+        self.snapshot_store.delete()
 
     def delete_all(self, agency, category_scheme_id, version):
         self.logger.info('Se van a borrar todo los datos')
@@ -137,22 +252,35 @@ class MDM:
         self.dsds.delete_all(agency)
         self.concept_schemes.delete_all(agency)
         self.codelists.delete_all(agency)
+        self.job_journal.clear()
         self.initialize(True)
 
     def put(self, directory):
+        """ Importa todos los ficheros sdmx de los subdirectorios origin, categoryschemes, dsds, conceptschemes,
+        codelists y dataflows. Los ficheros se ordenan en niveles según las referencias entre sus artefactos
+        y los de cada nivel se importan a la vez, con como mucho max_workers hilos. Los ficheros que ya se
+        importaron con el mismo contenido, según el registro de trabajos (clave 'job_journal' de la
+        configuración), no se vuelven a importar.
 
-        path = os.path.join(directory, "origin")
-        self.put_all_sdmx(path)
-        path = os.path.join(directory, "categoryschemes")
-        self.put_all_sdmx(path)
-        path = os.path.join(directory, "dsds")
-        self.put_all_sdmx(path)
-        path = os.path.join(directory, "conceptschemes")
-        self.put_all_sdmx(path)
-        path = os.path.join(directory, "codelists")
-        self.put_all_sdmx(path)
-        path = os.path.join(directory, "dataflows")
-        self.put_all_sdmx(path)
+        Args:
+            directory: (:class:`String`) Directorio con los artefactos en formato sdmx
+
+        Returns: None
+
+        """
+        paths = []
+        for subdirectory in ('origin', 'categoryschemes', 'dsds', 'conceptschemes', 'codelists', 'dataflows'):
+            path = os.path.join(directory, subdirectory)
+            if not os.path.isdir(path):
+                self.logger.warning('No existe el directorio %s', path)
+                continue
+            paths += [os.path.join(path, filename.name) for filename in sorted(os.scandir(path), key=lambda f: f.name)
+                      if filename.name != MANIFEST]
+        levels = import_levels(paths)
+        self.logger.info('Se van a importar %s ficheros en %s niveles', len(paths), len(levels))
+        for number, level in enumerate(levels, 1):
+            self.logger.info('Importando nivel %s de %s con %s ficheros', number, len(levels), len(level))
+            map_concurrently(self.put_sdmx, level, self.configuracion.get('max_workers', 1))
 
     def put_all_sdmx(self, directory):
         """
@@ -164,38 +292,62 @@ class MDM:
 
               """
         for filename in os.scandir(directory):
-            path = os.path.join(directory, filename.name)
-            importData = False
-            with open(path, 'rb') as file:
-                body = {'file': ('test.xml', file, 'application/xml', {})}
-                data, content_type = requests.models.RequestEncodingMixin._encode_files(body, {})
-                upload_headers = copy.deepcopy(self.session.headers)
-                upload_headers['Content-Type'] = content_type
+            if filename.name == MANIFEST:
+                continue
+            self.put_sdmx(os.path.join(directory, filename.name))
+
+    def put_sdmx(self, path):
+        """ Importa un fichero sdmx. Solo queda en el registro de trabajos si se han importado todos sus
+        artefactos.
+
+        Args:
+            path: (:class:`String`) Fichero con los artefactos en formato sdmx que se van a subir
+
+        Returns: None
+
+        """
+        urn = os.path.abspath(path)
+        sdmx_hash = file_hash(path) if self.job_journal.path else None
+        if self.job_journal.done('sdmx_import', urn, sdmx_hash):
+            self.logger.info('El fichero %s ya se importó en una ejecución anterior', path)
+            return
+        importData = False
+        all_ok = False
+        with open(path, 'rb') as file:
+            body = {'file': ('test.xml', file, 'application/xml', {})}
+            data = MultipartEncoder(body)
+            upload_headers = copy.deepcopy(self.session.headers)
+            upload_headers['Content-Type'] = data.content_type
+            try:
+                response = self.session.post(
+                    f'{self.configuracion["url_base"]}checkImportedFileXmlSdmxObjects', data=data,
+                    headers=upload_headers)
+                response_body = response.json()
+                imported_items = response_body["importedItem"]
+                response.raise_for_status()
+            except Exception as e:
+                raise e
+            self.logger.info('Artefacto subido correctamente a la API, realizando importacion')
+
+            request_post_body = {"hashImport": response_body["hashImport"], "importedItem": []}
+            all_ok = bool(imported_items) and all(importedItem["isOk"] for importedItem in imported_items)
+            for importedItem in imported_items:
+
+                if importedItem["isOk"]:
+                    importData = True
+                    request_post_body["importedItem"].append(importedItem)
+            if importData:
                 try:
                     response = self.session.post(
-                        f'{self.configuracion["url_base"]}checkImportedFileXmlSdmxObjects', data=data,
-                        headers=upload_headers)
-                    response_body = response.json()
-                    imported_items = response_body["importedItem"]
+                        f'{self.configuracion["url_base"]}importFileXmlSdmxObjects',
+                        json=request_post_body)
                     response.raise_for_status()
                 except Exception as e:
                     raise e
-                self.logger.info('Artefacto subido correctamente a la API, realizando importacion')
-
-                request_post_body = {"hashImport": response_body["hashImport"], "importedItem": []}
-                for importedItem in imported_items:
-
-                    if importedItem["isOk"]:
-                        importData = True
-                        request_post_body["importedItem"].append(importedItem)
-                if importData:
-                    try:
-                        response = self.session.post(
-                            f'{self.configuracion["url_base"]}importFileXmlSdmxObjects',
-                            json=request_post_body)
-                        response.raise_for_status()
-                    except Exception as e:
-                        raise e
+        if all_ok:
+            self.job_journal.record('sdmx_import', urn, sdmx_hash)
+        else:
+            self.logger.warning('No se han podido importar todos los artefactos del fichero %s', path)
 
     def synchronizeAuthDB(self):
         try:
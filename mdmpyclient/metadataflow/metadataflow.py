@@ -20,7 +20,8 @@ class Metadataflow:
                name (:class:`Diccionario`): Nombres del metadataflow.
                des (class: `Diccionario`): Descripciones del metadataflow.
                init_data (:class:`Boolean`): True para traer todos los datos del metadataflow,
-                False para no traerlos. Por defecto toma el valor False.
+                False para traerlos la primera vez que
+                se acceda a ellos. Por defecto toma el valor False.
 
            Attributes:
                data (:obj:`List`): Lista con todos los datos del metadataflow.
@@ -36,7 +37,17 @@ class Metadataflow:
         self.id = meta_id
         self.names = names
         self.des = des
-        self.data = self.get() if init_data else None
+        self._data = self.get() if init_data else None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self.get()
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
 
     def get(self):
         self.logger.info('Solicitando información del metadataflow con id %s', self.id)
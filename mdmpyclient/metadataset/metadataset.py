@@ -5,7 +5,6 @@ import sys
 import subprocess
 
 import pandas as pd
-import requests
 import yaml
 
 from bs4 import BeautifulSoup
@@ -13,6 +12,8 @@ from bs4 import BeautifulSoup
 from selenium.webdriver.common.by import By
 from selenium import webdriver
 
+from mdmpyclient.session.multipart import MultipartEncoder
+
 fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
 logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
 
@@ -28,7 +29,8 @@ class Metadataset:
                    id (:class:`String`): Identificadordel metadataset
                    name (:class:`Diccionario`): Nombres del metadataset.
                    init_data (:class:`Boolean`): True para traer todos los datos del metadataset,
-                    False para no traerlos. Por defecto toma el valor False.
+                    False para traerlos la primera vez que
+                    se acceda a ellos. Por defecto toma el valor False.
 
                Attributes:
                    data (:obj:`Diccionario`): Diccionario con todos los datos del metadataset.
@@ -41,7 +43,17 @@ class Metadataset:
         self.configuracion = configuracion
         self.id = meta_id
         self.names = names
-        self.reports = self.get(init_data)
+        self._reports = self.get(init_data) if init_data else None
+
+    @property
+    def reports(self):
+        if self._reports is None:
+            self._reports = self.get(True)
+        return self._reports
+
+    @reports.setter
+    def reports(self, reports):
+        self._reports = reports
 
     def get(self, init_data):
         reports = {'id': [], 'code': [], 'published': []}
@@ -163,9 +175,9 @@ class Metadataset:
     def put(self, path):
         with open(path, 'rb') as file:
             body = {'file': ('test.json', file, 'application/json', {})}
-            data, content_type = requests.models.RequestEncodingMixin._encode_files(body, {})
+            data = MultipartEncoder(body)
             upload_headers = copy.deepcopy(self.session.headers)
-            upload_headers['Content-Type'] = content_type
+            upload_headers['Content-Type'] = data.content_type
             try:
                 response = self.session.post(
                     f'{self.configuracion["url_base"]}api/RM/checkFileJsonMetadataset/{self.id}', data=data,
@@ -186,9 +198,9 @@ class Metadataset:
     def publish(self, report):
         self.logger.info('Publicando reporte %s', report)
         body = {'newState': (None, 'PUBLISHED', None, ())}
-        data, content_type = requests.models.RequestEncodingMixin._encode_files(body, {})
+        data = MultipartEncoder(body)
         upload_headers = copy.deepcopy(self.session.headers)
-        upload_headers['Content-Type'] = content_type
+        upload_headers['Content-Type'] = data.content_type
         try:
             response = self.session.post(
                 f'{self.configuracion["url_base"]}api/RM/updateStateMetReport/{self.id}/{report}',
@@ -19,7 +19,8 @@ class MSD:
                  name (:class:`Diccionario`): Nombres del MSD.
                  des (class: `Diccionario`): Descripciones del MSD.
                  init_data (:class:`Boolean`): True para traer todos los datos del MSD,
-                  False para no traerlos. Por defecto toma el valor False.
+                  False para traerlos la primera vez que
+                  se acceda a ellos. Por defecto toma el valor False.
 
              Attributes:
                  data (:obj:`Diccionario`): Diccionario con todos los datos del MSD.
@@ -35,7 +36,17 @@ class MSD:
         self.version = version
         self.names = names
         self.des = des
-        self.data = self.get() if init_data else None
+        self._data = self.get() if init_data else None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self.get()
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
 
     def get(self):
         self.logger.info('Solicitando información del MSD con id %s', self.id)
@@ -0,0 +1,159 @@
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+
+from mdmpyclient.utils.concurrency import map_concurrently
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+STAGES = ['dsd', 'cube', 'mapping', 'load', 'dataflow', 'publish']
+
+# La creación de estructuras modifica los diccionarios de las colecciones compartidas y es rápida,
+# así que por defecto solo la carga de datos y la publicación se hacen para varias operaciones a la vez.
+DEFAULT_CONCURRENCY = {'dsd': 1, 'cube': 1, 'mapping': 1, 'dataflow': 1}
+
+# Etapas que crean un artefacto, con la colección en la que su put comprueba si ya existe. La petición
+# de creación puede haber llegado a la API aunque el intento fallara, así que antes de reintentarlas se
+# vuelve a solicitar la colección para no crear el artefacto dos veces.
+CREATION_STAGES = {'dsd': 'dsds', 'cube': 'cubes', 'mapping': 'mappings', 'dataflow': 'dataflows'}
+
+
+class PublicationPipeline:
+    """ Publica un lote de operaciones estadísticas. Para cada operación se ejecutan en orden las etapas
+    dsd (DSDs.put), cube (Cubes.put), mapping (Mappings.put), load (Mapping.load_cube), dataflow
+    (Dataflows.put) y publish (Dataflow.publish), y las distintas operaciones avanzan a la vez con un
+    límite de operaciones simultáneas en cada etapa.
+
+    Cada operación se describe con un diccionario con su 'id' y los argumentos de cada etapa:
+
+        {'id': 'EPA_01',
+         'dsd': {argumentos de DSDs.put},
+         'cube': {argumentos de Cubes.put},
+         'mapping': {'columns': ..., 'name': ...},
+         'data': DataFrame, o función sin argumentos que lo devuelve,
+         'load': {argumentos de Mapping.load_cube, opcional},
+         'dataflow': {argumentos de Dataflows.put salvo cube_id y dsd},
+         'publish': True}
+
+    Las etapas sin argumentos en la especificación se omiten, y el cubo y el DSD obtenidos en las primeras
+    etapas se pasan a las siguientes. Una etapa que falla se reintenta 'retries' veces; si crea un artefacto,
+    antes de reintentarla se actualiza su colección desde la API (ver CREATION_STAGES). Las etapas
+    completadas de cada operación se recuerdan entre llamadas a run, de forma que volver a lanzar las
+    operaciones fallidas continúa desde la etapa en la que fallaron.
+
+    Args:
+        mdm (:obj:`MDM`): Cliente del M&D Manager.
+        configuracion (:class:`Diccionario`): Parámetros del pipeline, normalmente la clave 'pipeline' de la
+         configuración: max_workers (operaciones simultáneas en total), retries, backoff_factor y
+         concurrency (operaciones simultáneas por etapa).
+
+    """
+
+    def __init__(self, mdm, configuracion=None):
+        self.logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.mdm = mdm
+        configuracion = configuracion if configuracion is not None else mdm.configuracion.get('pipeline', {})
+        self.max_workers = configuracion.get('max_workers', mdm.configuracion.get('max_workers', 1))
+        self.retries = configuracion.get('retries', 2)
+        self.backoff_factor = configuracion.get('backoff_factor', 1)
+        concurrency = {**DEFAULT_CONCURRENCY, **configuracion.get('concurrency', {})}
+        self.semaphores = {stage: threading.BoundedSemaphore(concurrency.get(stage, self.max_workers))
+                           for stage in STAGES}
+        self.states = {}
+
+    def run(self, specs):
+        """ Ejecuta las etapas pendientes de cada operación.
+
+        Args:
+            specs (:class:`List`): Especificaciones de las operaciones.
+
+        Raises: ValueError si varias operaciones tienen el mismo id.
+
+        Returns: (:class:`List`) Para cada operación, un diccionario con su id, las etapas completadas,
+         el resultado de cada etapa y el error de la etapa fallida, o None si se ha publicado entera
+
+        """
+        duplicated = sorted(spec_id for spec_id, count in Counter(spec['id'] for spec in specs).items() if count > 1)
+        if duplicated:
+            raise ValueError(f'Hay varias operaciones con el mismo id: {duplicated}')
+        # Las colecciones se cargan antes de lanzar los hilos para que no se soliciten varias veces
+        for collection in ('dsds', 'cubes', 'mappings', 'dataflows'):
+            getattr(self.mdm, collection)
+        start = time.perf_counter()
+        specs = {spec['id']: spec for spec in specs}
+        results = map_concurrently(lambda spec_id: self.run_operation(specs[spec_id]), specs, self.max_workers)
+        failed = [result['id'] for result in results if result['error']]
+        self.logger.info('Procesadas %s operaciones en %.2f segundos, %s con errores: %s', len(results),
+                         time.perf_counter() - start, len(failed), failed)
+        return results
+
+    def run_operation(self, spec):
+        state = self.states.setdefault(spec['id'], {'id': spec['id'], 'completed': [], 'results': {},
+                                                    'error': None})
+        state['error'] = None
+        for stage in STAGES:
+            if stage in state['completed'] or not self.__has_stage(spec, stage):
+                continue
+            try:
+                state['results'][stage] = self.__run_stage(spec, stage, state['results'])
+            except Exception as e:
+                self.logger.error('La operación %s ha fallado en la etapa %s: %s', spec['id'], stage, e)
+                state['error'] = f'{stage}: {e}'
+                break
+            state['completed'].append(stage)
+        return state
+
+    @staticmethod
+    def __has_stage(spec, stage):
+        if stage == 'load':
+            return spec.get('data') is not None
+        if stage == 'publish':
+            return spec.get('publish', True) and 'dataflow' in spec
+        return stage in spec
+
+    def __run_stage(self, spec, stage, results):
+        for attempt in range(self.retries + 1):
+            try:
+                with self.semaphores[stage]:
+                    start = time.perf_counter()
+                    if attempt and stage in CREATION_STAGES:
+                        self.__refresh(CREATION_STAGES[stage])
+                    result = getattr(self, f'_stage_{stage}')(spec, results)
+                self.logger.info('Operación %s: etapa %s completada en %.2f segundos', spec['id'], stage,
+                                 time.perf_counter() - start)
+                return result
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                wait = self.backoff_factor * 2 ** attempt
+                self.logger.warning('Operación %s: error en la etapa %s (%s), reintentando en %s segundos',
+                                    spec['id'], stage, e, wait)
+                time.sleep(wait)
+
+    def __refresh(self, name):
+        self.logger.info('Actualizando %s desde la API antes de reintentar', name)
+        collection = getattr(self.mdm, name)
+        collection.data = collection.get(False)
+
+    def _stage_dsd(self, spec, results):
+        return self.mdm.dsds.put(**spec['dsd'])
+
+    def _stage_cube(self, spec, results):
+        return self.mdm.cubes.put(**spec['cube'])
+
+    def _stage_mapping(self, spec, results):
+        return self.mdm.mappings.put(cube_id=results['cube'], **spec['mapping'])
+
+    def _stage_load(self, spec, results):
+        mapping = self.mdm.mappings.data[results['cube']]
+        data = spec['data']() if callable(spec['data']) else spec['data']
+        return mapping.load_cube(data, **spec.get('load', {}))
+
+    def _stage_dataflow(self, spec, results):
+        return self.mdm.dataflows.put(cube_id=results['cube'], dsd=results.get('dsd'), **spec['dataflow'])
+
+    def _stage_publish(self, spec, results):
+        return results['dataflow'].publish()
@@ -0,0 +1,240 @@
+import functools
+import json
+import logging
+import math
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+# Endpoints cuyos parámetros son el id, la agencia y la versión de un artefacto
+ARTEFACT_ENDPOINTS = {'codelist', 'conceptScheme', 'categoryScheme', 'dsd', 'msd', 'metadataflow', 'importDCS',
+                      'artefact', 'downloadMetadati'}
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def endpoint_template(url, url_base=''):
+    """ Plantilla del endpoint de una url, con sus parámetros sustituidos por su nombre. Por ejemplo
+    codelist/CL_SEXO/ESC01/1.0 pasa a ser codelist/{id}/{agency}/{version} y
+    Dataset_12_ViewCurrentData pasa a ser Dataset_{id}_ViewCurrentData.
+
+    Args:
+        url: (:class:`String`) Url de la petición.
+        url_base: (:class:`String`) Url base de la API, que no forma parte de la plantilla.
+
+    Returns: (:class:`String`) Plantilla del endpoint
+
+    """
+    path = url[len(url_base):] if url_base and url.startswith(url_base) else urlsplit(url).path
+    segments = urlsplit(path).path.strip('/').split('/')
+    literal = {'api': 3, 'artefact': 2, 'downloadMetadati': 2}.get(segments[0], 1)
+    template = [re.sub(r'\d+', '{id}', segment) for segment in segments[:literal]]
+    names = ['{id}', '{agency}', '{version}'] if segments[0] in ARTEFACT_ENDPOINTS else []
+    for segment in segments[literal:]:
+        if names:
+            template.append(names.pop(0))
+        elif segment.isdigit():
+            template.append('{n}' if '{id}' in template else '{id}')
+        else:
+            template.append(segment)
+    return '/'.join(template)
+
+
+def percentile(values, quantile):
+    """ Percentil por el método del rango más cercano de una lista ordenada. """
+    if not values:
+        return 0.0
+    return values[max(math.ceil(quantile * len(values)) - 1, 0)]
+
+
+class MeasuredBody:
+    """ Envuelve el cuerpo de una respuesta pedida con stream=True, que se descarga después de pasar por los
+    hooks, para contar los bytes según se leen. Cuando se termina de leer o se cierra se llama a finish con
+    los bytes recibidos y los segundos transcurridos desde que se creó.
+
+    Args:
+        raw (:class:`urllib3.response.HTTPResponse`): Cuerpo de la respuesta.
+        finish (:class:`Callable`): Función que recibe los bytes recibidos y los segundos de descarga.
+
+    """
+
+    def __init__(self, raw, finish):
+        self.__dict__.update(raw=raw, finish=finish, received=0, finished=False, start=time.perf_counter())
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.raw, name, value)
+
+    def read(self, amt=None, *args, **kwargs):
+        data = self.raw.read(amt, *args, **kwargs)
+        self.__dict__['received'] += len(data or b'')
+        if amt is None or (amt and not data):
+            self.__finish()
+        return data
+
+    def readinto(self, buffer):
+        size = self.raw.readinto(buffer)
+        self.__dict__['received'] += size
+        if len(buffer) and not size:
+            self.__finish()
+        return size
+
+    def stream(self, *args, **kwargs):
+        for chunk in self.raw.stream(*args, **kwargs):
+            self.__dict__['received'] += len(chunk)
+            yield chunk
+        self.__finish()
+
+    def close(self):
+        self.__finish()
+        return self.raw.close()
+
+    def __finish(self):
+        if not self.finished:
+            self.__dict__['finished'] = True
+            self.finish(self.received, time.perf_counter() - self.start)
+
+
+class RequestMetrics:
+    """ Hook de respuesta de la sesión de la NODE_API que mide todas las peticiones. De cada petición
+    registra la plantilla de su endpoint (ver :func:`endpoint_template`), el método, el estado, la latencia
+    hasta recibir la respuesta, los bytes enviados y recibidos y los reintentos, tanto los de urllib3 como
+    las repeticiones tras renovar el token. Las medidas se agregan por endpoint con sus percentiles y se
+    pueden exportar en JSON o en el formato de texto de Prometheus.
+
+    Las respuestas que se descargan por bloques (stream=True) se registran cuando se termina de leer o se
+    cierra su cuerpo (ver :class:`MeasuredBody`), de forma que su latencia incluye la descarga y sus bytes
+    recibidos son los leídos. Las que no se leen ni se cierran no se registran.
+
+    Args:
+        url_base (:class:`String`): Url base de la API.
+
+    """
+
+    def __init__(self, url_base=''):
+        self.logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.url_base = url_base
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def __call__(self, response, **kwargs):
+        request = response.request
+        endpoint = endpoint_template(request.url, self.url_base)
+        retries = getattr(getattr(response.raw, 'retries', None), 'history', None) or ()
+        record = functools.partial(self.record, request.method, endpoint, response.status_code,
+                                   sent=self.__body_size(request), retries=len(retries) + len(response.history))
+        if kwargs.get('stream') and response.raw is not None:
+            elapsed = response.elapsed.total_seconds()
+            response.raw = MeasuredBody(response.raw, lambda received, seconds: record(
+                latency=elapsed + seconds, received=received))
+        else:
+            record(latency=response.elapsed.total_seconds(), received=len(response.content or b''))
+        return response
+
+    @staticmethod
+    def __body_size(request):
+        body = request.body
+        if body is None:
+            return 0
+        if isinstance(body, (bytes, str)):
+            return len(body)
+        return int(getattr(body, 'len', None) or request.headers.get('Content-Length', 0) or 0)
+
+    def record(self, method, endpoint, status, latency, sent, received, retries=0):
+        """ Registra una petición.
+
+        Returns: None
+
+        """
+        with self.lock:
+            metrics = self.endpoints.setdefault((method, endpoint), {
+                'latencies': [], 'statuses': {}, 'sent_bytes': 0, 'received_bytes': 0, 'retries': 0})
+            metrics['latencies'].append(latency)
+            metrics['statuses'][str(status)] = metrics['statuses'].get(str(status), 0) + 1
+            metrics['sent_bytes'] += sent
+            metrics['received_bytes'] += received
+            metrics['retries'] += retries
+
+    def report(self):
+        """
+
+        Returns: (:class:`List`) Resumen de cada endpoint, de más a menos tiempo total empleado
+
+        """
+        report = []
+        with self.lock:
+            for (method, endpoint), metrics in self.endpoints.items():
+                latencies = sorted(metrics['latencies'])
+                report.append({'method': method, 'endpoint': endpoint, 'count': len(latencies),
+                               'total_seconds': sum(latencies), 'max_seconds': latencies[-1],
+                               **{f'p{round(quantile * 100)}_seconds': percentile(latencies, quantile)
+                                  for quantile in QUANTILES},
+                               'statuses': dict(metrics['statuses']), 'sent_bytes': metrics['sent_bytes'],
+                               'received_bytes': metrics['received_bytes'], 'retries': metrics['retries']})
+        return sorted(report, key=lambda entry: entry['total_seconds'], reverse=True)
+
+    def prometheus(self):
+        """
+
+        Returns: (:class:`String`) Medidas en el formato de texto de Prometheus
+
+        """
+        lines = ['# HELP mdm_request_duration_seconds Latencia de las peticiones a la NODE_API.',
+                 '# TYPE mdm_request_duration_seconds summary']
+        counters = {'mdm_requests_total': [], 'mdm_request_sent_bytes_total': [],
+                    'mdm_request_received_bytes_total': [], 'mdm_request_retries_total': []}
+        for entry in self.report():
+            labels = 'method="{}",endpoint="{}"'.format(entry['method'], entry['endpoint'].replace('"', '\\"'))
+            for quantile in QUANTILES:
+                value = entry[f'p{round(quantile * 100)}_seconds']
+                lines.append(f'mdm_request_duration_seconds{{{labels},quantile="{quantile}"}} {value}')
+            lines.append(f'mdm_request_duration_seconds_sum{{{labels}}} {entry["total_seconds"]}')
+            lines.append(f'mdm_request_duration_seconds_count{{{labels}}} {entry["count"]}')
+            for status, count in entry['statuses'].items():
+                counters['mdm_requests_total'].append(f'mdm_requests_total{{{labels},status="{status}"}} {count}')
+            counters['mdm_request_sent_bytes_total'].append(
+                f'mdm_request_sent_bytes_total{{{labels}}} {entry["sent_bytes"]}')
+            counters['mdm_request_received_bytes_total'].append(
+                f'mdm_request_received_bytes_total{{{labels}}} {entry["received_bytes"]}')
+            counters['mdm_request_retries_total'].append(f'mdm_request_retries_total{{{labels}}} {entry["retries"]}')
+        for name, values in counters.items():
+            lines.append(f'# TYPE {name} counter')
+            lines += values
+        return '\n'.join(lines) + '\n'
+
+    def export(self, json_path=None, prometheus_path=None):
+        """ Escribe las medidas en los ficheros indicados y registra en el log los endpoints más lentos.
+
+        Args:
+            json_path: (:class:`String`) Fichero del informe en JSON.
+            prometheus_path: (:class:`String`) Fichero en el formato de texto de Prometheus.
+
+        Returns: None
+
+        """
+        report = self.report()
+        for entry in report[:5]:
+            self.logger.info('%s %s: %s peticiones, %.2f s en total, p50 %.3f s, p99 %.3f s', entry['method'],
+                             entry['endpoint'], entry['count'], entry['total_seconds'], entry['p50_seconds'],
+                             entry['p99_seconds'])
+        if json_path:
+            self.__write(json_path, json.dumps(report, indent=2))
+        if prometheus_path:
+            self.__write(prometheus_path, self.prometheus())
+
+    @staticmethod
+    def __write(path, content):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            file.write(content)
+        os.replace(tmp_path, path)
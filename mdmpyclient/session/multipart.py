@@ -0,0 +1,106 @@
+import binascii
+import os
+
+
+class MultipartEncoder:
+    """ Cuerpo multipart/form-data que se genera según se envía. Los ficheros se leen por bloques desde
+    su posición actual en el momento de enviarse, así que ni el fichero ni el cuerpo completo se cargan en
+    memoria. Tiene longitud conocida, para que requests envíe la cabecera Content-Length, y se puede
+    rebobinar con seek, para que urllib3 pueda reintentar la petición.
+
+    Admite los mismos campos que el parámetro files de requests: diccionario de nombre a tupla
+    (nombre de fichero, contenido, content type, cabeceras), donde el contenido puede ser un fichero
+    abierto en modo binario, bytes o una cadena de caracteres y los últimos elementos son opcionales.
+
+    Args:
+        fields (:class:`Diccionario`): Campos del formulario.
+        boundary (:class:`String`): Separador de las partes. Por defecto se genera uno aleatorio.
+
+    Attributes:
+        content_type (:class:`String`): Valor de la cabecera Content-Type de la petición.
+        len (:class:`Integer`): Longitud en bytes del cuerpo.
+
+    """
+
+    def __init__(self, fields, boundary=None):
+        self.boundary = boundary or binascii.hexlify(os.urandom(16)).decode('ascii')
+        self.content_type = f'multipart/form-data; boundary={self.boundary}'
+        self.segments = []
+        for name, value in fields.items():
+            filename, content, content_type, headers = (tuple(value) + (None, None, None))[:4] \
+                if isinstance(value, (tuple, list)) else (None, value, None, None)
+            self.__add_bytes(f'--{self.boundary}\r\n'.encode('ascii'))
+            self.__add_bytes(self.__headers(name, filename, content_type, headers))
+            self.__add_content(content)
+            self.__add_bytes(b'\r\n')
+        self.__add_bytes(f'--{self.boundary}--\r\n'.encode('ascii'))
+        self.len = sum(length for _, _, length in self.segments)
+        self.position = 0
+
+    @staticmethod
+    def __headers(name, filename, content_type, headers):
+        disposition = f'form-data; name="{name}"'
+        if filename:
+            disposition += '; filename="{}"'.format(filename.replace('"', '%22'))
+        lines = [f'Content-Disposition: {disposition}']
+        if content_type:
+            lines.append(f'Content-Type: {content_type}')
+        lines += [f'{key}: {value}' for key, value in dict(headers or {}).items()]
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8')
+
+    def __add_bytes(self, data):
+        self.segments.append((data, 0, len(data)))
+
+    def __add_content(self, content):
+        if content is None:
+            self.__add_bytes(b'')
+        elif isinstance(content, str):
+            self.__add_bytes(content.encode('utf-8'))
+        elif isinstance(content, (bytes, bytearray)):
+            self.__add_bytes(bytes(content))
+        else:
+            start = content.tell()
+            end = content.seek(0, os.SEEK_END)
+            content.seek(start)
+            self.segments.append((content, start, end - start))
+
+    def __len__(self):
+        return self.len
+
+    def __iter__(self):
+        self.seek(0)
+        return iter(lambda: self.read(65536), b'')
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += self.len
+        self.position = min(max(offset, 0), self.len)
+        return self.position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.len - self.position
+        chunks = []
+        segment_start = 0
+        for source, start, length in self.segments:
+            segment_end = segment_start + length
+            if size > 0 and self.position < segment_end:
+                offset = self.position - segment_start
+                count = min(size, length - offset)
+                if isinstance(source, bytes):
+                    chunk = source[offset:offset + count]
+                else:
+                    source.seek(start + offset)
+                    chunk = source.read(count)
+                    if len(chunk) != count:
+                        raise IOError('El fichero ha cambiado de tamaño mientras se enviaba')
+                chunks.append(chunk)
+                self.position += count
+                size -= count
+            segment_start = segment_end
+        return b''.join(chunks)
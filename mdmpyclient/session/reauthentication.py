@@ -0,0 +1,67 @@
+import logging
+import sys
+import threading
+import time
+from datetime import timedelta
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+
+class ReauthenticationHook:
+    """ Hook de respuesta de la sesión de la NODE_API que renueva el token cuando caduca. Si una petición
+    recibe un 401 se solicita un token nuevo, se actualiza la cabecera Authorization de la sesión y se
+    repite la petición una vez con el token nuevo, de forma que quien la hizo recibe la respuesta repetida.
+
+    Si varios hilos reciben un 401 a la vez solo el primero solicita un token; el resto repite su petición
+    con el token que ya tiene la sesión. Los cuerpos que se envían desde ficheros o desde
+    :class:`MultipartEncoder` se rebobinan antes de repetirse.
+
+    Args:
+        session (:class:`requests.session.Session`): Sesión en la que está registrado el hook.
+        request_token (:class:`Callable`): Función sin argumentos que se autentica en la API y devuelve el
+         token nuevo.
+
+    """
+
+    def __init__(self, session, request_token):
+        self.logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.session = session
+        self.request_token = request_token
+        self.lock = threading.Lock()
+
+    def __call__(self, response, **kwargs):
+        request = response.request
+        if response.status_code != 401 or 'api/Security/' in request.url:
+            return response
+        self.refresh(request.headers.get('Authorization'))
+
+        replay = request.copy()
+        replay.headers['Authorization'] = self.session.headers['Authorization']
+        if hasattr(replay.body, 'seek'):
+            replay.body.seek(0)
+        # Se consume la respuesta para que la conexión vuelva al pool antes de repetir la petición
+        _ = response.content
+        response.close()
+        start = time.perf_counter()
+        replayed = response.connection.send(replay, **kwargs)
+        # El adaptador no mide el tiempo, que sí mide Session.send; se cuenta el de las dos peticiones
+        replayed.elapsed = response.elapsed + timedelta(seconds=time.perf_counter() - start)
+        replayed.history.append(response)
+        replayed.request = replay
+        return replayed
+
+    def refresh(self, expired):
+        """ Solicita un token nuevo, salvo que otro hilo ya haya sustituido el token caducado.
+
+        Args:
+            expired: (:class:`String`) Cabecera Authorization con la que se recibió el 401.
+
+        Returns: None
+
+        """
+        with self.lock:
+            if self.session.headers.get('Authorization') != expired:
+                return
+            self.logger.info('El token de acceso ha caducado, solicitando uno nuevo')
+            self.session.headers['Authorization'] = f'bearer {self.request_token()}'
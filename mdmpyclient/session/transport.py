@@ -0,0 +1,77 @@
+import logging
+import sys
+
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+# Endpoints que se piden por GET pero modifican datos en el servidor
+NON_IDEMPOTENT_ENDPOINTS = ('importCSVData',)
+
+
+class TransportRetry(Retry):
+    """ Retry de urllib3 que trata las peticiones a NON_IDEMPOTENT_ENDPOINTS como los POST: solo se repiten
+    si falla la conexión, cuando la petición no ha llegado a enviarse. """
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if url and any(endpoint in url for endpoint in NON_IDEMPOTENT_ENDPOINTS):
+            method = 'POST'
+            if error is None:
+                raise MaxRetryError(_pool, url, ResponseError(f'No se repite la petición a {url}'))
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+
+class TransportAdapter(HTTPAdapter):
+    """ Adaptador HTTP usado por la sesión de la NODE_API. Ajusta el tamaño del pool de conexiones,
+    reintenta las peticiones que fallan por errores transitorios (ver :class:`TransportRetry`) y aplica un
+    timeout por endpoint.
+
+    Args:
+        configuracion (:class:`Diccionario`): Diccionario del que se obtienen algunos
+         parámetros necesarios como la url de la API. Debe ser inicializado a partir del
+         fichero de configuración configuracion/configuracion.yaml. Los parámetros del
+         adaptador se leen de la clave 'transport'.
+
+    Attributes:
+        timeout (:class:`Integer`): Timeout en segundos de las peticiones sin timeout propio.
+        timeouts (:obj:`Diccionario`): Timeouts en segundos por endpoint. La clave es un fragmento
+         de la url, por ejemplo importCSVData.
+    """
+
+    def __init__(self, configuracion):
+        self.logger = logging.getLogger(f'{self.__class__.__name__}')
+        transport = configuracion.get('transport', {})
+        self.timeout = transport.get('timeout', 60)
+        self.timeouts = transport.get('timeouts', {})
+        pool_size = transport.get('pool_size', max(configuracion.get('max_workers', 1), 10))
+        retries = transport.get('retries', 3)
+        # Las peticiones que crean o importan artefactos (POST e importCSVData) pueden haberse procesado
+        # aunque se reciba un timeout o un 504 de la pasarela, así que solo se repiten si falla la conexión.
+        # El resto se repite también tras un timeout de lectura o un estado de status_forcelist.
+        retry = TransportRetry(total=retries, connect=retries, read=retries, status=retries,
+                               backoff_factor=transport.get('backoff_factor', 0.5),
+                               status_forcelist=transport.get('status_forcelist', [502, 503, 504]),
+                               raise_on_status=False)
+        super().__init__(pool_maxsize=pool_size, max_retries=retry)
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if timeout is None:
+            timeout = self.get_timeout(request.url)
+        return super().send(request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+
+    def get_timeout(self, url):
+        """
+
+        Args:
+            url: (:class:`String`) Url de la petición
+
+        Returns: (:class:`Integer`) Timeout en segundos para la url
+
+        """
+        for endpoint, timeout in self.timeouts.items():
+            if endpoint in url:
+                return timeout
+        return self.timeout
@@ -0,0 +1,159 @@
+import logging
+import sys
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+# Traducciones que se usan si deepl no puede traducir el término
+FALLBACK_TRANSLATIONS = {('España', 'en'): 'Spain'}
+
+
+class TranslationService:
+    """ Servicio de traducción compartido por codelists, esquemas y dataflows. Consulta primero la
+    caché de traducciones y agrupa los valores que faltan, sin repetidos, en peticiones a deepl de
+    como mucho translation_batch_size textos.
+
+    Args:
+        configuracion (:class:`Diccionario`): Diccionario del que se obtienen algunos
+         parámetros necesarios como los idiomas. Debe ser inicializado a partir del
+         fichero de configuración configuracion/configuracion.yaml.
+        translator (:class:`deepl.Translator`): Cliente de deepl.
+        translator_cache (:class:`TranslationCache`): Caché de traducciones.
+
+    """
+
+    def __init__(self, configuracion, translator, translator_cache):
+        self.logger = logging.getLogger(f'{self.__class__.__name__}')
+        self.configuracion = configuracion
+        self.translator = translator
+        self.translator_cache = translator_cache
+        self.batch_size = configuracion.get('translation_batch_size', 50)
+
+    def translate_values(self, values, target_language):
+        """
+
+        Args:
+            values: (:class:`Iterable`) Textos a traducir. Se ignoran los nulos y los repetidos.
+            target_language: (:class:`String`) Idioma al que traducir, por ejemplo 'en'.
+
+        Returns: (:class:`Diccionario`) Traducción de cada texto
+
+        """
+        values = list(dict.fromkeys(value for value in values if isinstance(value, str)))
+        translations = {}
+        missing = []
+        for value in values:
+            translation = self.translator_cache.lookup(value, target_language)
+            if translation is None:
+                missing.append(value)
+            else:
+                translations[value] = translation
+        self.logger.info('Traduciendo %s términos al %s, %s no están en la caché de traducciones', len(values),
+                         target_language, len(missing))
+        deepl_language = 'EN-GB' if 'en' in target_language.lower() else target_language
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            self.logger.info('Realizando petición a deepl para traducir %s términos al %s', len(batch),
+                             deepl_language)
+            try:
+                results = self.translator.translate_text(batch, target_lang=deepl_language)
+            except Exception:
+                fallbacks = [FALLBACK_TRANSLATIONS.get(self.translator_cache.key(value, target_language))
+                             for value in batch]
+                if None in fallbacks:
+                    raise
+                translations.update(zip(batch, fallbacks))
+                continue
+            self.translator_cache.count_request()
+            for value, result in zip(batch, results):
+                translations[value] = str(result)
+                self.translator_cache.set(value, target_language, str(result))
+        return {value: translations[value].replace('\n', ' ') for value in values}
+
+    def translate(self, data):
+        """
+
+        Args:
+            data: (:class:`Dictionary`) Diccionario de claves idiomas y valores cadenas de caracteres.
+
+        Returns: (:class:`Dictionary`) El mismo diccionario con los idiomas de la configuración que faltaban.
+         Si un idioma no se puede traducir se deja el texto original.
+
+        """
+        result = dict(data)
+        value = list(result.values())[0]
+        for target_language in set(self.configuracion['languages']) - set(result.keys()):
+            try:
+                result[target_language] = self.translate_values([value], target_language)[value]
+            except Exception as e:
+                self.logger.error('No se ha podido traducir el término %s al %s, se mantiene el texto original: %s',
+                                  value, target_language, e)
+                result[target_language] = value
+        return result
+
+    def pending_values(self, data, columns):
+        """
+
+        Args:
+            data: (:class:`pandas.DataFrame`) Códigos, conceptos o categorías con columnas name_<idioma>
+             y des_<idioma>.
+            columns: (:class:`List`) Columnas que se quieren traducir.
+
+        Returns: (:class:`Diccionario`) Textos de origen sin traducir por idioma de destino
+
+        """
+        pending = {}
+        for column in columns:
+            indexes, source_column = self.__to_be_translated(data, column)
+            pending.setdefault(column[-2:], []).extend(data.loc[indexes, source_column])
+        return pending
+
+    def prefetch(self, pending):
+        """ Traduce de una vez todos los textos pendientes, normalmente de varios artefactos, para que
+        las traducciones posteriores se sirvan de la caché.
+
+        Args:
+            pending: (:class:`Diccionario`) Textos por idioma de destino, como los de pending_values.
+
+        Returns: (:class:`Diccionario`) Aciertos, fallos, peticiones a deepl y peticiones ahorradas
+         respecto a traducir cada texto con una petición
+
+        """
+        before = self.translator_cache.stats()
+        for target_language, values in pending.items():
+            self.translate_values(values, target_language)
+        after = self.translator_cache.stats()
+        stats = {key: after[key] - before[key] for key in ('hits', 'misses', 'requests', 'saved_requests')}
+        self.logger.info('Traducción previa: %s términos en caché, %s traducidos con %s peticiones a deepl, '
+                         '%s peticiones ahorradas', stats['hits'], stats['misses'], stats['requests'],
+                         stats['saved_requests'])
+        return stats
+
+    def translate_columns(self, data, columns):
+        """
+
+        Args:
+            data: (:class:`pandas.DataFrame`) Códigos, conceptos o categorías con columnas name_<idioma>
+             y des_<idioma>.
+            columns: (:class:`List`) Columnas que se quieren traducir.
+
+        Returns: (:class:`pandas.DataFrame`) Filas en las que se ha traducido alguna columna, con las traducciones
+
+        """
+        data = data.copy()
+        translated_indexes = data.index[:0]
+        for column in columns:
+            indexes, source_column = self.__to_be_translated(data, column)
+            if not len(indexes):
+                continue
+            translations = self.translate_values(data.loc[indexes, source_column], column[-2:])
+            data.loc[indexes, column] = data.loc[indexes, source_column].map(translations)
+            translated_indexes = translated_indexes.append(indexes)
+        return data.loc[translated_indexes.unique()]
+
+    def __to_be_translated(self, data, column):
+        source_languages = self.configuracion['languages'].copy()
+        source_languages.remove(column[-2:])
+        source_column = column[:-2] + source_languages[-1]
+        indexes = data[data[column].isnull()].index.difference(data[data[source_column].isnull()].index, sort=False)
+        return indexes, source_column
@@ -0,0 +1,30 @@
+def item_columns(items, languages):
+    """ Construye en una sola pasada las columnas de los códigos o conceptos de un esquema a partir de
+    los elementos devueltos por la API.
+
+    Args:
+        items: (:class:`Iterable`) Elementos con las claves id, parent, names y descriptions.
+        languages: (:class:`List`) Idiomas de los que se extraen nombres y descripciones.
+
+    Returns: (:class:`Diccionario`) Columnas id, parent, name_<idioma> y des_<idioma> listas para
+     construir el DataFrame
+
+    """
+    ids = []
+    parents = []
+    names = {language: [] for language in languages}
+    descriptions = {language: [] for language in languages}
+    for item in items:
+        ids.append(item.get('id'))
+        parents.append(item.get('parent'))
+        item_names = item.get('names') or {}
+        item_descriptions = item.get('descriptions') or {}
+        for language in languages:
+            names[language].append(item_names.get(language))
+            descriptions[language].append(item_descriptions.get(language))
+
+    columns = {'id': ids, 'parent': parents}
+    for language in languages:
+        columns[f'name_{language}'] = names[language]
+        columns[f'des_{language}'] = descriptions[language]
+    return columns
@@ -0,0 +1,40 @@
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+logger = logging.getLogger('Concurrency')
+
+
+def map_concurrently(function, items, max_workers=1):
+    """ Aplica una función a todos los elementos de una lista usando como mucho max_workers hilos,
+    registrando el tiempo empleado con cada elemento.
+
+    Args:
+        function (:class:`Callable`): Función que se aplica a cada elemento.
+        items (:class:`List`): Elementos a procesar. Se usa su representación en el log.
+        max_workers (:class:`Integer`): Número máximo de hilos. Con 1 los elementos se
+         procesan de forma secuencial.
+
+    Returns: (:class:`List`) Resultados de la función, en el mismo orden que items.
+
+    """
+    items = list(items)
+
+    def timed(item):
+        start = time.perf_counter()
+        result = function(item)
+        logger.info('%s procesado en %.2f segundos', item, time.perf_counter() - start)
+        return result
+
+    start = time.perf_counter()
+    if max_workers <= 1 or len(items) <= 1:
+        results = [timed(item) for item in items]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(timed, items))
+    logger.info('Procesados %s elementos con %s hilos en %.2f segundos', len(items), max_workers,
+                time.perf_counter() - start)
+    return results
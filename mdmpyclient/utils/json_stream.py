@@ -0,0 +1,69 @@
+import json
+
+try:
+    import ijson
+except ImportError:  # ijson es opcional, sin él se decodifica la respuesta completa
+    ijson = None
+
+
+def iter_json_items(file, prefix):
+    """ Recorre los elementos de un JSON que se encuentran bajo un prefijo sin cargar el documento
+    completo en memoria. Si ijson no está instalado se decodifica el documento entero.
+
+    Args:
+        file: (:class:`io.BufferedIOBase`) Fichero binario o cuerpo de la respuesta con el JSON.
+        prefix: (:class:`String`) Ruta a los elementos con la notación de ijson, por ejemplo
+         'data.codelists.item.codes.item'.
+
+    Returns: (:class:`Generator`) Elementos encontrados bajo el prefijo
+
+    """
+    if ijson:
+        yield from ijson.items(file, prefix, use_float=True)
+    else:
+        yield from _walk(json.load(file), prefix.split('.'))
+
+
+class HeadRecorder:
+    """ Envuelve un fichero binario y guarda los primeros bytes que se leen de él, de forma que después de
+    recorrer una respuesta sin elementos se puede comprobar si era un mensaje de error.
+
+    Args:
+        file: (:class:`io.BufferedIOBase`) Fichero binario o cuerpo de la respuesta.
+        limit: (:class:`Integer`) Número máximo de bytes que se guardan.
+
+    """
+
+    def __init__(self, file, limit=65536):
+        self.file = file
+        self.limit = limit
+        self.head = b''
+
+    def read(self, size=-1):
+        data = self.file.read(size)
+        if len(self.head) < self.limit:
+            self.head += data[:self.limit - len(self.head)]
+        return data
+
+    def error(self):
+        """
+
+        Returns: (:class:`Diccionario`) El documento leído si es un JSON con la clave errorCode, o None
+
+        """
+        try:
+            data = json.loads(self.head)
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) and 'errorCode' in data else None
+
+
+def _walk(data, path):
+    if not path:
+        yield data
+    elif path[0] == 'item':
+        if isinstance(data, list):
+            for item in data:
+                yield from _walk(item, path[1:])
+    elif isinstance(data, dict) and path[0] in data:
+        yield from _walk(data[path[0]], path[1:])
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from mdmpyclient.utils.concurrency import map_concurrently
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+logger = logging.getLogger('SdmxExport')
+
+MANIFEST = 'manifest.json'
+
+
+def download_to_file(session, url, path, chunk_size=65536):
+    """ Descarga el cuerpo de una respuesta a un fichero por bloques, sin decodificarlo ni cargarlo entero
+    en memoria. Se escribe a un temporal que después se renombra, de forma que nunca queda a medias.
+
+    Args:
+        session (:class:`requests.session.Session`): Sesión autenticada en la API.
+        url (:class:`String`): Url de la petición.
+        path (:class:`String`): Fichero en el que se guarda la respuesta.
+        chunk_size (:class:`Integer`): Tamaño en bytes de cada bloque.
+
+    Returns: (:class:`Integer`) Bytes escritos
+
+    """
+    with session.get(url, stream=True) as response:
+        response.raise_for_status()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    file.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+    return size
+
+
+def file_hash(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(65536), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def load_manifest(directory):
+    """
+
+    Args:
+        directory (:class:`String`): Directorio de la exportación.
+
+    Returns: (:class:`Diccionario`) Entradas del manifiesto por nombre de fichero, vacío si no existe
+
+    """
+    try:
+        with open(os.path.join(directory, MANIFEST), 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def artefact_entry(artefact):
+    """
+
+    Args:
+        artefact: Artefacto exportable. Los dataflows se identifican por su código SDMX.
+
+    Returns: (:class:`Diccionario`) Agencia, id, versión y si el artefacto es final
+
+    """
+    return {'agency': artefact.agency_id, 'id': getattr(artefact, 'code', artefact.id), 'version': artefact.version,
+            'is_final': bool(getattr(artefact, 'is_final', False))}
+
+
+def is_up_to_date(artefact, manifest, directory):
+    """ Un artefacto no necesita exportarse de nuevo si es final, el manifiesto lo registra con la misma
+    agencia, id y versión y su fichero no ha cambiado desde que se exportó: tiene el mismo tamaño y la misma
+    fecha de modificación o, si esta ha cambiado, el mismo hash SHA-256.
+
+    """
+    entry = artefact_entry(artefact)
+    recorded = manifest.get(entry['id'] + '.xml')
+    if not entry['is_final'] or not recorded:
+        return False
+    if any(recorded.get(key) != entry[key] for key in ('agency', 'id', 'version', 'is_final')):
+        return False
+    path = os.path.join(directory, entry['id'] + '.xml')
+    if not os.path.exists(path):
+        return False
+    stat = os.stat(path)
+    if stat.st_size != recorded.get('size'):
+        return False
+    return stat.st_mtime_ns == recorded.get('mtime_ns') or file_hash(path) == recorded.get('sha256')
+
+
+def export_all(artefacts, directory, artefact_type, max_workers=1, incremental=False):
+    """ Exporta en formato sdmx todos los artefactos de una lista llamando a su método get_sdmx con como
+    mucho max_workers hilos, y registra un resumen con los bytes y el tiempo empleados.
+
+    En modo incremental se mantiene en el directorio un manifiesto (manifest.json) con la agencia, id,
+    versión, tamaño, fecha de modificación y hash SHA-256 de cada fichero exportado, y solo se descargan
+    los artefactos nuevos, los que no son finales y aquellos cuyo fichero falta o no coincide con el manifiesto.
+
+    Args:
+        artefacts (:class:`List`): Artefactos con un método get_sdmx(directory) que devuelve los bytes escritos.
+        directory (:class:`String`): Directorio en el que se guardan los ficheros. Se crea si no existe.
+        artefact_type (:class:`String`): Tipo de los artefactos, solo para el resumen.
+        max_workers (:class:`Integer`): Número máximo de descargas simultáneas.
+        incremental (:class:`Boolean`): True para exportar solo lo que ha podido cambiar.
+
+    Returns: (:class:`Integer`) Bytes escritos en total
+
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = load_manifest(directory) if incremental else {}
+    pending = [artefact for artefact in artefacts if not is_up_to_date(artefact, manifest, directory)] \
+        if incremental else list(artefacts)
+    start = time.perf_counter()
+    size = sum(map_concurrently(lambda artefact: artefact.get_sdmx(directory) or 0, pending, max_workers))
+    elapsed = time.perf_counter() - start
+    if incremental:
+        changed = 0
+        for artefact in pending:
+            entry = artefact_entry(artefact)
+            filename = entry['id'] + '.xml'
+            path = os.path.join(directory, filename)
+            stat = os.stat(path)
+            entry['size'] = stat.st_size
+            entry['mtime_ns'] = stat.st_mtime_ns
+            entry['sha256'] = file_hash(path)
+            if manifest.get(filename, {}).get('sha256') != entry['sha256']:
+                changed += 1
+            manifest[filename] = entry
+        save_manifest(directory, manifest)
+        logger.info('Exportación incremental de %s: %s sin cambios en el manifiesto, %s descargados, '
+                    '%s nuevos o modificados', artefact_type, len(artefacts) - len(pending), len(pending), changed)
+    logger.info('Exportados %s %s en formato sdmx: %.2f MB en %.2f segundos (%.2f MB/s)', len(pending),
+                artefact_type, size / 1e6, elapsed, size / 1e6 / elapsed if elapsed else 0)
+    return size
@@ -0,0 +1,111 @@
+import logging
+import sys
+from xml.etree import ElementTree
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+logger = logging.getLogger('SdmxImport')
+
+# Artefacto mantenible al que pertenece cada tipo de elemento referenciable dentro de un esquema
+ITEM_PARENTS = {'Code': 'Codelist', 'Concept': 'ConceptScheme', 'Category': 'CategoryScheme',
+                'Agency': 'AgencyScheme', 'DataProvider': 'DataProviderScheme',
+                'DataConsumer': 'DataConsumerScheme', 'OrganisationUnit': 'OrganisationUnitScheme'}
+
+
+def local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def sdmx_artefacts(path):
+    """ Lee un fichero sdmx-ml 2.1 de estructuras sin cargarlo entero en memoria.
+
+    Args:
+        path (:class:`String`): Fichero sdmx.
+
+    Returns: (:class:`Diccionario`) Para cada artefacto del fichero, como tupla (clase, agencia, id, versión),
+     el conjunto de artefactos que referencia, identificados igual
+
+    """
+    artefacts = {}
+    current = None
+    depth = 0
+    for event, element in ElementTree.iterparse(path, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            # message:Structure > message:Structures > structure:Codelists > structure:Codelist
+            if depth == 4 and 'agencyID' in element.attrib:
+                current = (local_name(element.tag), element.get('agencyID'), element.get('id'),
+                           element.get('version', '1.0'))
+                artefacts.setdefault(current, set())
+            continue
+        depth -= 1
+        if local_name(element.tag) == 'Ref' and current and 'agencyID' in element.attrib:
+            reference_class = element.get('class')
+            if element.get('maintainableParentID'):
+                reference = (ITEM_PARENTS.get(reference_class, reference_class), element.get('agencyID'),
+                             element.get('maintainableParentID'), element.get('maintainableParentVersion', '1.0'))
+            else:
+                reference = (reference_class, element.get('agencyID'), element.get('id'),
+                             element.get('version', '1.0'))
+            if reference != current:
+                artefacts[current].add(reference)
+        if depth == 3:
+            current = None
+        if depth <= 3:
+            element.clear()
+    return artefacts
+
+
+def import_levels(paths):
+    """ Ordena los ficheros sdmx que se van a importar en niveles según las referencias entre sus artefactos
+    (codelist <- esquema de conceptos <- DSD <- dataflow <- categorización). Los ficheros de un nivel solo
+    dependen de los de niveles anteriores y pueden importarse a la vez.
+
+    Cada fichero se considera responsable de sus artefactos principales, los que no referencia ningún otro
+    artefacto del mismo fichero (el DSD de un fichero que incluye también sus codelists, por ejemplo). Un
+    fichero depende de los responsables de cualquier otro artefacto que incluya o referencie. Si varios
+    ficheros son responsables del mismo artefacto se importan uno detrás de otro, en el orden recibido.
+    Los artefactos referenciados que no están en ningún fichero se suponen ya presentes en la API.
+
+    Args:
+        paths (:class:`List`): Ficheros sdmx.
+
+    Returns: (:class:`List`) Listas de ficheros, una por nivel
+
+    """
+    roots = {}
+    keys = {}
+    for path in paths:
+        try:
+            artefacts = sdmx_artefacts(path)
+        except ElementTree.ParseError as e:
+            logger.warning('No se han podido leer las referencias del fichero %s: %s', path, e)
+            artefacts = {}
+        referenced = set().union(*artefacts.values()) if artefacts else set()
+        roots[path] = set(artefacts) - referenced or set(artefacts)
+        keys[path] = set(artefacts) | referenced
+
+    owners = {}
+    dependencies = {path: set() for path in paths}
+    for path in paths:
+        for key in roots[path]:
+            if owners.get(key):
+                dependencies[path].add(owners[key][-1])
+            owners.setdefault(key, []).append(path)
+    for path in paths:
+        for key in keys[path] - roots[path]:
+            dependencies[path].update(owner for owner in owners.get(key, []) if owner != path)
+
+    levels = []
+    pending = list(paths)
+    done = set()
+    while pending:
+        level = [path for path in pending if dependencies[path] <= done]
+        if not level:
+            logger.warning('Referencias circulares entre %s ficheros, se importarán de uno en uno', len(pending))
+            levels.extend([path] for path in pending)
+            break
+        levels.append(level)
+        done.update(level)
+        pending = [path for path in pending if path not in done]
+    return levels
@@ -0,0 +1,49 @@
+import pandas
+
+
+class UploadBuffer:
+    """ Acumula las filas pendientes de subir a un esquema (códigos, conceptos o categorías). Las filas
+    se guardan en una lista y solo se convierten en DataFrame cuando se solicita, y los ids pendientes
+    se indexan en un conjunto para comprobar duplicados en tiempo constante.
+
+    Args:
+        columns (:class:`List`): Columnas del DataFrame. La primera es la del id.
+        dtype (:class:`String`): Tipo de las columnas del DataFrame.
+
+    Attributes:
+        ids (:obj:`Set`): Ids de todas las filas pendientes.
+    """
+
+    def __init__(self, columns, dtype=None):
+        self.columns = columns
+        self.dtype = dtype
+        self.ids = set()
+        self.rows = []
+        self.frame = pandas.DataFrame(columns=columns, dtype=dtype)
+
+    def __contains__(self, item_id):
+        return item_id in self.ids
+
+    def __len__(self):
+        return len(self.frame) + len(self.rows)
+
+    def append(self, row):
+        self.rows.append(row)
+        self.ids.add(row[0])
+
+    def to_frame(self):
+        """
+
+        Returns: (:class:`pandas.DataFrame`) Todas las filas pendientes
+
+        """
+        if self.rows:
+            rows = pandas.DataFrame(self.rows, columns=self.columns, dtype=self.dtype)
+            self.frame = pandas.concat([self.frame, rows], ignore_index=True) if len(self.frame) else rows
+            self.rows = []
+        return self.frame
+
+    def set_frame(self, frame):
+        self.frame = frame
+        self.rows = []
+        self.ids = set(frame[self.columns[0]].dropna())
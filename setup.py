@@ -33,6 +33,7 @@ setup(
 
     install_requires=['requests==2.28.2', 'PyYAML==6.0', 'pandas==1.4.4', 'ckanapi==4.7', 'beautifulsoup4==4.11.1',
                       'selenium==4.4.0', 'deepl==1.9.0', 'ftfy==6.1.1'],
+    extras_require={'stream': ['ijson==3.2.0'], 'snapshot': ['pyarrow==11.0.0']},
 
     classifiers=[
         'Development Status :: 2 - Pre-Alpha',
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+import time
+
+from mock import MagicMock, patch
+
+from mdmpyclient.async_mdm import AsyncMDM
+from mdmpyclient.mdm import MDM
+
+
+def test_calls_run_in_executor_threads():
+    mdm = MagicMock()
+    mdm.configuracion = {'max_workers': 2}
+    threads = []
+    mdm.dsds.put.side_effect = lambda *args: threads.append(threading.current_thread()) or args
+    mdm.dataflows.data = {'ESC01': {'DF_TEST': {'1.0': 'dataflow'}}}
+
+    async def run():
+        async with AsyncMDM(mdm) as amdm:
+            results = await asyncio.gather(amdm.dsds.put('a'), amdm.dsds.put('b'))
+            dataflow = await amdm.dataflows.data['ESC01']['DF_TEST']['1.0']
+        return results, dataflow
+
+    results, dataflow = asyncio.run(run())
+    assert results == [('a',), ('b',)]
+    assert dataflow == 'dataflow'
+    assert threading.main_thread() not in threads
+    assert mdm.logout.call_count == 1
+
+
+def test_mutating_calls_serialized_per_collection():
+    mdm = MagicMock()
+    mdm.configuracion = {'max_workers': 4}
+    running, overlaps = {'dsds': 0, 'cubes': 0}, []
+    lock = threading.Lock()
+
+    def put(collection):
+        def call(*args):
+            with lock:
+                running[collection] += 1
+                overlaps.append(dict(running))
+            time.sleep(0.05)
+            with lock:
+                running[collection] -= 1
+        return call
+
+    mdm.dsds.put.side_effect = put('dsds')
+    mdm.cubes.put.side_effect = put('cubes')
+
+    async def run():
+        amdm = AsyncMDM(mdm)
+        await asyncio.gather(*[amdm.dsds.put(n) for n in range(3)], *[amdm.cubes.put(n) for n in range(3)])
+        amdm._executor.shutdown(wait=True)
+
+    asyncio.run(run())
+    assert max(state['dsds'] for state in overlaps) == 1
+    assert max(state['cubes'] for state in overlaps) == 1
+    assert any(state['dsds'] and state['cubes'] for state in overlaps)
+
+
+@patch('mdmpyclient.mdm.Cubes')
+@patch('requests.session')
+def test_collections_created_once(mock_requests_session, mock_cubes):
+    mock_cubes.side_effect = lambda *args: time.sleep(0.05) or MagicMock()
+    mdm = MDM({'url_base': 'http://test.com/', 'nodeId': 'ESC01', 'languages': ['es'], 'cache': None}, None)
+
+    async def run():
+        async with AsyncMDM(mdm, max_workers=4) as amdm:
+            return await asyncio.gather(*[amdm.cubes for _ in range(4)])
+
+    cubes = asyncio.run(run())
+    assert mock_cubes.call_count == 1
+    assert all(collection is cubes[0] for collection in cubes)
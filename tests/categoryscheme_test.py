@@ -0,0 +1,14 @@
+import pandas
+from mock import MagicMock
+
+from mdmpyclient.categoryscheme.categoryscheme import CategoryScheme
+
+
+def test_add_category_skips_existing_and_buffered():
+    category_scheme = CategoryScheme(MagicMock(), {'url_base': 'http://test.com/', 'languages': ['es']}, None, None,
+                                     'CAT_TEST', 'ESC01', '1.0', {}, {})
+    category_scheme.categories = pandas.DataFrame({'id': ['ECONOMIA'], 'parent': [None]}, dtype='string')
+    category_scheme.add_category('economia', None, 'Economía', None)
+    category_scheme.add_category('empleo', 'ECONOMIA', 'Empleo', None)
+    category_scheme.add_category('EMPLEO', 'ECONOMIA', 'Empleo', None)
+    assert category_scheme.categories_to_upload['Id'].tolist() == ['EMPLEO']
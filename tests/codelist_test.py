@@ -0,0 +1,119 @@
+import io
+import json
+import threading
+import time
+
+from mock import MagicMock
+
+from mdmpyclient.codelist.codelist import Codelist
+from mdmpyclient.codelist.codelists import Codelists
+
+config = {'url_base': 'http://test.com/', 'languages': ['es', 'en'], 'max_workers': 3, 'translate': False}
+
+
+class Api:
+    """ Sesión simulada con codelists cuyos códigos se guardan al importarlos. """
+
+    def __init__(self, codelists):
+        self.codes = codelists
+        self.lock = threading.Lock()
+        self.uploading = 0
+        self.max_uploading = 0
+        self.session = MagicMock()
+        self.session.headers = {}
+        self.session.get.side_effect = self.get
+        self.session.post.side_effect = self.post
+
+    def get(self, url, **kwargs):
+        response = MagicMock()
+        response.ok = True
+        if url.endswith('codelist'):
+            response.json.return_value = {'data': {'codelists': [
+                {'agencyID': 'ESC01', 'id': codelist_id, 'version': '1.0', 'names': {'es': codelist_id}}
+                for codelist_id in self.codes]}}
+        else:
+            codelist_id = url.split('codelist/')[1].split('/')[0]
+            body = {'data': {'codelists': [{'codes': [{'id': code, 'names': {'es': code}}
+                                                      for code in self.codes[codelist_id]]}]}}
+            response.raw = io.BytesIO(json.dumps(body).encode('utf-8'))
+        return response
+
+    def post(self, url, **kwargs):
+        response = MagicMock()
+        if url.endswith('CheckImportedFileCsvItem'):
+            with self.lock:
+                self.uploading += 1
+                self.max_uploading = max(self.max_uploading, self.uploading)
+            time.sleep(0.1)
+            with self.lock:
+                self.uploading -= 1
+            response.json.return_value = {'identity': {}}
+        return response
+
+    def code_requests(self):
+        return [call for call in self.session.get.call_args_list if not call.args[0].endswith('codelist')]
+
+
+def test_put_merges_uploaded_codes():
+    api = Api({'CL_TEST': ['A', 'B']})
+    codelist = Codelist(api.session, config, None, None, 'CL_TEST', 'ESC01', '1.0', {}, None)
+    codelist.add_code('b', None, 'Código B', None)
+    codelist.add_code('c', 'A', 'Código C', 'Descripción C')
+    codelist.put()
+    assert codelist.codes.id.tolist() == ['A', 'B', 'C']
+    assert codelist.codes.loc[2, ['parent', 'name_es', 'des_es']].tolist() == ['A', 'Código C', 'Descripción C']
+    assert codelist.codes.name_en.isna()[2]
+    assert codelist.code_ids == {'A', 'B', 'C'}
+    assert len(codelist.upload_buffer) == 0
+    assert len(api.code_requests()) == 1
+
+
+def test_put_without_loaded_codes_reloads_them_later():
+    api = Api({'CL_TEST': ['A']})
+    codelist = Codelist(api.session, config, None, None, 'CL_TEST', 'ESC01', '1.0', {}, None)
+    codelist.upload_buffer.append(['B', None, 'Código B', None])
+    codelist.put()
+    assert codelist._codes is None
+    assert api.code_requests() == []
+    api.codes['CL_TEST'].append('B')
+    assert codelist.code_ids == {'A', 'B'}
+    assert len(api.code_requests()) == 1
+
+
+def test_put_all_data_uploads_concurrently():
+    api = Api({'CL_1': ['A'], 'CL_2': ['A'], 'CL_3': ['A'], 'CL_4': ['A']})
+    codelists = Codelists(api.session, config, None, None)
+    for codelist_id in ('CL_1', 'CL_2', 'CL_3'):
+        codelists.data['ESC01'][codelist_id]['1.0'].add_code(f'{codelist_id}_B', None, 'B', None)
+    requests_before = len(api.code_requests())
+    codelists.put_all_data()
+    assert api.max_uploading > 1
+    assert len([call for call in api.session.post.call_args_list
+                if call.args[0].endswith('importFileCsvItem')]) == 3
+    for codelist_id in ('CL_1', 'CL_2', 'CL_3'):
+        assert codelists.data['ESC01'][codelist_id]['1.0'].code_ids == {'A', f'{codelist_id}_B'}
+    assert codelists.data['ESC01']['CL_4']['1.0']._codes is None
+    assert len(api.code_requests()) == requests_before
+
+
+def test_get_with_codes_fetches_them_concurrently():
+    api = Api({'CL_1': ['A'], 'CL_2': ['B', 'C'], 'CL_3': []})
+    running = {'now': 0, 'max': 0}
+    get = api.get
+
+    def slow_get(url, **kwargs):
+        if url.endswith('codelist'):
+            return get(url, **kwargs)
+        with api.lock:
+            running['now'] += 1
+            running['max'] = max(running['max'], running['now'])
+        time.sleep(0.1)
+        with api.lock:
+            running['now'] -= 1
+        return get(url, **kwargs)
+
+    api.session.get.side_effect = slow_get
+    codelists = Codelists(api.session, config, None, None, init_data=True)
+    assert running['max'] > 1
+    assert codelists.data['ESC01']['CL_2']['1.0']._codes.id.tolist() == ['B', 'C']
+    assert codelists.data['ESC01']['CL_3']['1.0']._codes.empty
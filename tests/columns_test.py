@@ -0,0 +1,15 @@
+from mdmpyclient.utils.columns import item_columns
+
+
+def test_item_columns_fill_missing_values():
+    items = [{'id': 'A', 'names': {'es': 'Nombre A', 'en': 'Name A'}, 'descriptions': {'es': 'Descripción A'}},
+             {'id': 'B', 'parent': 'A', 'names': {'es': 'Nombre B'}},
+             {'id': 'C', 'names': None, 'descriptions': None}]
+    assert item_columns(items, ['es', 'en']) == {
+        'id': ['A', 'B', 'C'], 'parent': [None, 'A', None],
+        'name_es': ['Nombre A', 'Nombre B', None], 'des_es': ['Descripción A', None, None],
+        'name_en': ['Name A', None, None], 'des_en': [None, None, None]}
+
+
+def test_item_columns_from_generator_without_items():
+    assert item_columns(iter([]), ['es']) == {'id': [], 'parent': [], 'name_es': [], 'des_es': []}
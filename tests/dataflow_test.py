@@ -0,0 +1,70 @@
+import io
+import json
+import os
+
+import pytest
+import requests
+from mock import MagicMock
+
+from mdmpyclient.dataflow.dataflow import Dataflow
+
+
+def dataflow_mock(pages):
+    session = MagicMock()
+    session.get.return_value.json.return_value = {'DataflowColumns': ['TIME_PERIOD', 'OBS_VALUE']}
+
+    def post(url, **kwargs):
+        response = MagicMock()
+        page = pages[kwargs['json']['SqlData']['NumPage'] - 1]
+        body = page if isinstance(page, dict) else {'Data': page}
+        response.raw = io.BytesIO(json.dumps(body).encode('utf-8'))
+        response.__enter__.return_value = response
+        return response
+
+    session.post.side_effect = post
+    return Dataflow(session, {'url_base': 'http://test.com/', 'dataflow_page_size': 2}, 'DF_TEST', 'ESC01', '1.0',
+                    1, 2, {}, {})
+
+
+def test_get_by_pages_keeps_columns():
+    dataflow = dataflow_mock([[{'OBS_VALUE': '1', 'TIME_PERIOD': '2020'}, {'OBS_VALUE': '2', 'TIME_PERIOD': '2021'}],
+                              [{'OBS_VALUE': '3', 'TIME_PERIOD': '2022'}]])
+    data = dataflow.get()
+    assert data.columns.tolist() == ['TIME_PERIOD', 'OBS_VALUE']
+    assert data['OBS_VALUE'].tolist() == ['1', '2', '3']
+    assert dataflow.session.post.call_count == 2
+
+
+def test_get_empty_dataflow_keeps_columns():
+    assert dataflow_mock([[]]).get().columns.tolist() == ['TIME_PERIOD', 'OBS_VALUE']
+
+
+def test_error_page_raises_instead_of_truncating():
+    dataflow = dataflow_mock([[{'OBS_VALUE': '1', 'TIME_PERIOD': '2020'}, {'OBS_VALUE': '2', 'TIME_PERIOD': '2021'}],
+                              {'errorCode': 'INTERNAL_ERROR', 'message': 'Timeout'}])
+    with pytest.raises(requests.exceptions.HTTPError):
+        dataflow.get()
+    with pytest.raises(requests.exceptions.HTTPError):
+        dataflow.download_csv(os.devnull)
+
+
+def test_error_status_raises():
+    dataflow = dataflow_mock([[]])
+    post = dataflow.session.post.side_effect
+
+    def failed_post(url, **kwargs):
+        response = post(url, **kwargs)
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError('504')
+        return response
+
+    dataflow.session.post.side_effect = failed_post
+    with pytest.raises(requests.exceptions.HTTPError):
+        dataflow.get()
+
+
+def test_pages_sorted_by_dimensions():
+    dataflow = dataflow_mock([[{'OBS_VALUE': '1', 'TIME_PERIOD': '2020'}]])
+    dataflow.get()
+    sql_data = dataflow.session.post.call_args.kwargs['json']['SqlData']
+    assert sql_data['SortCols'] == ['TIME_PERIOD']
+    assert sql_data['SortByDesc'] is False
@@ -0,0 +1,70 @@
+import threading
+import time
+
+from mock import MagicMock
+
+from mdmpyclient.dsd.dsds import DSDs
+from mdmpyclient.utils.concurrency import map_concurrently
+
+
+def dsd_detail(dsd_id):
+    return {'data': {'dataStructures': [{'dataStructureComponents': {
+        'attributeList': {'attributes': []},
+        'dimensionList': {'dimensions': [], 'timeDimensions': [
+            {'id': 'TIME_PERIOD', 'position': 1, 'type': 'TimeDimension', 'conceptIdentity': dsd_id,
+             'localRepresentation': {}}]},
+        'measureList': {'primaryMeasure': {'id': 'OBS_VALUE', 'conceptIdentity': dsd_id}}}}]}}
+
+
+def session_mock(dsd_ids, delay=0.1):
+    running = {'now': 0, 'max': 0}
+    lock = threading.Lock()
+
+    def get(url, **kwargs):
+        response = MagicMock()
+        if url.endswith('dsd'):
+            response.json.return_value = {'data': {'dataStructures': [
+                {'id': dsd_id, 'agencyID': 'ESC01', 'version': '1.0', 'names': {'es': dsd_id}}
+                for dsd_id in dsd_ids]}}
+            return response
+        with lock:
+            running['now'] += 1
+            running['max'] = max(running['max'], running['now'])
+        time.sleep(delay)
+        with lock:
+            running['now'] -= 1
+        response.json.return_value = dsd_detail(url.split('dsd/')[1].split('/')[0])
+        return response
+
+    session = MagicMock()
+    session.get.side_effect = get
+    return session, running
+
+
+def test_get_fetches_details_concurrently():
+    session, running = session_mock(['DSD_1', 'DSD_2', 'DSD_3', 'DSD_4'])
+    dsds = DSDs(session, {'url_base': 'http://test.com/', 'max_workers': 4}, init_data=True)
+    assert running['max'] > 1
+    for dsd_id in ('DSD_1', 'DSD_2', 'DSD_3', 'DSD_4'):
+        dsd = dsds.data['ESC01'][dsd_id]['1.0']
+        assert dsd._data['dimensions'][0]['concept'] == dsd_id
+    assert session.get.call_count == 5
+
+
+def test_get_sequential_with_one_worker():
+    session, running = session_mock(['DSD_1', 'DSD_2'], delay=0)
+    dsds = DSDs(session, {'url_base': 'http://test.com/', 'max_workers': 1}, init_data=True)
+    assert running['max'] == 1
+    assert dsds.data['ESC01']['DSD_2']['1.0']._data['primary_meassure']['id'] == 'OBS_VALUE'
+
+
+def test_get_without_details():
+    session, running = session_mock(['DSD_1'])
+    dsds = DSDs(session, {'url_base': 'http://test.com/', 'max_workers': 4})
+    assert dsds.data['ESC01']['DSD_1']['1.0']._data is None
+    assert session.get.call_count == 1
+
+
+def test_map_concurrently_keeps_order():
+    assert map_concurrently(lambda item: time.sleep(0.01 * (5 - item)) or item * 2, range(5), 5) == [0, 2, 4, 6, 8]
+    assert map_concurrently(lambda item: item, [], 3) == []
@@ -0,0 +1,95 @@
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from mock import MagicMock
+
+from mdmpyclient.session.instrumentation import RequestMetrics, endpoint_template
+from mdmpyclient.utils.json_stream import iter_json_items
+
+url_base = 'http://test.com/'
+
+
+def test_endpoint_templates():
+    assert endpoint_template(url_base + 'codelist/CL_SEXO/ESC01/1.0', url_base) == 'codelist/{id}/{agency}/{version}'
+    assert endpoint_template(url_base + 'Dataset_12_ViewCurrentData?page=2', url_base) == \
+        'Dataset_{id}_ViewCurrentData'
+    assert endpoint_template(url_base + 'importCSVData/%3B/true/SeriesAndData/12?filePath=a.csv', url_base) == \
+        'importCSVData/%3B/true/SeriesAndData/{id}'
+    assert endpoint_template(url_base + 'api/RM/getJsonMetadataset/3', url_base) == 'api/RM/getJsonMetadataset/{id}'
+    assert endpoint_template(url_base + 'artefact/Dsd/DSD_TEST/ESC01/1.0', url_base) == \
+        'artefact/Dsd/{id}/{agency}/{version}'
+
+
+def response(url, status_code, seconds, body=None, content=b''):
+    mock_response = MagicMock()
+    mock_response.request.url = url
+    mock_response.request.method = 'POST'
+    mock_response.request.body = body
+    mock_response.request.headers = {}
+    mock_response.status_code = status_code
+    mock_response.elapsed = timedelta(seconds=seconds)
+    mock_response.content = content
+    mock_response.history = []
+    mock_response.raw.retries.history = ()
+    return mock_response
+
+
+def test_aggregated_report_and_export(tmp_path):
+    metrics = RequestMetrics(url_base)
+    for seconds in range(1, 11):
+        metrics(response(url_base + f'importCSVData/%3B/true/SeriesAndData/{seconds}', 200, seconds, b'abc', b'{}'))
+    failed = response(url_base + 'getDDBDataflowPreview/true', 503, 0.5)
+    failed.raw.retries.history = ('503', '503')
+    metrics(failed)
+    report = metrics.report()
+    assert report[0]['endpoint'] == 'importCSVData/%3B/true/SeriesAndData/{id}'
+    assert (report[0]['count'], report[0]['p50_seconds'], report[0]['p90_seconds']) == (10, 5, 9)
+    assert (report[0]['sent_bytes'], report[0]['received_bytes']) == (30, 20)
+    assert (report[1]['statuses'], report[1]['retries']) == ({'503': 1}, 2)
+
+    metrics.export(str(tmp_path / 'metrics.json'), str(tmp_path / 'metrics.prom'))
+    prometheus = (tmp_path / 'metrics.prom').read_text()
+    assert 'mdm_request_duration_seconds_count{method="POST",endpoint="getDDBDataflowPreview/true"} 1' in prometheus
+    assert 'mdm_request_retries_total{method="POST",endpoint="getDDBDataflowPreview/true"} 2' in prometheus
+    assert (tmp_path / 'metrics.json').exists()
+
+
+def test_streamed_response_measured_when_read():
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            self.send_response(200)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for chunk in (b'{"Data": [', b'{"A": 1}', b']}'):
+                time.sleep(0.1)
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\n\r\n')
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/'
+    metrics = RequestMetrics(url)
+    session = requests.session()
+    session.hooks['response'].append(metrics)
+    try:
+        response = session.post(url + 'getDDBDataflowPreview/true', json={}, stream=True)
+        assert metrics.report() == []
+        with response:
+            response.raw.decode_content = True
+            assert list(iter_json_items(response.raw, 'Data.item')) == [{'A': 1}]
+        with session.post(url + 'getDDBDataflowPreview/true', json={}, stream=True) as response:
+            assert b''.join(response.iter_content(chunk_size=4)) == b'{"Data": [{"A": 1}]}'
+    finally:
+        server.shutdown()
+    report = metrics.report()[0]
+    assert (report['count'], report['received_bytes']) == (2, 40)
+    assert report['max_seconds'] >= 0.3
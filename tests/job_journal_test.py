@@ -0,0 +1,80 @@
+import pandas
+from mock import MagicMock, patch
+
+from mdmpyclient.cache.job_journal import JobJournal, artefact_urn, content_hash
+from mdmpyclient.mapping.mapping import Mapping
+from mdmpyclient.mdm import MDM
+
+urn = artefact_urn('codelist.Codelist', 'ESC01', 'CL_TEST', '1.0')
+
+
+def test_steps_keyed_by_node_urn_and_hash(tmp_path):
+    path = str(tmp_path / 'jobs.sqlite')
+    journal = JobJournal(path, 'http://node1/#ESC01')
+    journal.record('codelist_codes', urn, content_hash('a'))
+    journal.close()
+
+    journal = JobJournal(path, 'http://node1/#ESC01')
+    assert journal.done('codelist_codes', urn, content_hash('a'))
+    assert not journal.done('codelist_codes', urn, content_hash('b'))
+    assert not journal.done('load_cube', urn, content_hash('a'))
+    assert not JobJournal(path, 'http://node2/#ESC01').done('codelist_codes', urn, content_hash('a'))
+    journal.clear('codelist_codes')
+    assert not journal.done('codelist_codes', urn, content_hash('a'))
+    assert not JobJournal(None).done('codelist_codes', urn, content_hash('a'))
+
+
+def test_clear_whole_node(tmp_path):
+    journal = JobJournal(str(tmp_path / 'jobs.sqlite'), 'node1')
+    other = JobJournal(str(tmp_path / 'jobs.sqlite'), 'node2')
+    for step in (journal, other):
+        step.record('load_cube', 'cube:1', 'a')
+        step.record('sdmx_import', 'fichero.xml', 'b')
+    journal.clear()
+    assert not journal.done('load_cube', 'cube:1', 'a') and not journal.done('sdmx_import', 'fichero.xml', 'b')
+    assert other.done('load_cube', 'cube:1', 'a')
+
+
+def test_load_cube_resumes_after_failed_batch(tmp_path):
+    session = MagicMock()
+    session.headers = {}
+    session.post.return_value.text = '"datos.csv"'
+    session.get.return_value.json.side_effect = [{'WarnDictionary': {}}, {'WarnDictionary': {'1': 'Error'}}]
+    config = {'url_base': 'http://test.com/'}
+    journal = JobJournal(str(tmp_path / 'jobs.sqlite'), 'node')
+    mapping = Mapping(session, config, 1, 2, 'MAP', None, job_journal=journal)
+    data = pandas.DataFrame({'TERRITORIO': ['A', 'B', 'C', 'D'], 'OBS_VALUE': [1, 2, 3, 4]})
+    mapping.load_cube(data, batch_size=2)
+
+    session.get.return_value.json.side_effect = None
+    session.get.return_value.json.return_value = {'WarnDictionary': {}}
+    session.post.reset_mock()
+    mapping = Mapping(session, config, 1, 2, 'MAP', None, job_journal=journal)
+    assert len(mapping.load_cube(data, batch_size=2)) == 1
+    assert session.post.call_count == 1
+    assert mapping.load_cube(data, batch_size=2) == []
+
+
+@patch('requests.session')
+def test_put_sdmx_recorded_only_when_imported(mock_requests_session, tmp_path):
+    config = {'url_base': 'http://test.com/', 'nodeId': 'ESC01', 'languages': ['en', 'es'], 'cache': None,
+              'job_journal': str(tmp_path / 'jobs.sqlite'), 'snapshot_store': str(tmp_path / 'snapshots')}
+    client = MDM(config, None)
+    session = mock_requests_session.return_value
+    path = tmp_path / 'codelist.xml'
+    path.write_text('<Structure/>')
+    session.post.return_value.json.return_value = {'hashImport': 'h', 'importedItem': [{'isOk': True},
+                                                                                         {'isOk': False}]}
+    client.put_sdmx(str(path))
+    session.post.reset_mock()
+    session.post.return_value.json.return_value = {'hashImport': 'h', 'importedItem': [{'isOk': True}]}
+    client.put_sdmx(str(path))
+    assert session.post.call_count == 2
+    session.post.reset_mock()
+    client.put_sdmx(str(path))
+    assert session.post.call_count == 0
+    client.snapshot_store.save(1, pandas.DataFrame({'OBS_VALUE': [1]}))
+    client.ddb_reset()  # Vacía los cubos, no las estructuras
+    assert client.snapshot_store.load(1) is None
+    client.put_sdmx(str(path))
+    assert session.post.call_count == 1
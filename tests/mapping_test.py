@@ -0,0 +1,49 @@
+import pandas
+from mock import MagicMock
+
+from mdmpyclient.mapping.mapping import Mapping
+
+config = {'url_base': 'http://test.com/', 'max_workers': 2}
+
+
+def test_load_cube_in_batches():
+    session = MagicMock()
+    session.headers = {}
+    session.post.return_value.text = '"C:\\\\tmp\\\\datos.csv"'
+    session.get.return_value.json.side_effect = [{'WarnDictionary': {}}, {'WarnDictionary': {'1': 'Error'}},
+                                                 {'WarnDictionary': {}}]
+    mapping = Mapping(session, config, 1, 2, 'MAP', None)
+    data = pandas.DataFrame({'TERRITORIO': ['A', 'B', 'C', 'D', 'E'], 'OBS_VALUE': [1, 2, 3, 4, 5]})
+    results = mapping.load_cube(data, batch_size=2)
+    assert [result['WarnDictionary'] for result in results] == [{}, {'1': 'Error'}, {}]
+    assert session.post.call_count == 3
+    assert 'filePath=C:%5Ctmp%5Cdatos.csv' in session.get.call_args.args[0]
+
+
+def test_load_cube_delta():
+    session = MagicMock()
+    session.headers = {}
+    session.post.return_value.text = '"datos.csv"'
+    session.get.return_value.json.return_value = {'WarnDictionary': {}}
+    mapping = Mapping(session, config, 1, 2, 'MAP', None)
+    mapping.components = [{'column': 'TERRITORIO', 'column_mapped': 'REF_AREA', 'type': 'Dimension'},
+                          {'column': 'TEMPORAL', 'column_mapped': 'TIME_PERIOD', 'type': 'TimeDimension'},
+                          {'column': 'OBS_VALUE', 'column_mapped': 'OBS_VALUE', 'type': 'Measure'}]
+    data = pandas.DataFrame({'TERRITORIO': ['A', 'A', 'B'], 'TEMPORAL': ['2022', '2023', '2023'],
+                             'OBS_VALUE': [1, 2, 3]})
+    current = pandas.DataFrame({'TERRITORIO': ['A', 'A'], 'TEMPORAL': ['2022', '2023'], 'OBS_VALUE': ['1.0', '5']})
+    assert mapping.delta_rows(data, current).index.tolist() == [1, 2]
+    assert mapping.load_cube(data, current=data) == []
+    assert session.post.call_count == 0
+
+
+def test_delta_keeps_leading_zeros_in_codes():
+    mapping = Mapping(MagicMock(), config, 1, 2, 'MAP', None)
+    mapping.components = [{'column': 'GEO', 'column_mapped': 'REF_AREA', 'type': 'Dimension'},
+                          {'column': 'ESTADO', 'column_mapped': 'OBS_STATUS', 'type': 'Attribute'},
+                          {'column': 'OBS_VALUE', 'column_mapped': 'OBS_VALUE', 'type': 'Measure'}]
+    current = pandas.DataFrame({'GEO': ['1', '02', '03'], 'ESTADO': ['01', 'A', 'A'], 'OBS_VALUE': ['1', '2', '3']})
+    data = pandas.DataFrame({'GEO': ['01', '02', '03'], 'ESTADO': ['01', 'A', 'A'], 'OBS_VALUE': [1.0, 2, 3]})
+    assert mapping.delta_rows(data, current).index.tolist() == [0]
+    data = pandas.DataFrame({'GEO': ['1', '02', '03'], 'ESTADO': ['1', 'A', 'A'], 'OBS_VALUE': [1.0, 2, 3]})
+    assert mapping.delta_rows(data, current).index.tolist() == [0]
@@ -21,3 +21,13 @@ def test_init(mock_requests_session):
     assert client.metadataflows
     assert client.metadatasets
 
+
+@patch('requests.session')
+def test_lazy_initialization(mock_requests_session):
+    session = mock_requests_session.return_value
+    client = MDM(config, None)
+    assert session.get.call_count == 0
+    codelists = client.codelists
+    assert session.get.call_count == 1
+    assert client.codelists is codelists
+    assert session.get.call_count == 1
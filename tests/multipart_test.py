@@ -0,0 +1,29 @@
+import io
+
+import requests
+
+from mdmpyclient.session.multipart import MultipartEncoder
+
+
+def fields(file):
+    return {'file': ('hehe.csv', file, 'application/vnd.ms-excel', {}), 'CustomData': (None, "{'lang': 'es'}")}
+
+
+def test_same_body_as_requests():
+    encoder = MultipartEncoder(fields(io.BytesIO(b'Id;Name\nA;Uno\n')))
+    body, content_type = requests.models.RequestEncodingMixin._encode_files(fields(io.BytesIO(b'Id;Name\nA;Uno\n')),
+                                                                            {})
+    body = body.replace(content_type.split('boundary=')[1].encode('ascii'), encoder.boundary.encode('ascii'))
+    assert encoder.read(10) + encoder.read() == body
+    assert len(encoder) == len(body)
+
+
+def test_rewind_and_content_length():
+    encoder = MultipartEncoder(fields(io.BytesIO(b'Id;Name\nA;Uno\n')))
+    first = encoder.read()
+    encoder.seek(0)
+    assert b''.join(iter(lambda: encoder.read(7), b'')) == first
+    encoder.seek(0)
+    request = requests.Request('POST', 'http://test.com', data=encoder,
+                               headers={'Content-Type': encoder.content_type}).prepare()
+    assert request.headers['Content-Length'] == str(len(first))
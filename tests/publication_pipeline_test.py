@@ -0,0 +1,135 @@
+import json as json_module
+
+import pytest
+from mock import MagicMock
+
+from mdmpyclient.cube.cubes import Cubes
+from mdmpyclient.dataflow.dataflows import Dataflows
+from mdmpyclient.mapping.mappings import Mappings
+from mdmpyclient.pipeline.publication_pipeline import PublicationPipeline
+
+
+def mdm_mock():
+    mdm = MagicMock()
+    mdm.configuracion = {'max_workers': 2}
+    mdm.cubes.put.side_effect = lambda **kwargs: kwargs['cube_id'] * 10
+    mapping = MagicMock()
+    mapping.cube_id = 10
+    mdm.mappings.data = {10: mapping}
+    return mdm
+
+
+def spec():
+    return {'id': 'OP_1', 'dsd': {'dsd_id': 'DSD_1'}, 'cube': {'cube_id': 1}, 'mapping': {'name': 'MAP_1'},
+            'data': 'datos', 'dataflow': {'code': 'DF_1'}}
+
+
+def test_stages_in_order_with_previous_results():
+    mdm = mdm_mock()
+    result = PublicationPipeline(mdm, {'backoff_factor': 0}).run([spec()])[0]
+    assert result['error'] is None
+    assert result['completed'] == ['dsd', 'cube', 'mapping', 'load', 'dataflow', 'publish']
+    mdm.mappings.put.assert_called_once_with(cube_id=10, name='MAP_1')
+    mdm.mappings.data[10].load_cube.assert_called_once_with('datos')
+    mdm.dataflows.put.assert_called_once_with(cube_id=10, dsd=mdm.dsds.put.return_value, code='DF_1')
+    assert mdm.dataflows.put.return_value.publish.call_count == 1
+
+
+def test_failed_stage_retried_and_resumed():
+    mdm = mdm_mock()
+    mdm.dataflows.put.side_effect = Exception('Error')
+    pipeline = PublicationPipeline(mdm, {'retries': 1, 'backoff_factor': 0})
+    result = pipeline.run([spec()])[0]
+    assert result['error'] == 'dataflow: Error'
+    assert mdm.dataflows.put.call_count == 2
+
+    mdm.dataflows.put.side_effect = None
+    result = pipeline.run([spec()])[0]
+    assert result['error'] is None
+    assert mdm.dsds.put.call_count == 1
+    assert mdm.mappings.data[10].load_cube.call_count == 1
+    assert mdm.dataflows.put.return_value.publish.call_count == 1
+
+
+class Api:
+    """ Sesión simulada que crea los cubos, mappings y dataflows en listas, como haría la API. La primera
+    petición de creación de cada tipo de artefacto lo crea pero falla, como si se perdiera la respuesta. """
+
+    def __init__(self):
+        self.created = {'cube': [], 'fileMapping': [], 'createDDBDataflow': []}
+        self.failed = set()
+        self.session = MagicMock()
+        self.session.get.side_effect = self.get
+        self.session.post.side_effect = self.post
+
+    def get(self, url, **kwargs):
+        response = MagicMock()
+        endpoint = url.split('/')[-1]
+        if endpoint == 'cubesNoFilter':
+            data = [{'IDCube': cube_id, 'Code': json['Code'], 'IDCat': json['IDCat'], 'DSDCode': json['DSDCode'],
+                     'labels': json['labels']} for cube_id, json in self.created['cube']]
+        elif endpoint == 'fileMapping':
+            data = [{'IDMapping': mapping_id, 'IDCube': json['IDCube'], 'Name': json['Name']}
+                    for mapping_id, json in self.created['fileMapping']]
+        else:
+            data = [{'ID': json['ddbDF']['ID'], 'IDDataflow': dataflow_id, 'IDCube': json['ddbDF']['IDCube'],
+                     'Agency': json['ddbDF']['Agency'], 'Version': json['ddbDF']['Version'],
+                     'labels': json['ddbDF']['labels']} for dataflow_id, json in self.created['createDDBDataflow']]
+        response.json.return_value = data
+        response.iter_content.return_value = [json_module.dumps(data).encode('utf-8')]
+        return response
+
+    def post(self, url, json=None, **kwargs):
+        endpoint = url.split('/')[-1]
+        artefact_id = len(self.created[endpoint]) + 1
+        self.created[endpoint].append((artefact_id, json))
+        if endpoint not in self.failed:
+            self.failed.add(endpoint)
+            raise Exception(f'Sin respuesta de {endpoint}')
+        response = MagicMock()
+        response.text = str(artefact_id)
+        return response
+
+
+def test_creation_stages_retried_without_duplicates():
+    api = Api()
+    configuracion = {'url_base': 'http://test.com/', 'translate': False, 'max_workers': 1}
+    mdm = MagicMock()
+    mdm.configuracion = configuracion
+    mdm.cubes = Cubes(api.session, configuracion)
+    mdm.mappings = Mappings(api.session, configuracion)
+    mdm.dataflows = Dataflows(api.session, configuracion, None, None)
+    operation = {'id': 'OP_1', 'dsd': {'dsd_id': 'DSD_1'},
+                 'cube': {'cube_id': 'C_1', 'cube_cat_id': 1, 'dsd_id': 'DSD_1', 'descripcion': 'Cubo',
+                          'dimensiones': {}},
+                 'mapping': {'columns': {'TERRITORIO': 'REF_AREA', 'OBS_VALUE': 'OBS_VALUE'}, 'name': 'MAP_1'},
+                 'dataflow': {'code': 'DF_1', 'agency': 'ESC01', 'version': '1.0', 'names': {'es': 'Flujo'},
+                              'des': None, 'columns': ['REF_AREA', 'OBS_VALUE'], 'category_scheme': MagicMock(),
+                              'category': 'CAT', 'validFrom': None, 'validTo': None},
+                 'publish': False}
+    result = PublicationPipeline(mdm, {'retries': 1, 'backoff_factor': 0}).run([operation])[0]
+    assert result['error'] is None
+    assert result['results']['cube'] == 1
+    assert result['results']['mapping'] == 1
+    assert result['results']['dataflow'].id == 1
+    assert {endpoint: len(created) for endpoint, created in api.created.items()} == {
+        'cube': 1, 'fileMapping': 1, 'createDDBDataflow': 1}
+    assert mdm.cubes.put(**operation['cube']) == 1
+    assert mdm.mappings.data[1].id == 1
+
+
+def test_duplicated_ids_rejected():
+    mdm = mdm_mock()
+    with pytest.raises(ValueError):
+        PublicationPipeline(mdm).run([spec(), spec()])
+    assert mdm.dsds.put.call_count == 0
+
+
+def test_load_uses_mapping_of_cube():
+    mdm = mdm_mock()
+    other = MagicMock()
+    other.cube_id = 10
+    mdm.mappings.data = {20: other, 10: mdm.mappings.data[10]}
+    PublicationPipeline(mdm).run([spec()])
+    mdm.mappings.data[10].load_cube.assert_called_once_with('datos')
+    assert other.load_cube.call_count == 0
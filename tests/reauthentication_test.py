@@ -0,0 +1,44 @@
+import io
+
+from mock import MagicMock
+
+from mdmpyclient.session.reauthentication import ReauthenticationHook
+
+
+def response(status_code, authorization, body=None):
+    mock_response = MagicMock()
+    mock_response.status_code = status_code
+    mock_response.history = []
+    mock_response.request.url = 'http://test.com/importCSVData'
+    mock_response.request.headers = {'Authorization': authorization}
+    mock_response.request.copy.return_value.headers = {'Authorization': authorization}
+    mock_response.request.copy.return_value.body = body
+    return mock_response
+
+
+def test_expired_token_refreshed_and_request_replayed():
+    session = MagicMock()
+    session.headers = {'Authorization': 'bearer old'}
+    hook = ReauthenticationHook(session, lambda: 'new')
+    body = io.BytesIO(b'datos')
+    body.read()
+    expired = response(401, 'bearer old', body)
+    replayed = hook(expired, timeout=10)
+    assert session.headers['Authorization'] == 'bearer new'
+    replay = expired.request.copy.return_value
+    assert replay.headers['Authorization'] == 'bearer new'
+    assert body.tell() == 0
+    expired.connection.send.assert_called_once_with(replay, timeout=10)
+    replayed.history.append.assert_called_once_with(expired)
+
+
+def test_token_refreshed_once_by_concurrent_requests():
+    session = MagicMock()
+    session.headers = {'Authorization': 'bearer old'}
+    request_token = MagicMock(return_value='new')
+    hook = ReauthenticationHook(session, request_token)
+    hook(response(401, 'bearer old'))
+    hook(response(401, 'bearer old'))
+    assert request_token.call_count == 1
+    ok = response(200, 'bearer new')
+    assert hook(ok) is ok
@@ -0,0 +1,73 @@
+import os
+
+from mock import MagicMock
+
+from mdmpyclient.utils.sdmx_export import download_to_file, export_all
+
+
+def session_returning(chunks):
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.iter_content.return_value = chunks
+    session = MagicMock()
+    session.get.return_value = response
+    return session
+
+
+def test_download_to_file_streams_chunks(tmp_path):
+    session = session_returning([b'<xml>', b'</xml>'])
+    path = tmp_path / 'CL_TEST.xml'
+    assert download_to_file(session, 'url', str(path)) == 11
+    assert path.read_bytes() == b'<xml></xml>'
+    assert session.get.call_args.kwargs['stream'] is True
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_export_all_sums_bytes(tmp_path):
+    artefacts = [MagicMock(), MagicMock()]
+    artefacts[0].get_sdmx.return_value = 10
+    artefacts[1].get_sdmx.return_value = 5
+    directory = tmp_path / 'codelists'
+    assert export_all(artefacts, str(directory), 'codelists', 2) == 15
+    assert directory.is_dir()
+    artefacts[0].get_sdmx.assert_called_once_with(str(directory))
+
+
+class Artefact:
+    def __init__(self, artefact_id, is_final, content):
+        self.id = artefact_id
+        self.agency_id = 'ESC01'
+        self.version = '1.0'
+        self.is_final = is_final
+        self.content = content
+        self.calls = 0
+
+    def get_sdmx(self, directory):
+        self.calls += 1
+        with open(f'{directory}/{self.id}.xml', 'wb') as file:
+            file.write(self.content)
+        return len(self.content)
+
+
+def test_incremental_export_skips_final_artefacts(tmp_path):
+    final, draft = Artefact('CL_FINAL', True, b'<final/>'), Artefact('CL_DRAFT', False, b'<draft/>')
+    export_all([final, draft], str(tmp_path), 'codelists', incremental=True)
+    assert export_all([final, draft], str(tmp_path), 'codelists', incremental=True) == len(b'<draft/>')
+    assert (final.calls, draft.calls) == (1, 2)
+    (tmp_path / 'CL_FINAL.xml').unlink()
+    export_all([final, draft], str(tmp_path), 'codelists', incremental=True)
+    assert final.calls == 2
+
+
+def test_incremental_export_detects_modified_file(tmp_path):
+    final = Artefact('CL_FINAL', True, b'<final/>')
+    export_all([final], str(tmp_path), 'codelists', incremental=True)
+    path = tmp_path / 'CL_FINAL.xml'
+    stat = path.stat()
+    path.write_bytes(b'<other/>')
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    export_all([final], str(tmp_path), 'codelists', incremental=True)
+    assert final.calls == 2
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2))
+    export_all([final], str(tmp_path), 'codelists', incremental=True)
+    assert final.calls == 2
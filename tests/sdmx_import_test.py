@@ -0,0 +1,38 @@
+from mdmpyclient.utils.sdmx_import import import_levels, sdmx_artefacts
+
+HEADER = '<message:Structure xmlns:message="m" xmlns:structure="s"><message:Structures>'
+FOOTER = '</message:Structures></message:Structure>'
+CODELIST = '<structure:Codelists><structure:Codelist id="CL_A" agencyID="ESC01" version="1.0"/></structure:Codelists>'
+CONCEPT_SCHEME = '<structure:Concepts><structure:ConceptScheme id="CS_A" agencyID="ESC01" version="1.0">' \
+                 '<structure:Concept id="A"><Ref id="CL_A" agencyID="ESC01" version="1.0" class="Codelist"/>' \
+                 '</structure:Concept></structure:ConceptScheme></structure:Concepts>'
+DSD = '<structure:DataStructures><structure:DataStructure id="DSD_A" agencyID="ESC01" version="1.0">' \
+      '<Ref id="A" maintainableParentID="CS_A" maintainableParentVersion="1.0" agencyID="ESC01" class="Concept"/>' \
+      '</structure:DataStructure></structure:DataStructures>'
+DATAFLOW = '<structure:Dataflows><structure:Dataflow id="DF_A" agencyID="ESC01" version="1.0">' \
+           '<Ref id="DSD_A" agencyID="ESC01" version="1.0" class="DataStructure"/>' \
+           '</structure:Dataflow></structure:Dataflows>'
+
+
+def write(tmp_path, name, *structures):
+    path = tmp_path / name
+    path.write_text(HEADER + ''.join(structures) + FOOTER, encoding='utf-8')
+    return str(path)
+
+
+def test_sdmx_artefacts_references(tmp_path):
+    path = write(tmp_path, 'DSD_A.xml', CONCEPT_SCHEME, DSD)
+    assert sdmx_artefacts(path) == {
+        ('ConceptScheme', 'ESC01', 'CS_A', '1.0'): {('Codelist', 'ESC01', 'CL_A', '1.0')},
+        ('DataStructure', 'ESC01', 'DSD_A', '1.0'): {('ConceptScheme', 'ESC01', 'CS_A', '1.0')}}
+
+
+def test_import_levels_follow_references(tmp_path):
+    dataflow = write(tmp_path, 'DF_A.xml', CODELIST, CONCEPT_SCHEME, DSD, DATAFLOW)
+    dsd = write(tmp_path, 'DSD_A.xml', CODELIST, CONCEPT_SCHEME, DSD)
+    concept_scheme = write(tmp_path, 'CS_A.xml', CONCEPT_SCHEME)
+    codelist = write(tmp_path, 'CL_A.xml', CODELIST)
+    other_codelist = write(tmp_path, 'CL_A_copy.xml', CODELIST)
+    other_dataflow = write(tmp_path, 'DF_B.xml', DATAFLOW.replace('DF_A', 'DF_B'))
+    assert import_levels([dataflow, dsd, concept_scheme, codelist, other_codelist, other_dataflow]) == \
+        [[codelist], [other_codelist], [concept_scheme], [dsd], [dataflow, other_dataflow]]
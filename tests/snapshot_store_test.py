@@ -0,0 +1,102 @@
+import pandas
+from mock import MagicMock
+
+from mdmpyclient.cache.snapshot_store import SnapshotStore
+from mdmpyclient.dataflow.dataflow import Dataflow
+from mdmpyclient.mapping.mapping import Mapping
+
+
+def test_save_load_and_prune(tmp_path):
+    store = SnapshotStore(str(tmp_path), keep=2)
+    assert store.load(1) is None
+    for value in range(3):
+        store.save(1, pandas.DataFrame({'REF_AREA': ['A'], 'OBS_VALUE': [float(value)]}))
+    assert len(store.paths(1)) == 2
+    snapshot = store.load(1)
+    assert snapshot['OBS_VALUE'].tolist() == [2.0]
+    assert snapshot['OBS_VALUE'].dtype == 'float64'
+
+
+def test_disabled_store():
+    store = SnapshotStore(None)
+    assert store.save(1, pandas.DataFrame({'A': [1]})) is None
+    assert store.load(1) is None
+    store.delete()
+
+
+def test_snapshots_by_node_and_delete(tmp_path):
+    first = SnapshotStore(str(tmp_path), node='http://test.com/#1')
+    second = SnapshotStore(str(tmp_path), node='http://test.com/#2')
+    first.save(1, pandas.DataFrame({'A': [1]}))
+    first.save(2, pandas.DataFrame({'A': [2]}))
+    second.save(1, pandas.DataFrame({'A': [3]}))
+    assert first.load(1)['A'].tolist() == [1]
+    first.delete(1)
+    assert first.load(1) is None and first.load(2) is not None
+    first.delete()
+    assert first.load(2) is None
+    assert second.load(1)['A'].tolist() == [3]
+
+
+def mapping_mock(tmp_path, warnings=None):
+    session = MagicMock()
+    session.headers = {}
+    session.post.return_value.text = '"datos.csv"'
+    session.get.return_value.json.return_value = {'WarnDictionary': warnings or {}}
+    mapping = Mapping(session, {'url_base': 'http://test.com/', 'snapshot_store': str(tmp_path)}, 1, 2, 'MAP', None)
+    mapping.components = [{'column': 'TERRITORIO', 'column_mapped': 'REF_AREA', 'type': 'Dimension'},
+                          {'column': 'OBS_VALUE', 'column_mapped': 'OBS_VALUE', 'type': 'Measure'}]
+    return mapping
+
+
+def test_load_cube_merges_snapshot(tmp_path):
+    mapping = mapping_mock(tmp_path)
+    mapping.load_cube(pandas.DataFrame({'TERRITORIO': ['A', 'B'], 'OBS_VALUE': [1, 2]}))
+    mapping.load_cube(pandas.DataFrame({'TERRITORIO': ['B', 'C'], 'OBS_VALUE': [5, 3]}))
+    snapshot = mapping.snapshot_store.load(2)
+    assert snapshot.columns.tolist() == ['REF_AREA', 'OBS_VALUE']
+    assert snapshot.to_dict('list') == {'REF_AREA': ['A', 'B', 'C'], 'OBS_VALUE': [1, 5, 3]}
+
+
+def test_delta_load_uses_current_data(tmp_path):
+    mapping = mapping_mock(tmp_path)
+    data = pandas.DataFrame({'TERRITORIO': ['A', 'B'], 'OBS_VALUE': [1, 2]})
+    mapping.load_cube(data)
+    # El cubo se ha vaciado fuera del cliente, la copia local no debe usarse para calcular el delta
+    mapping.current_data = MagicMock(return_value=pandas.DataFrame({'TERRITORIO': ['A'], 'OBS_VALUE': ['1']}))
+    mapping.session.post.reset_mock()
+    results = mapping.load_cube(data, delta=True)
+    assert len(results) == 1
+    assert mapping.session.post.call_count == 1
+    assert mapping.snapshot_store.load(2)['REF_AREA'].tolist() == ['A', 'B']
+
+
+def test_load_cube_with_warnings_deletes_snapshot(tmp_path):
+    mapping = mapping_mock(tmp_path)
+    mapping.load_cube(pandas.DataFrame({'TERRITORIO': ['A'], 'OBS_VALUE': [1]}))
+    mapping.session.get.return_value.json.return_value = {'WarnDictionary': {'1': 'error'}}
+    mapping.load_cube(pandas.DataFrame({'TERRITORIO': ['B'], 'OBS_VALUE': [2]}))
+    assert mapping.snapshot_store.load(2) is None
+
+
+def dataflow_mock(tmp_path, filters):
+    session = MagicMock()
+    session.get.return_value.json.return_value = {'DataflowColumns': ['REF_AREA', 'OBS_VALUE'], 'filter': filters}
+    configuracion = {'url_base': 'http://test.com/', 'snapshot_store': str(tmp_path), 'dataflow_from_snapshot': True}
+    dataflow = Dataflow(session, configuracion, 'DF_TEST', 'ESC01', '1.0', 1, 2, {}, {})
+    dataflow.snapshot_store.save(2, pandas.DataFrame({'REF_AREA': ['A'], 'OBS_VALUE': [1]}))
+    return dataflow
+
+
+def test_dataflow_reads_snapshot_only_without_filters(tmp_path):
+    dataflow = dataflow_mock(tmp_path, {'FiltersGroupAnd': {}, 'FiltersGroupOr': {}})
+    assert dataflow.get()['REF_AREA'].tolist() == ['A']
+    assert dataflow.session.post.call_count == 0
+
+    dataflow = dataflow_mock(tmp_path, {'FiltersGroupAnd': {'REF_AREA': ['B']}, 'FiltersGroupOr': {}})
+    dataflow.session.post.side_effect = Exception('preview')
+    try:
+        dataflow.get()
+        assert False
+    except Exception as e:
+        assert str(e) == 'preview'
@@ -0,0 +1,79 @@
+import json
+
+from mock import MagicMock
+
+from mdmpyclient.cache.structure_cache import StructureCache
+
+key = ('codelist', 'ESC01', 'CL_TEST', '1.0')
+
+
+def response(status_code, data=None, etag=None):
+    mock_response = MagicMock()
+    mock_response.status_code = status_code
+    mock_response.ok = status_code < 400
+    mock_response.json.return_value = data
+    mock_response.iter_content.return_value = [json.dumps(data).encode('utf-8')]
+    mock_response.headers = {'ETag': etag} if etag else {}
+    return mock_response
+
+
+def test_final_artefact_served_from_cache(tmp_path):
+    cache = StructureCache(str(tmp_path))
+    session = MagicMock()
+    session.get.return_value = response(200, {'data': {'codelists': []}})
+    assert cache.get_json(session, 'url', key, True) == {'data': {'codelists': []}}
+    assert cache.get_json(session, 'url', key, True) == {'data': {'codelists': []}}
+    assert session.get.call_count == 1
+
+
+def test_non_final_artefact_revalidated(tmp_path):
+    cache = StructureCache(str(tmp_path))
+    session = MagicMock()
+    session.get.return_value = response(200, {'data': {'codelists': []}}, etag='"1"')
+    cache.get_json(session, 'url', key)
+    not_modified = response(304)
+    session.get.return_value = not_modified
+    assert cache.get_json(session, 'url', key) == {'data': {'codelists': []}}
+    assert session.get.call_args.kwargs['headers'] == {'If-None-Match': '"1"'}
+    assert not_modified.close.call_count == 1
+
+
+def test_errors_not_cached(tmp_path):
+    cache = StructureCache(str(tmp_path))
+    session = MagicMock()
+    session.get.return_value = response(200, {'errorCode': 'ERROR'})
+    cache.get_json(session, 'url', key, True)
+    assert cache.load(key) is None
+    assert list(cache.iter_items(session, 'url', key, 'data.codelists.item.codes.item', True)) == []
+    assert cache.load(key) is None
+    list(cache.iter_items(session, 'url', key, 'data.codelists.item.codes.item', True))
+    assert session.get.call_count == 3
+
+
+def test_disabled_cache():
+    cache = StructureCache(None)
+    session = MagicMock()
+    session.get.return_value = response(200, {'data': {}})
+    cache.get_json(session, 'url', key, True)
+    cache.get_json(session, 'url', key, True)
+    assert session.get.call_count == 2
+
+
+def test_iter_items_from_cache(tmp_path):
+    cache = StructureCache(str(tmp_path))
+    session = MagicMock()
+    session.get.return_value = response(200, {'data': {'codelists': [{'codes': [{'id': 'A'}, {'id': 'B'}]}]}})
+    prefix = 'data.codelists.item.codes.item'
+    assert list(cache.iter_items(session, 'url', key, prefix, True)) == [{'id': 'A'}, {'id': 'B'}]
+    assert list(cache.iter_items(session, 'url', key, prefix, True)) == [{'id': 'A'}, {'id': 'B'}]
+    assert session.get.call_count == 1
+
+
+def test_nodes_cached_separately(tmp_path):
+    session = MagicMock()
+    session.get.return_value = response(200, {'data': {'codelists': [{'id': 'NODE_1'}]}})
+    StructureCache(str(tmp_path), 'http://test.com/#NODE_1').get_json(session, 'url', key, True)
+    session.get.return_value = response(200, {'data': {'codelists': [{'id': 'NODE_2'}]}})
+    data = StructureCache(str(tmp_path), 'http://test.com/#NODE_2').get_json(session, 'url', key, True)
+    assert data == {'data': {'codelists': [{'id': 'NODE_2'}]}}
+    assert session.get.call_count == 2
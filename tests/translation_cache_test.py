@@ -0,0 +1,60 @@
+import yaml
+
+from mdmpyclient.cache.translation_cache import TranslationCache
+
+
+def test_flush_only_when_dirty(tmp_path):
+    path = tmp_path / 'traducciones.yaml'
+    path.write_text(yaml.dump({'Uno': {'en': 'One'}}), encoding='utf-8')
+    cache = TranslationCache(str(path), flush_interval=3600)
+    assert cache.get('Uno', 'en') == 'One'
+    cache.set('Dos', 'en', 'Two')
+    assert cache.dirty
+    assert 'Dos' not in yaml.safe_load(path.read_text(encoding='utf-8'))
+    cache.flush()
+    assert not cache.dirty
+    assert yaml.safe_load(path.read_text(encoding='utf-8')) == {'Uno': {'en': 'One'}, 'Dos': {'en': 'Two'}}
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_flush_on_size(tmp_path):
+    path = tmp_path / 'traducciones.yaml'
+    cache = TranslationCache(str(path), flush_interval=3600, flush_size=2)
+    cache.set('Uno', 'en', 'One')
+    assert not path.exists()
+    cache.set('Uno', 'fr', 'Un')
+    assert yaml.safe_load(path.read_text(encoding='utf-8')) == {'Uno': {'en': 'One', 'fr': 'Un'}}
+
+
+def test_flush_on_timer(tmp_path):
+    path = tmp_path / 'traducciones.yaml'
+    cache = TranslationCache(str(path), flush_interval=0.01)
+    cache.set('Uno', 'en', 'One')
+    cache.timer.join()
+    assert yaml.safe_load(path.read_text(encoding='utf-8')) == {'Uno': {'en': 'One'}}
+
+
+def test_sqlite_backend_imports_yaml_once(tmp_path):
+    path = tmp_path / 'traducciones.yaml'
+    path.write_text(yaml.dump({'Uno': {'en': 'One', 'fr': 'Un'}}), encoding='utf-8')
+    database = str(tmp_path / 'traducciones.sqlite')
+    cache = TranslationCache(str(path), flush_interval=3600, backend='sqlite', database=database)
+    assert cache.get('Uno', 'fr') == 'Un'
+    cache.set('Dos', 'en', 'Two')
+    cache.close()
+    path.write_text(yaml.dump({'Uno': {'en': 'Changed'}}), encoding='utf-8')
+    cache = TranslationCache(str(path), backend='sqlite', database=database)
+    assert cache.get('Uno', 'en') == 'One'
+    assert cache.get('Dos', 'en') == 'Two'
+    assert cache.get('Tres', 'en') is None
+
+
+def test_languages_merged_and_counted():
+    cache = TranslationCache(None, flush_interval=3600)
+    cache.set('Uno', 'EN-GB', 'One')
+    cache.set('Uno', 'fr', 'Un')
+    assert cache.lookup('Uno', 'en') == 'One'
+    assert cache.lookup('Uno', 'FR') == 'Un'
+    assert cache.lookup('Uno', 'de') is None
+    cache.count_request()
+    assert cache.stats() == {'hits': 2, 'misses': 1, 'requests': 1, 'hit_ratio': 2 / 3, 'saved_requests': 2}
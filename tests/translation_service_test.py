@@ -0,0 +1,43 @@
+import pandas
+from mock import MagicMock
+
+from mdmpyclient.cache.translation_cache import TranslationCache
+from mdmpyclient.translation.translation_service import TranslationService
+
+configuracion = {'languages': ['es', 'en'], 'translation_batch_size': 2}
+
+
+def translator():
+    mock_translator = MagicMock()
+    mock_translator.translate_text.side_effect = lambda texts, target_lang: [f'{text} {target_lang}' for text in texts]
+    return mock_translator
+
+
+def test_translate_values_batched_and_deduplicated():
+    mock_translator = translator()
+    cache = TranslationCache(None)
+    cache.set('Uno', 'en', 'One')
+    service = TranslationService(configuracion, mock_translator, cache)
+    result = service.translate_values(['Uno', 'Dos', 'Tres', 'Dos', 'Cuatro', None], 'en')
+    assert result == {'Uno': 'One', 'Dos': 'Dos EN-GB', 'Tres': 'Tres EN-GB', 'Cuatro': 'Cuatro EN-GB'}
+    assert [call.args[0] for call in mock_translator.translate_text.call_args_list] == [['Dos', 'Tres'], ['Cuatro']]
+
+
+def test_translate_columns_uses_prefetched_cache():
+    mock_translator = translator()
+    service = TranslationService(configuracion, mock_translator, TranslationCache(None))
+    codes = pandas.DataFrame({'id': ['A', 'B'], 'parent': [None, None], 'name_es': ['Uno', 'Dos'],
+                              'name_en': [None, 'Two']}, dtype='string')
+    stats = service.prefetch(service.pending_values(codes, codes.columns[3:]))
+    assert stats == {'hits': 0, 'misses': 1, 'requests': 1, 'saved_requests': 0}
+    translated = service.translate_columns(codes, codes.columns[3:])
+    assert translated['name_en'].tolist() == ['Uno EN-GB']
+    assert mock_translator.translate_text.call_count == 1
+
+
+def test_translation_errors_keep_source_text():
+    mock_translator = MagicMock()
+    mock_translator.translate_text.side_effect = TypeError
+    service = TranslationService(configuracion, mock_translator, TranslationCache(None))
+    assert service.translate({'es': 'España'}) == {'es': 'España', 'en': 'Spain'}
+    assert service.translate({'es': 'Andalucía'}) == {'es': 'Andalucía', 'en': 'Andalucía'}
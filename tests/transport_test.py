@@ -0,0 +1,64 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from mdmpyclient.session.transport import TransportAdapter
+
+
+@pytest.fixture
+def slow_server():
+    requests_received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def respond(self):
+            requests_received.append((self.command, self.path))
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(0.3)
+            try:
+                self.send_response(200)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'ok')
+            except OSError:
+                pass
+
+        do_GET = do_POST = respond
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}/', requests_received
+    server.shutdown()
+
+
+def session_with_adapter():
+    session = requests.session()
+    adapter = TransportAdapter({'transport': {'retries': 2, 'backoff_factor': 0, 'timeout': 0.1}})
+    session.mount('http://', adapter)
+    return session
+
+
+def test_post_not_resent_after_read_timeout(slow_server):
+    url, received = slow_server
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        session_with_adapter().post(f'{url}cube', json={'Code': 'C_1'})
+    assert received == [('POST', '/cube')]
+
+
+def test_import_not_resent_after_read_timeout(slow_server):
+    url, received = slow_server
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        session_with_adapter().get(f'{url}importCSVData/%3B/true/SeriesAndData/1/1')
+    assert len(received) == 1
+
+
+def test_get_resent_after_read_timeout(slow_server):
+    url, received = slow_server
+    with pytest.raises(requests.exceptions.ConnectionError):
+        session_with_adapter().get(f'{url}cubesNoFilter')
+    assert received == [('GET', '/cubesNoFilter')] * 3